@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+
+from environ import Env
+
+
+def read_meminfo():
+    """Return MemTotal and MemAvailable from /proc/meminfo in bytes."""
+    meminfo = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            if key in ("MemTotal", "MemAvailable"):
+                meminfo[key] = int(value.split()[0]) * 1024
+    return meminfo["MemTotal"], meminfo["MemAvailable"]
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class BuildScheduler:
+    """
+    Admission control for tippecanoe builds on this node. Each build reserves
+    its estimated memory and scratch disk in a per-host Redis hash and is only
+    started while the reservations fit the node's budget; otherwise it waits.
+    """
+
+    def __init__(self):
+        self.env = Env()
+        self.env.read_env()
+
+        self.scratch_dir = self.env.str("TIPPECANOE_SCRATCH_DIR", default="/tmp")
+        # Share of the node's memory and scratch disk builds may reserve
+        self.memory_fraction = self.env.float("BUILD_MEMORY_FRACTION", default=0.8)
+        self.disk_fraction = self.env.float("BUILD_DISK_FRACTION", default=0.8)
+        self.poll_seconds = self.env.int("BUILD_ADMISSION_POLL_SECONDS", default=5)
+
+        # Rough tippecanoe footprint: a fixed base plus per-feature index
+        # entries and buffers proportional to the input, and temporary files
+        # plus output of a few times the input size on disk
+        self.memory_base_bytes = 256 * 1024 * 1024
+        self.memory_bytes_per_feature = 256
+        self.memory_bytes_per_input_byte = 0.5
+        self.disk_bytes_per_input_byte = 3
+
+        self.hostname = socket.gethostname()
+        self.reservations_key = f"build_reservations:{self.hostname}"
+
+    def estimate(self, input_size, feature_count=None):
+        """Return the estimated (memory, disk) bytes to tile a GeoJSON input."""
+        memory = self.memory_base_bytes + input_size * self.memory_bytes_per_input_byte
+        if feature_count:
+            memory += feature_count * self.memory_bytes_per_feature
+        disk = input_size * self.disk_bytes_per_input_byte
+        return int(memory), int(disk)
+
+    def _load_reservations(self, redis_client):
+        reservations = {}
+        for job_id, value in redis_client.hgetall(self.reservations_key).items():
+            reservation = json.loads(value)
+            # Drop reservations left behind by killed worker processes
+            if not is_process_alive(reservation["pid"]):
+                redis_client.hdel(self.reservations_key, job_id)
+                continue
+            reservations[job_id.decode()] = reservation
+        return reservations
+
+    def _has_capacity(self, reservations, memory, disk):
+        # A build that runs alone is always admitted, even when its estimate
+        # exceeds the budget, so an oversized job cannot wait forever
+        if not reservations:
+            return True
+
+        reserved_memory = sum(r["memory"] for r in reservations.values())
+        reserved_disk = sum(r["disk"] for r in reservations.values())
+        mem_total, mem_available = read_meminfo()
+        disk_usage = shutil.disk_usage(self.scratch_dir)
+
+        return (
+            reserved_memory + memory <= mem_total * self.memory_fraction
+            and memory <= mem_available
+            and reserved_disk + disk <= disk_usage.total * self.disk_fraction
+            and disk <= disk_usage.free
+        )
+
+    def try_reserve(self, redis_client, job_id, memory, disk):
+        with redis_client.lock(f"{self.reservations_key}:lock", timeout=30):
+            reservations = self._load_reservations(redis_client)
+            if not self._has_capacity(reservations, memory, disk):
+                return False
+
+            reservation = {"memory": memory, "disk": disk, "pid": os.getpid()}
+            redis_client.hset(self.reservations_key, job_id, json.dumps(reservation))
+            return True
+
+    def release(self, redis_client, job_id):
+        redis_client.hdel(self.reservations_key, job_id)
+
+    @contextmanager
+    def admit(self, redis_client, job_id, memory, disk, on_wait=None):
+        """
+        Block until the build fits on the node, hold its reservation while the
+        body runs and release it afterwards. on_wait is called once if the
+        build has to wait.
+        """
+        waiting = False
+        while not self.try_reserve(redis_client, job_id, memory, disk):
+            if not waiting and on_wait:
+                on_wait()
+            waiting = True
+            time.sleep(self.poll_seconds)
+
+        try:
+            yield
+        finally:
+            self.release(redis_client, job_id)
+
+
+build_scheduler = BuildScheduler()
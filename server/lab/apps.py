@@ -7,3 +7,11 @@ class LabConfig(AppConfig):
 
     def ready(self):
         import lab.signals  # noqa: F401
+        from django.conf import settings
+
+        from .metrics import register_queue_collector
+
+        queues = {settings.CELERY_TASK_DEFAULT_QUEUE} | {
+            route["queue"] for route in settings.CELERY_TASK_ROUTES.values()
+        }
+        register_queue_collector(settings.CELERY_BROKER_URL, sorted(queues))
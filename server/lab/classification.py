@@ -0,0 +1,173 @@
+import mapclassify
+import numpy as np
+
+from .constants import ClassificationMethod
+
+NUM_CLASSES_STANDARD = 5
+STANDARD_PERCENTILES = [1, 10, 50, 90, 99, 100]
+
+# Algorithm recorded with the breaks of each method, where it is not named
+# after the method
+ALGORITHMS = {
+    ClassificationMethod.NATURAL_BREAKS: "fisher_jenks",
+    ClassificationMethod.QUANTILE: "quantiles",
+    ClassificationMethod.PERCENTILE: "percentiles",
+}
+
+
+def get_algorithm(method):
+    method = ClassificationMethod(method)
+    return ALGORITHMS.get(method, method.value)
+
+
+def fisher_jenks(values, weights, k):
+    """
+    Exact Fisher-Jenks optimal classification of sorted unique values with
+    weights (their counts). Returns the upper bound of each of the k classes.
+    """
+    # Center the values so the sums of squares keep their precision
+    x = values - np.average(values, weights=weights)
+    cum_weights = np.concatenate(([0.0], np.cumsum(weights)))
+    cum_sums = np.concatenate(([0.0], np.cumsum(weights * x)))
+    cum_squares = np.concatenate(([0.0], np.cumsum(weights * x * x)))
+
+    # Weighted sum of squared deviations of every class x[i..j], for i <= j
+    start = np.arange(x.size)[:, None]
+    end = np.arange(x.size)[None, :] + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sums = cum_sums[end] - cum_sums[start]
+        ssd = (
+            cum_squares[end]
+            - cum_squares[start]
+            - sums * sums / (cum_weights[end] - cum_weights[start])
+        )
+    ssd[start >= end] = np.inf
+
+    # cost[j] is the least total deviation of x[0..j] split into c classes;
+    # starts[c][j] is where the last of those classes begins
+    cost = ssd[0]
+    starts = []
+    for _ in range(1, k):
+        candidates = np.full_like(ssd, np.inf)
+        candidates[1:] = cost[:-1, None] + ssd[1:]
+        best = candidates.argmin(axis=0)
+        cost = candidates[best, np.arange(x.size)]
+        starts.append(best)
+
+    ends = [x.size - 1]
+    for best in reversed(starts):
+        ends.append(best[ends[-1]] - 1)
+    return values[ends[::-1]].tolist()
+
+
+def stratified_sample(unique_values, counts, sample_size):
+    """
+    Reduce a value histogram to at most sample_size weighted values: one per
+    equal-count stratum of the sorted data, taken at the stratum's midpoint.
+    """
+    total = counts.sum()
+    positions = (np.arange(sample_size) + 0.5) * total / sample_size
+    indices = np.searchsorted(np.cumsum(counts), positions, side="right")
+    sampled, weights = np.unique(indices, return_counts=True)
+    return unique_values[sampled], weights * (total / sample_size)
+
+
+def natural_breaks(values, k, sample_size):
+    """
+    Natural breaks of values in k classes, computed exactly over the unique
+    values when there are at most sample_size of them and over a stratified
+    sample otherwise. Returns (breaks, sample size or None when exact).
+    """
+    unique_values, counts = np.unique(values, return_counts=True)
+    k = min(k, unique_values.size)
+
+    if unique_values.size <= sample_size:
+        return fisher_jenks(unique_values, counts.astype(np.float64), k), None
+
+    sampled_values, weights = stratified_sample(unique_values, counts, sample_size)
+    breaks = fisher_jenks(sampled_values, weights, min(k, sampled_values.size))
+    # The top class must still reach the largest value outside the sample
+    breaks[-1] = unique_values[-1].item()
+    return breaks, sample_size
+
+
+def compute_breaks(values, method, sample_size):
+    """
+    Classify values with the method. Returns (breaks, algorithm, sample size
+    or None when every value was used).
+    """
+    if method == ClassificationMethod.NATURAL_BREAKS:
+        breaks, used_sample_size = natural_breaks(
+            values, NUM_CLASSES_STANDARD, sample_size
+        )
+        return breaks, get_algorithm(method), used_sample_size
+
+    if method == ClassificationMethod.QUANTILE:
+        num_classes = min(NUM_CLASSES_STANDARD, np.unique(values).size)
+        classifier = mapclassify.Quantiles(values, k=num_classes)
+        return classifier.bins.tolist(), get_algorithm(method), None
+
+    classifier = mapclassify.Percentiles(values, pct=STANDARD_PERCENTILES)
+    return classifier.bins.tolist(), get_algorithm(method), None
+
+
+def classify_column(column_path, method, sample_size):
+    """
+    Classify the values of a column file. Runs in the classification process
+    pool, so it only takes picklable arguments.
+    """
+    return compute_breaks(np.load(column_path, mmap_mode="r"), method, sample_size)
+
+
+def classify(values, method, k, percentiles, sample_size):
+    """
+    Breaks of values for any classification method, vectorised over the
+    column. k is the number of classes (the most for head/tail breaks) and
+    percentiles only applies to the percentile method. Returns (breaks,
+    algorithm, sample size or None when every value was used).
+    """
+    if method == ClassificationMethod.NATURAL_BREAKS:
+        breaks, used_sample_size = natural_breaks(values, k, sample_size)
+        return breaks, get_algorithm(method), used_sample_size
+
+    low, high = values.min(), values.max()
+    if method == ClassificationMethod.QUANTILE:
+        breaks = np.quantile(values, np.arange(1, k + 1) / k)
+    elif method == ClassificationMethod.PERCENTILE:
+        breaks = np.percentile(values, percentiles or STANDARD_PERCENTILES)
+    elif method == ClassificationMethod.EQUAL_INTERVAL:
+        breaks = low + (high - low) * np.arange(1, k + 1) / k
+    elif method == ClassificationMethod.STD_MEAN:
+        # Classes one standard deviation wide, centred on the mean
+        multiples = np.arange(k - 1) - (k - 2) / 2
+        breaks = values.mean() + values.std() * multiples
+        breaks = np.append(breaks[(breaks > low) & (breaks < high)], high)
+    else:
+        breaks = head_tail_breaks(values, k)
+
+    # Classes that collapse onto the same bound are merged
+    return np.unique(breaks).tolist(), get_algorithm(method), None
+
+
+def head_tail_breaks(values, k, head_fraction=0.4):
+    """
+    Split at the mean of the values above the previous mean for as long as
+    the head stays a minority, for heavy-tailed distributions.
+    """
+    breaks = []
+    head = values
+    while len(breaks) < k - 1 and head.size > 1:
+        mean = head.mean()
+        next_head = head[head > mean]
+        if next_head.size == 0 or next_head.size / head.size > head_fraction:
+            break
+        breaks.append(mean)
+        head = next_head
+    breaks.append(values.max())
+    return np.array(breaks)
+
+
+def count_classes(values, breaks):
+    """Number of values in each class, a value on a bound belonging below it."""
+    classes = np.searchsorted(breaks, values, side="left")
+    return np.bincount(classes, minlength=len(breaks))[: len(breaks)].tolist()
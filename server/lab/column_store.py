@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .columns import DEFAULT_HISTOGRAM_BINS, column_histogram, column_statistics
+from .utils import s3_service, artifact_cache
+
+
+def get_column_store_prefix(dataset):
+    # Dataset names are not unique, so the columns are keyed by id
+    return f"datasets/columns/{dataset.id}/"
+
+
+def get_manifest_object_name(dataset):
+    return f"{get_column_store_prefix(dataset)}manifest.json"
+
+
+def get_column_object_name(dataset, field):
+    # Field names can hold any character, so objects are named by their hash
+    digest = hashlib.sha256(field.encode()).hexdigest()[:16]
+    return f"{get_column_store_prefix(dataset)}{digest}.npy"
+
+
+def upload_and_cache(local_path, object_name):
+    s3_service.upload_file(local_path, object_name)
+    try:
+        artifact_cache.put(object_name, local_path)
+    except Exception as e:
+        print(f"Warning: Failed to cache {object_name}: {e}")
+
+
+def store_columns(dataset, columns):
+    """
+    Write each numeric column of the dataset as a .npy file to MinIO, with a
+    manifest describing them, and record the fields' statistics and which of
+    them can be classified. Returns the number of bytes written.
+    """
+    manifest = {"feature_count": dataset.feature_count, "fields": {}}
+    stats = {}
+    # On the cache filesystem, so the files move into the cache without a copy
+    scratch = artifact_cache.scratch_dir()
+    temp_dir = scratch.name
+    try:
+        uploads = {}
+        for field, values in columns.items():
+            object_name = get_column_object_name(dataset, field)
+            local_path = os.path.join(temp_dir, os.path.basename(object_name))
+            np.save(local_path, values)
+            uploads[object_name] = local_path
+            stats[field] = column_statistics(values, dataset.feature_count)
+            manifest["fields"][field] = {
+                "object": object_name,
+                "dtype": str(values.dtype),
+                "count": stats[field]["count"],
+                "min": stats[field]["min"],
+                "max": stats[field]["max"],
+            }
+
+        manifest_object_name = get_manifest_object_name(dataset)
+        manifest_path = os.path.join(temp_dir, "manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        uploads[manifest_object_name] = manifest_path
+
+        bytes_moved = sum(os.path.getsize(path) for path in uploads.values())
+        with ThreadPoolExecutor(max_workers=max(1, len(uploads))) as executor:
+            futures = [
+                executor.submit(upload_and_cache, local_path, object_name)
+                for object_name, local_path in uploads.items()
+            ]
+            for future in futures:
+                future.result()
+        print(f"Uploaded {len(columns)} columns of {dataset.name} to MinIO bucket.")
+    finally:
+        scratch.cleanup()
+
+    # A field holding a single value has nothing to classify
+    dataset.numeric_fields = [
+        field
+        for field, entry in manifest["fields"].items()
+        if entry["min"] < entry["max"]
+    ]
+    dataset.attribute_stats = stats
+    dataset.save(update_fields=["numeric_fields", "attribute_stats", "updated_at"])
+    print(f"Stored columns of numeric fields: {dataset.numeric_fields}")
+    return bytes_moved
+
+
+def fetch_column_paths(dataset, fields):
+    """
+    Return a dict of field to the local path of its column file, fetched
+    through the artifact cache.
+    """
+    object_names = {field: get_column_object_name(dataset, field) for field in fields}
+    results = artifact_cache.fetch_many(list(object_names.values()))
+    paths = {}
+    for field, object_name in object_names.items():
+        if isinstance(results[object_name], Exception):
+            raise results[object_name]
+        paths[field] = results[object_name]
+    return paths
+
+
+def open_column(path):
+    """Memory-map a column file, so only the pages that are read get loaded."""
+    return np.load(path, mmap_mode="r")
+
+
+def get_attribute_stats(dataset, fields, bins=DEFAULT_HISTOGRAM_BINS):
+    """
+    Return the statistics of the given fields. Histograms with the default
+    bins come from ingest; others are computed from the column files and
+    cached.
+    """
+    stats = {field: dataset.attribute_stats[field] for field in fields}
+    if bins == DEFAULT_HISTOGRAM_BINS:
+        return stats
+
+    # Column stores are rewritten with a new updated_at, which retires the keys
+    cache_keys = {
+        field: f"histogram:{dataset.id}:{dataset.updated_at.timestamp()}:{bins}:"
+        + hashlib.sha256(field.encode()).hexdigest()
+        for field in fields
+    }
+    histograms = cache.get_many(list(cache_keys.values()))
+    missing = [field for field in fields if cache_keys[field] not in histograms]
+    if missing:
+        computed = {
+            cache_keys[field]: column_histogram(open_column(path), bins)
+            for field, path in fetch_column_paths(dataset, missing).items()
+        }
+        cache.set_many(computed, settings.CLASSIFICATION_CACHE_SECONDS)
+        histograms.update(computed)
+
+    return {
+        field: {**stats[field], "histogram": histograms[cache_keys[field]]}
+        for field in fields
+    }
@@ -0,0 +1,112 @@
+import os
+from array import array
+
+import fiona
+import numpy as np
+
+from .profiling import DatasetProfiler
+
+NUMERIC_FIELD_TYPES = ("int", "float")
+
+# Bins of the histograms computed at ingest
+DEFAULT_HISTOGRAM_BINS = 20
+
+
+def is_numeric_value(value):
+    return (
+        value is not None
+        and isinstance(value, (int, float))
+        and not isinstance(value, bool)
+    )
+
+
+class ColumnBuilder:
+    """
+    Accumulate one typed float64 column per numeric field from a stream of
+    feature properties, so attributes are collected in a single pass without
+    keeping the per-feature dicts around.
+    """
+
+    def __init__(self, fields=None):
+        # When fields are not known up front they are discovered as numeric
+        # values show up in the stream.
+        self._discover = fields is None
+        self._buffers = {field: array("d") for field in fields or []}
+        self.feature_count = 0
+
+    def add(self, properties):
+        self.feature_count += 1
+        if not properties:
+            return
+
+        if self._discover:
+            for field, value in properties.items():
+                if is_numeric_value(value):
+                    buffer = self._buffers.get(field)
+                    if buffer is None:
+                        buffer = self._buffers[field] = array("d")
+                    buffer.append(value)
+            return
+
+        for field, buffer in self._buffers.items():
+            value = properties.get(field)
+            if is_numeric_value(value):
+                buffer.append(value)
+
+    def columns(self, min_count=2):
+        """Return the collected columns as NumPy arrays without copying."""
+        return {
+            field: np.frombuffer(buffer, dtype=np.float64)
+            for field, buffer in self._buffers.items()
+            if len(buffer) >= min_count
+        }
+
+
+def get_numeric_fields(schema):
+    return [
+        field
+        for field, field_type in schema["properties"].items()
+        if field_type.startswith(NUMERIC_FIELD_TYPES)
+    ]
+
+
+def read_numeric_columns(path):
+    """
+    Stream the features of a vector file once and return a dict mapping each
+    numeric field to a float64 array of its non-null values, along with the
+    profile of the features.
+    """
+    profiler = DatasetProfiler()
+    with fiona.open(path) as src:
+        builder = ColumnBuilder(get_numeric_fields(src.schema))
+        for feature in src:
+            builder.add(feature.properties)
+            profiler.add(feature.geometry, feature.properties)
+    profiler.input_bytes = os.path.getsize(path)
+
+    print(f"Loaded {builder.feature_count} features")
+    return builder.columns(), profiler.result()
+
+
+def column_histogram(values, bins):
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def column_statistics(values, feature_count, bins=DEFAULT_HISTOGRAM_BINS):
+    """
+    Summary statistics and histogram of a numeric column. Features without a
+    numeric value for the field count as nulls.
+    """
+    return {
+        "count": int(values.size),
+        "null_count": (
+            feature_count - int(values.size) if feature_count is not None else None
+        ),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "distinct": int(np.unique(values).size),
+        "histogram": column_histogram(values, bins),
+    }
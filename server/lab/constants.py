@@ -5,17 +5,41 @@ class TaskStatus(str, Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     FAILED = "failed"
+    WAITING = "waiting"
 
 
 TASK_STATUS_CHOICES = [(status.value, status.name) for status in TaskStatus]
 
 
+class UploadStatus(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+
+
+UPLOAD_STATUS_CHOICES = [(status.value, status.name) for status in UploadStatus]
+
+
 class ClassificationMethod(str, Enum):
     QUANTILE = "quantile"
     NATURAL_BREAKS = "natural_breaks"
     PERCENTILE = "percentile"
+    EQUAL_INTERVAL = "equal_interval"
+    STD_MEAN = "std_mean"
+    HEAD_TAIL = "head_tail"
 
 
 CLASSIFICATION_METHOD_CHOICES = [
     (method.value, method.name) for method in ClassificationMethod
 ]
+
+
+# tippecanoe options that set paths and overwriting, which the server manages
+SERVER_MANAGED_OPTIONS = [
+    "-o",
+    "--output",
+    "-f",
+    "--force",
+    "-e",
+    "--output-to-directory",
+]
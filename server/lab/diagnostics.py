@@ -0,0 +1,121 @@
+import re
+
+# Unrecognized stderr lines kept in a build's diagnostics
+MAX_DIAGNOSTIC_MESSAGES = 50
+
+LAYER_NAME = re.compile(r'For layer (\d+), using name "(.*)"')
+FEATURE_SUMMARY = re.compile(
+    r"(\d+) features, (\d+) bytes of geometry, (\d+) bytes of separate metadata"
+)
+MAXIMUM_ZOOM = re.compile(r"Choosing a maxzoom of -z(\d+)")
+BASE_ZOOM = re.compile(r"Choosing a base zoom of -B(\d+)")
+DROP_RATE = re.compile(r"Choosing a drop rate of -r([\d.]+)")
+TILE_TOO_BIG = re.compile(r"tile (\d+)/(\d+)/(\d+) size is (\d+)", re.IGNORECASE)
+TILE_TOO_MANY_FEATURES = re.compile(
+    r"tile (\d+)/(\d+)/(\d+) has (\d+) features", re.IGNORECASE
+)
+KEEPING_FEATURES = re.compile(r"Going to try keeping .*?([\d.]+)% of the features")
+RETRY = re.compile(r"Going to try")
+UNFIT_TILE = re.compile(r"could not make tile (\d+)/(\d+)/(\d+) small enough")
+# Progress and read counters tippecanoe redraws with carriage returns
+PROGRESS = re.compile(r"^\s*(\d+(\.\d+)?%|Read [\d.]+ million features)")
+
+
+class TippecanoeDiagnostics:
+    """
+    Parse tippecanoe's stderr into structured diagnostics: the chosen zooms
+    and drop rate, and per zoom the tiles that came out too big, the retries
+    to make them fit and the share of features kept in tiles that dropped.
+    """
+
+    def __init__(self):
+        self.layers = {}
+        self.feature_count = None
+        self.maximum_zoom = None
+        self.base_zoom = None
+        self.drop_rate = None
+        self.zooms = {}
+        # Share of features the last retry of each dropping tile kept
+        self.kept_percent = {}
+        self.current_tile = None
+        self.tile_problems = set()
+        self.messages = []
+        self.message_count = 0
+
+    def zoom(self, z):
+        return self.zooms.setdefault(
+            z,
+            {
+                "too_big_tiles": 0,
+                "too_many_features_tiles": 0,
+                "retries": 0,
+                "unfit_tiles": 0,
+            },
+        )
+
+    def add_tile(self, match, problem):
+        # Each retry of a tile reports it again
+        tile = tuple(int(g) for g in match.groups()[:3])
+        if (tile, problem) not in self.tile_problems:
+            self.tile_problems.add((tile, problem))
+            self.zoom(tile[0])[problem] += 1
+        self.current_tile = tile
+
+    def add_line(self, line):
+        """
+        Record a line of stderr. Returns False for progress lines, which are
+        left to the caller.
+        """
+        if match := TILE_TOO_BIG.search(line):
+            self.add_tile(match, "too_big_tiles")
+        elif match := TILE_TOO_MANY_FEATURES.search(line):
+            self.add_tile(match, "too_many_features_tiles")
+        elif RETRY.search(line):
+            if self.current_tile is None:
+                return True
+            self.zoom(self.current_tile[0])["retries"] += 1
+            if match := KEEPING_FEATURES.search(line):
+                self.kept_percent[self.current_tile] = float(match.group(1))
+        elif match := UNFIT_TILE.search(line):
+            self.zoom(int(match.group(1)))["unfit_tiles"] += 1
+        elif match := MAXIMUM_ZOOM.search(line):
+            self.maximum_zoom = int(match.group(1))
+        elif match := BASE_ZOOM.search(line):
+            self.base_zoom = int(match.group(1))
+        elif match := DROP_RATE.search(line):
+            self.drop_rate = float(match.group(1))
+        elif match := FEATURE_SUMMARY.search(line):
+            self.feature_count = int(match.group(1))
+        elif match := LAYER_NAME.search(line):
+            self.layers[int(match.group(1))] = match.group(2)
+        elif PROGRESS.match(line):
+            return False
+        else:
+            self.message_count += 1
+            if len(self.messages) < MAX_DIAGNOSTIC_MESSAGES:
+                self.messages.append(line)
+        return True
+
+    def result(self):
+        zooms = {}
+        for z in sorted(self.zooms):
+            kept = [p for tile, p in self.kept_percent.items() if tile[0] == z]
+            zooms[str(z)] = {
+                **self.zooms[z],
+                "dropping_tiles": len(kept),
+                "min_kept_percent": min(kept) if kept else None,
+                "mean_kept_percent": sum(kept) / len(kept) if kept else None,
+            }
+        return {
+            "layers": [self.layers[i] for i in sorted(self.layers)],
+            "feature_count": self.feature_count,
+            "maximum_zoom": self.maximum_zoom,
+            "base_zoom": self.base_zoom,
+            "drop_rate": self.drop_rate,
+            "too_big_tiles": sum(z["too_big_tiles"] for z in self.zooms.values()),
+            "retries": sum(z["retries"] for z in self.zooms.values()),
+            "dropping_tiles": len(self.kept_percent),
+            "zooms": zooms,
+            "messages": self.messages,
+            "message_count": self.message_count,
+        }
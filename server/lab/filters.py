@@ -1,5 +1,5 @@
 import django_filters
-from .models import Tileset
+from .models import Tileset, StageTiming
 from .constants import TaskStatus
 
 
@@ -10,4 +10,17 @@ class TilesetFilter(django_filters.FilterSet):
 
     class Meta:
         model = Tileset
-        fields = ["status"]
+        fields = ["status", "sweep"]
+
+
+class StageTimingFilter(django_filters.FilterSet):
+    created_after = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lte"
+    )
+
+    class Meta:
+        model = StageTiming
+        fields = ["dataset", "tileset", "task", "stage", "succeeded"]
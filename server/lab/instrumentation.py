@@ -0,0 +1,121 @@
+import os
+import resource
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery import current_task
+
+from .models import StageTiming
+
+# The stage being recorded, so subprocesses waited anywhere inside it can
+# report their resource usage
+current_stage = ContextVar("current_stage", default=None)
+
+
+def reset_peak_rss():
+    """Reset this process's VmHWM so it tracks the peak of the next stage."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss():
+    """Return this process's peak RSS in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and covers the process's lifetime
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def wait_with_rusage(process):
+    """
+    Wait for a Popen process and return its exit code, reporting its CPU time
+    and peak RSS to the stage being recorded.
+    """
+    _, wait_status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    stage = current_stage.get()
+    if stage is not None:
+        stage.child_peak_rss = max(stage.child_peak_rss, rusage.ru_maxrss * 1024)
+    return process.returncode
+
+
+class StageTimer:
+    def __init__(self):
+        self.bytes_moved = None
+        self.succeeded = True
+        self.child_peak_rss = 0
+
+
+@contextmanager
+def record_stage(stage, dataset, tileset=None):
+    """
+    Record the wall time, CPU time (including waited subprocesses), peak RSS
+    and bytes moved of a build stage as a StageTiming. The yielded timer
+    takes bytes_moved and can be marked as failed; exceptions mark it too.
+    """
+    timer = StageTimer()
+    token = current_stage.set(timer)
+    peak_reset = reset_peak_rss()
+
+    wall_start = time.perf_counter()
+    self_start = resource.getrusage(resource.RUSAGE_SELF)
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    try:
+        yield timer
+    except Exception:
+        timer.succeeded = False
+        raise
+    finally:
+        current_stage.reset(token)
+        wall_seconds = time.perf_counter() - wall_start
+        self_end = resource.getrusage(resource.RUSAGE_SELF)
+        children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_seconds = (
+            self_end.ru_utime
+            - self_start.ru_utime
+            + self_end.ru_stime
+            - self_start.ru_stime
+            + children_end.ru_utime
+            - children_start.ru_utime
+            + children_end.ru_stime
+            - children_start.ru_stime
+        )
+        # Subprocesses not waited through wait_with_rusage still show up when
+        # they raise the peak of all reaped children
+        if children_end.ru_maxrss > children_start.ru_maxrss:
+            timer.child_peak_rss = max(
+                timer.child_peak_rss, children_end.ru_maxrss * 1024
+            )
+
+        try:
+            StageTiming.objects.create(
+                dataset=dataset,
+                tileset=tileset,
+                task=current_task.name if current_task else "",
+                stage=stage,
+                succeeded=timer.succeeded,
+                wall_seconds=wall_seconds,
+                cpu_seconds=cpu_seconds,
+                peak_rss_bytes=max(read_peak_rss(), timer.child_peak_rss),
+                peak_rss_is_lifetime=not peak_reset,
+                bytes_moved=timer.bytes_moved,
+            )
+        except Exception as e:
+            print(f"Warning: Failed to record timing of stage {stage}: {e}")
+
+        print(
+            f"Stage {stage}: {wall_seconds:.2f}s wall, {cpu_seconds:.2f}s CPU"
+            + (f", {timer.bytes_moved} bytes" if timer.bytes_moved else "")
+        )
@@ -0,0 +1,221 @@
+import os
+import time
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_prerun, task_postrun
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Celery workers run their pool processes with PROMETHEUS_MULTIPROC_DIR set so
+# every process writes its samples there and the worker serves them together
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+SIZE_BUCKETS = tuple(4**i * 1024 * 1024 for i in range(9))  # 1 MiB to 64 GiB
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, per view and DRF action",
+    ["view", "action", "method", "status"],
+)
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Run time of Celery tasks",
+    ["task", "state"],
+    buckets=DURATION_BUCKETS,
+)
+
+TIPPECANOE_DURATION = Histogram(
+    "tippecanoe_duration_seconds",
+    "Run time of tippecanoe",
+    ["outcome"],
+    buckets=DURATION_BUCKETS,
+)
+
+TIPPECANOE_OUTPUT_BYTES = Histogram(
+    "tippecanoe_output_bytes",
+    "Size of the PMTiles archives written by tippecanoe",
+    buckets=SIZE_BUCKETS,
+)
+
+S3_TRANSFER_BYTES = Counter(
+    "s3_transfer_bytes",
+    "Bytes moved to and from object storage",
+    ["direction"],
+)
+
+S3_TRANSFER_DURATION = Histogram(
+    "s3_transfer_duration_seconds",
+    "Duration of object storage transfers",
+    ["direction"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Round trip time of Redis commands and pipelines",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+
+class InstrumentedConnection(redis.Connection):
+    """Redis connection that observes the time from a send to its reply."""
+
+    _sent_at = None
+
+    def send_packed_command(self, command, check_health=True):
+        self._sent_at = time.perf_counter()
+        super().send_packed_command(command, check_health)
+
+    def read_response(self, *args, **kwargs):
+        response = super().read_response(*args, **kwargs)
+        # Pub/sub messages arrive without a command being sent
+        if self._sent_at is not None:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - self._sent_at)
+            self._sent_at = None
+        return response
+
+
+class S3TransferTracker:
+    """Times an S3 transfer and counts its bytes through boto3's Callback."""
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.bytes = S3_TRANSFER_BYTES.labels(direction)
+
+    def __call__(self, bytes_amount):
+        self.bytes.inc(bytes_amount)
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        S3_TRANSFER_DURATION.labels(self.direction).observe(
+            time.perf_counter() - self.started_at
+        )
+
+
+class QueueLengthCollector:
+    """Report the number of messages waiting in each Celery queue at scrape time."""
+
+    def __init__(self, broker_url, queues):
+        self.client = redis.Redis.from_url(broker_url)
+        self.queues = queues
+
+    def family(self):
+        return GaugeMetricFamily(
+            "celery_queue_length",
+            "Messages waiting in a Celery queue",
+            labels=["queue"],
+        )
+
+    def describe(self):
+        # Lets the registry check names without querying the broker
+        yield self.family()
+
+    def collect(self):
+        family = self.family()
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for queue in self.queues:
+                pipeline.llen(queue)
+            for queue, length in zip(self.queues, pipeline.execute()):
+                family.add_metric([queue], length)
+        except redis.RedisError as e:
+            print(f"Failed to read Celery queue lengths: {e}")
+        yield family
+
+
+_task_started_at = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started_at
+        )
+
+
+class MetricsMiddleware:
+    """Observe request latency labelled by the resolved view and DRF action."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Stay async under ASGI so the async progress streams are not pushed
+        # onto a thread
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started_at = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started_at)
+        return response
+
+    async def __acall__(self, request):
+        started_at = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started_at)
+        return response
+
+    def observe(self, request, response, started_at):
+        match = request.resolver_match
+        if match is None:
+            return
+        view_class = getattr(match.func, "cls", None)
+        actions = getattr(match.func, "actions", None) or {}
+        REQUEST_DURATION.labels(
+            view_class.__name__ if view_class else match.func.__name__,
+            actions.get(request.method.lower(), ""),
+            request.method,
+            response.status_code,
+        ).observe(time.perf_counter() - started_at)
+
+
+def register_queue_collector(broker_url, queues):
+    REGISTRY.register(QueueLengthCollector(broker_url, queues))
+
+
+def render_metrics():
+    """Return the (body, content type) of the metrics exposition."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics_server(port):
+    """
+    Serve the samples of every pool process of this worker. Called in the
+    worker's main process before the pool starts.
+    """
+    if MULTIPROCESS_DIR:
+        # The directory is created empty by the container command, since
+        # metrics without labels open their files as soon as they are defined
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    print(f"Serving worker metrics on port {port}")
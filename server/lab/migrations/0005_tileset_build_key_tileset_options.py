@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0004_alter_tierlist_method"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tileset",
+            name="build_key",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="tileset",
+            name="options",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
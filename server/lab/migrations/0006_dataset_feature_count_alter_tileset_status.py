@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0005_tileset_build_key_tileset_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="feature_count",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="tileset",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("in_progress", "IN_PROGRESS"),
+                    ("completed", "COMPLETED"),
+                    ("failed", "FAILED"),
+                    ("waiting", "WAITING"),
+                ],
+                default="in_progress",
+                max_length=50,
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0007_uploadsession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StageTiming",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task", models.CharField(blank=True, max_length=255)),
+                ("stage", models.CharField(db_index=True, max_length=50)),
+                ("succeeded", models.BooleanField(default=True)),
+                ("wall_seconds", models.FloatField()),
+                ("cpu_seconds", models.FloatField()),
+                ("peak_rss_bytes", models.BigIntegerField()),
+                ("peak_rss_is_lifetime", models.BooleanField(default=False)),
+                ("bytes_moved", models.BigIntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stage_timings",
+                        to="lab.dataset",
+                    ),
+                ),
+                (
+                    "tileset",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stage_timings",
+                        to="lab.tileset",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0008_stagetiming"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="numeric_fields",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0009_dataset_numeric_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tierlist",
+            name="algorithm",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+        migrations.AddField(
+            model_name="tierlist",
+            name="sample_size",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
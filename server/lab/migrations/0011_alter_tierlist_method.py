@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0010_tierlist_algorithm_sample_size"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tierlist",
+            name="method",
+            field=models.CharField(
+                choices=[
+                    ("quantile", "QUANTILE"),
+                    ("natural_breaks", "NATURAL_BREAKS"),
+                    ("percentile", "PERCENTILE"),
+                    ("equal_interval", "EQUAL_INTERVAL"),
+                    ("std_mean", "STD_MEAN"),
+                    ("head_tail", "HEAD_TAIL"),
+                ],
+                default="quantile",
+                max_length=50,
+            ),
+        ),
+    ]
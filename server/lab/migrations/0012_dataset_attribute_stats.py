@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0011_alter_tierlist_method"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="attribute_stats",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lab", "0012_dataset_attribute_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="profile",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
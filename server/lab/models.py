@@ -1,5 +1,9 @@
 from django.db import models
-from .constants import TASK_STATUS_CHOICES, CLASSIFICATION_METHOD_CHOICES
+from .constants import (
+    TASK_STATUS_CHOICES,
+    CLASSIFICATION_METHOD_CHOICES,
+    UPLOAD_STATUS_CHOICES,
+)
 
 
 class Dataset(models.Model):
@@ -14,6 +18,34 @@ class Dataset(models.Model):
     prj_file = models.FileField(upload_to="datasets/shapefile/", null=True, blank=True)
     cpg_file = models.FileField(upload_to="datasets/shapefile/", null=True, blank=True)
 
+    feature_count = models.IntegerField(null=True, blank=True)
+    # Numeric fields in the column store, set once the columns are indexed
+    numeric_fields = models.JSONField(null=True, blank=True)
+    # Summary statistics and histogram of each numeric field, by field
+    attribute_stats = models.JSONField(null=True, blank=True)
+    # Geometry, extent and attribute size profile from the ingest pass
+    profile = models.JSONField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Sweep(models.Model):
+    """
+    Benchmark of tippecanoe option sets on one dataset, built in parallel as
+    one tileset each and compared in a report.
+    """
+
+    dataset = models.ForeignKey(
+        Dataset, on_delete=models.CASCADE, related_name="sweeps"
+    )
+    name = models.CharField(max_length=255)
+    # Largest tile size a build may have to count as good enough
+    max_tile_bytes = models.IntegerField()
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -25,12 +57,21 @@ class Tileset(models.Model):
     dataset = models.ForeignKey(
         Dataset, on_delete=models.CASCADE, related_name="tilesets"
     )
+    sweep = models.ForeignKey(
+        Sweep,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tilesets",
+    )
     name = models.CharField(max_length=255)
     pmtiles_file = models.FileField(upload_to="datasets/pmtiles/")
     status = models.CharField(
         max_length=50, choices=TASK_STATUS_CHOICES, default=TASK_STATUS_CHOICES[0][0]
     )
     metadata = models.JSONField(null=True, blank=True)
+    options = models.JSONField(null=True, blank=True)
+    build_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -39,6 +80,34 @@ class Tileset(models.Model):
         return self.name
 
 
+class UploadSession(models.Model):
+    """
+    Direct-to-storage multipart upload of a dataset's files. files maps each
+    dataset file field to its object name, multipart upload id and part layout.
+    """
+
+    name = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=50,
+        choices=UPLOAD_STATUS_CHOICES,
+        default=UPLOAD_STATUS_CHOICES[0][0],
+    )
+    files = models.JSONField(default=dict)
+    dataset = models.ForeignKey(
+        Dataset,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="upload_sessions",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"UploadSession for {self.name} ({self.status})"
+
+
 class TierList(models.Model):
     dataset = models.ForeignKey(
         Dataset, on_delete=models.CASCADE, related_name="tier_lists"
@@ -50,9 +119,42 @@ class TierList(models.Model):
         default=CLASSIFICATION_METHOD_CHOICES[0][0],
     )
     breaks = models.JSONField()
+    # How the breaks were computed, and from how many sampled values when
+    # they come from a sample rather than every value
+    algorithm = models.CharField(max_length=50, blank=True, default="")
+    sample_size = models.IntegerField(null=True, blank=True)
 
     class Meta:
         unique_together = ("dataset", "field", "method")
 
     def __str__(self):
         return f"TierList for {self.dataset.name} - {self.field} ({self.method})"
+
+
+class StageTiming(models.Model):
+    """Resource usage of one stage of a dataset or tileset build."""
+
+    dataset = models.ForeignKey(
+        Dataset, on_delete=models.CASCADE, related_name="stage_timings"
+    )
+    tileset = models.ForeignKey(
+        Tileset,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="stage_timings",
+    )
+    task = models.CharField(max_length=255, blank=True)
+    stage = models.CharField(max_length=50, db_index=True)
+    succeeded = models.BooleanField(default=True)
+    wall_seconds = models.FloatField()
+    cpu_seconds = models.FloatField()
+    peak_rss_bytes = models.BigIntegerField()
+    # Set when the peak could not be reset per stage and covers the process
+    peak_rss_is_lifetime = models.BooleanField(default=False)
+    bytes_moved = models.BigIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.stage} of {self.dataset.name} ({self.wall_seconds:.2f}s)"
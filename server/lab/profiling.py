@@ -0,0 +1,210 @@
+import math
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Zoom range auto mode picks the maximum zoom from, and the zoom the tiling
+# throughput measured on past builds is assumed to be for
+MIN_AUTO_ZOOM = 4
+MAX_AUTO_ZOOM = 16
+REFERENCE_ZOOM = 14
+
+# Rough encoded size of a vertex in a vector tile (zigzag varint deltas)
+BYTES_PER_VERTEX = 4
+
+
+def value_size(value):
+    """Approximate encoded size of an attribute value in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value)
+    return len(str(value))
+
+
+class DatasetProfiler:
+    """
+    Accumulate the profile of a dataset's features during the ingest pass:
+    geometry types, vertex counts, bounding box and attribute sizes.
+    """
+
+    def __init__(self):
+        self.feature_count = 0
+        self.input_bytes = 0
+        self.geometry_types = Counter()
+        self.vertex_counts = array("q")
+        self.attribute_bytes = Counter()
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+
+    def add(self, geometry, properties, size=0):
+        self.feature_count += 1
+        self.input_bytes += size
+
+        if geometry:
+            self.geometry_types[geometry["type"]] += 1
+            self.vertex_counts.append(self._add_geometry(geometry))
+
+        if properties:
+            for field, value in properties.items():
+                self.attribute_bytes[field] += value_size(value)
+
+    def _add_geometry(self, geometry):
+        if geometry["type"] == "GeometryCollection":
+            return sum(self._add_geometry(g) for g in geometry["geometries"])
+        return self._add_coordinates(geometry["coordinates"])
+
+    def _add_coordinates(self, coordinates):
+        if not coordinates:
+            return 0
+
+        # A single position, as in points
+        if isinstance(coordinates[0], (int, float)):
+            x, y = coordinates[0], coordinates[1]
+            bounds = self.bounds
+            bounds[0], bounds[1] = min(bounds[0], x), min(bounds[1], y)
+            bounds[2], bounds[3] = max(bounds[2], x), max(bounds[3], y)
+            return 1
+
+        # A line or ring of positions
+        if isinstance(coordinates[0][0], (int, float)):
+            positions = np.asarray(coordinates, dtype=np.float64)
+            low = positions[:, :2].min(axis=0)
+            high = positions[:, :2].max(axis=0)
+            bounds = self.bounds
+            bounds[0], bounds[1] = min(bounds[0], low[0]), min(bounds[1], low[1])
+            bounds[2], bounds[3] = max(bounds[2], high[0]), max(bounds[3], high[1])
+            return len(positions)
+
+        return sum(self._add_coordinates(part) for part in coordinates)
+
+    def result(self):
+        vertex_counts = np.frombuffer(self.vertex_counts, dtype=np.int64)
+        has_bounds = self.bounds[0] <= self.bounds[2]
+        width = self.bounds[2] - self.bounds[0] if has_bounds else 0.0
+        height = self.bounds[3] - self.bounds[1] if has_bounds else 0.0
+        area = width * height
+
+        profile = {
+            "feature_count": self.feature_count,
+            "input_bytes": self.input_bytes,
+            "geometry_types": dict(self.geometry_types),
+            "bounds": self.bounds if has_bounds else None,
+            "vertices": None,
+            "features_per_square_degree": (
+                self.feature_count / area if area > 0 else None
+            ),
+            "attribute_bytes": {
+                field: total / self.feature_count
+                for field, total in self.attribute_bytes.items()
+            },
+            "mean_attribute_bytes": (
+                sum(self.attribute_bytes.values()) / self.feature_count
+                if self.feature_count
+                else 0
+            ),
+        }
+        if vertex_counts.size:
+            p50, p95, p99 = np.percentile(vertex_counts, [50, 95, 99]).tolist()
+            profile["vertices"] = {
+                "total": int(vertex_counts.sum()),
+                "mean": float(vertex_counts.mean()),
+                "min": int(vertex_counts.min()),
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": int(vertex_counts.max()),
+            }
+        return profile
+
+
+def count_tiles(bounds, zoom):
+    """Approximate number of tiles covering the bounds at a zoom level."""
+    tiles_per_degree = 2**zoom / 360
+    columns = max(1, math.ceil((bounds[2] - bounds[0]) * tiles_per_degree))
+    rows = max(1, math.ceil((bounds[3] - bounds[1]) * tiles_per_degree))
+    return min(columns * rows, 4**zoom)
+
+
+def choose_tippecanoe_options(
+    profile, target_tile_bytes, build_seconds_budget, bytes_per_second
+):
+    """
+    Pick tippecanoe options from a dataset profile that aim for tiles under
+    target_tile_bytes and a build within build_seconds_budget, given the
+    tiling throughput of past builds. Returns (options, decisions).
+    """
+    vertices = profile["vertices"] or {"total": profile["feature_count"], "mean": 1}
+    bounds = profile["bounds"] or [-180, -85, 180, 85]
+
+    # Deepest zoom needed to resolve the average spacing between vertices
+    # with 256 pixels per tile
+    area = max((bounds[2] - bounds[0]) * (bounds[3] - bounds[1]), 1e-12)
+    spacing = math.sqrt(area / max(vertices["total"], 1))
+    detail_zoom = math.ceil(math.log2(360 / spacing) - 8)
+    max_zoom = min(max(detail_zoom, MIN_AUTO_ZOOM), MAX_AUTO_ZOOM)
+
+    # Each zoom level writes every surviving feature once more, so build time
+    # grows about linearly with the number of zoom levels
+    def estimate_seconds(zoom):
+        return (
+            profile["input_bytes"]
+            / bytes_per_second
+            * (zoom + 1)
+            / (REFERENCE_ZOOM + 1)
+        )
+
+    while (
+        max_zoom > MIN_AUTO_ZOOM and estimate_seconds(max_zoom) > build_seconds_budget
+    ):
+        max_zoom -= 1
+
+    options = [
+        "--maximum-zoom",
+        str(max_zoom),
+        "--maximum-tile-bytes",
+        str(target_tile_bytes),
+    ]
+
+    # Polygons are merged into their neighbours rather than leaving holes
+    geometry_types = Counter()
+    for name, count in profile["geometry_types"].items():
+        geometry_types[name.removeprefix("Multi")] += count
+    geometry_type = geometry_types.most_common(1)[0][0] if geometry_types else None
+    if geometry_type == "Polygon":
+        options.append("--coalesce-densest-as-needed")
+    else:
+        options.append("--drop-densest-as-needed")
+
+    # When even the deepest zoom would hold tiles over the target, let
+    # tippecanoe add zooms until it stops dropping, if the budget has room
+    feature_bytes = (
+        vertices["mean"] * BYTES_PER_VERTEX + profile["mean_attribute_bytes"]
+    )
+    tile_bytes = (
+        profile["feature_count"] * feature_bytes / count_tiles(bounds, max_zoom)
+    )
+    extend_zooms = (
+        tile_bytes > target_tile_bytes
+        and max_zoom < MAX_AUTO_ZOOM
+        and estimate_seconds(max_zoom + 2) <= build_seconds_budget
+    )
+    if extend_zooms:
+        options.append("--extend-zooms-if-still-dropping")
+
+    decisions = {
+        "detail_zoom": detail_zoom,
+        "maximum_zoom": max_zoom,
+        "geometry_type": geometry_type,
+        "estimated_build_seconds": estimate_seconds(max_zoom),
+        "estimated_max_zoom_tile_bytes": tile_bytes,
+        "extend_zooms": extend_zooms,
+        "target_tile_bytes": target_tile_bytes,
+        "build_seconds_budget": build_seconds_budget,
+        "bytes_per_second": bytes_per_second,
+    }
+    return options, decisions
@@ -0,0 +1,103 @@
+import json
+
+import redis.asyncio as aioredis
+
+from .constants import TaskStatus
+
+TERMINAL_STATUSES = {TaskStatus.COMPLETED.value, TaskStatus.FAILED.value}
+
+# Interval at which an idle stream sends an SSE comment, so proxies and
+# clients do not treat the connection as dead.
+KEEP_ALIVE_SECONDS = 15
+
+
+def get_progress_channel(redis_key):
+    return f"progress:{redis_key}"
+
+
+def publish_progress(redis_client, redis_key, status, progress, stage=None):
+    """
+    Store the latest progress in the Redis hash read by the progress endpoints
+    and publish it to subscribers of the key's progress channel.
+    """
+    event = {"status": status, "progress": progress}
+    if stage:
+        event["stage"] = stage
+
+    pipeline = redis_client.pipeline()
+    if not stage:
+        pipeline.hdel(redis_key, "stage")
+    pipeline.hset(redis_key, mapping=event)
+    pipeline.publish(get_progress_channel(redis_key), json.dumps(event))
+    pipeline.execute()
+
+
+def decode_progress(progress_obj, default_status):
+    data = {k.decode(): v.decode() for k, v in progress_obj.items()}
+    event = {
+        "status": data.get("status", default_status),
+        "progress": int(data.get("progress", 0)),
+    }
+    if data.get("stage"):
+        event["stage"] = data["stage"]
+    return event
+
+
+def read_progress_batch(redis_client, redis_keys):
+    """
+    Read the progress hashes of many keys in one pipelined round trip. Returns
+    a dict of key to raw hash, with keys that have no progress left out.
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    for redis_key in redis_keys:
+        pipeline.hgetall(redis_key)
+    results = pipeline.execute()
+    return {
+        redis_key: progress_obj
+        for redis_key, progress_obj in zip(redis_keys, results)
+        if progress_obj
+    }
+
+
+def format_event(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def stream_progress(redis_key, default_status, extra_fields):
+    """
+    Yield Server-Sent Events for the key: the current state first, then every
+    published update until the task completes or fails.
+    """
+    client = aioredis.Redis(host="redis", port=6379, db=0)
+    pubsub = client.pubsub()
+    # Subscribe before reading the current state so no update published in
+    # between is missed
+    await pubsub.subscribe(get_progress_channel(redis_key))
+
+    try:
+        progress_obj = await client.hgetall(redis_key)
+        if progress_obj:
+            event = decode_progress(progress_obj, default_status)
+        else:
+            event = {"status": default_status, "progress": 0}
+
+        yield format_event({**extra_fields, **event})
+        if event["status"] in TERMINAL_STATUSES:
+            return
+
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=KEEP_ALIVE_SECONDS
+            )
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+
+            event = json.loads(message["data"])
+            yield format_event({**extra_fields, **event})
+            if event["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
@@ -1,5 +1,56 @@
+import math
+import shlex
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Dataset, Tileset, TierList
+from .models import Dataset, Tileset, TierList, UploadSession, StageTiming, Sweep
+from .constants import CLASSIFICATION_METHOD_CHOICES, SERVER_MANAGED_OPTIONS
+from .sweeps import expand_option_grid
+
+DATASET_FILE_EXTENSIONS = {
+    "geojson_file": [".geojson", ".json"],
+    "shp_file": [".shp"],
+    "shx_file": [".shx"],
+    "dbf_file": [".dbf"],
+    "prj_file": [".prj"],
+    "cpg_file": [".cpg"],
+}
+
+DATASET_FILE_FIELDS = list(DATASET_FILE_EXTENSIONS)
+
+# Upper bound of the class count of custom classifications
+MAX_CLASSES = 20
+
+
+def validate_dataset_filenames(filenames):
+    """
+    Validate a mapping of dataset file field to file name: either a GeoJSON
+    file OR all required shapefile components, each with a valid extension.
+    """
+    has_geojson = "geojson_file" in filenames
+    has_required_shp = all(
+        field_name in filenames for field_name in ["shp_file", "shx_file", "dbf_file"]
+    )
+
+    if not has_geojson and not has_required_shp:
+        raise serializers.ValidationError(
+            "Either 'geojson_file' or all required shapefile components "
+            "('shp_file', 'shx_file', 'dbf_file') must be provided."
+        )
+
+    if has_geojson and has_required_shp:
+        raise serializers.ValidationError(
+            "Please provide either 'geojson_file' OR shapefile components, not both."
+        )
+
+    for field_name, filename in filenames.items():
+        valid_extensions = DATASET_FILE_EXTENSIONS[field_name]
+        if not filename.lower().endswith(tuple(valid_extensions)):
+            raise serializers.ValidationError(
+                {
+                    field_name: f"File must have one of these extensions: {', '.join(valid_extensions)}"
+                }
+            )
 
 
 class DatasetSerializer(serializers.ModelSerializer):
@@ -23,60 +74,15 @@ class DatasetSerializer(serializers.ModelSerializer):
         """
         Validate that either geojson_file OR all required shapefile components are provided
         """
-        geojson_file = data.get("geojson_file")
-        shp_file = data.get("shp_file")
-        shx_file = data.get("shx_file")
-        dbf_file = data.get("dbf_file")
-
-        has_geojson = geojson_file is not None
-        has_required_shp = all([shp_file, shx_file, dbf_file])
-
-        if not has_geojson and not has_required_shp:
-            raise serializers.ValidationError(
-                "Either 'geojson_file' or all required shapefile components "
-                "('shp_file', 'shx_file', 'dbf_file') must be provided."
-            )
-
-        if has_geojson and has_required_shp:
-            raise serializers.ValidationError(
-                "Please provide either 'geojson_file' OR shapefile components, not both."
-            )
-
-        if has_required_shp:
-            self._validate_shapefile_extensions(data)
-
-        if has_geojson:
-            self._validate_geojson_extension(geojson_file)
-
+        validate_dataset_filenames(
+            {
+                field_name: data[field_name].name
+                for field_name in DATASET_FILE_FIELDS
+                if data.get(field_name) is not None
+            }
+        )
         return data
 
-    def _validate_shapefile_extensions(self, data):
-        file_validations = {
-            "shp_file": [".shp"],
-            "shx_file": [".shx"],
-            "dbf_file": [".dbf"],
-            "prj_file": [".prj"],
-            "cpg_file": [".cpg"],
-        }
-
-        for field_name, valid_extensions in file_validations.items():
-            file_obj = data.get(field_name)
-            if file_obj:
-                filename = file_obj.name.lower()
-                if not any(filename.endswith(ext) for ext in valid_extensions):
-                    raise serializers.ValidationError(
-                        {
-                            field_name: f"File must have one of these extensions: {', '.join(valid_extensions)}"
-                        }
-                    )
-
-    def _validate_geojson_extension(self, geojson_file):
-        filename = geojson_file.name.lower()
-        if not (filename.endswith(".geojson") or filename.endswith(".json")):
-            raise serializers.ValidationError(
-                {"geojson_file": "File must have .geojson or .json extension"}
-            )
-
 
 class TilesetSerializer(serializers.ModelSerializer):
     dataset_name = serializers.CharField(source="dataset.name", read_only=True)
@@ -91,6 +97,7 @@ class TilesetSerializer(serializers.ModelSerializer):
             "pmtiles_file",
             "status",
             "metadata",
+            "options",
             "created_at",
             "updated_at",
         ]
@@ -102,9 +109,115 @@ class TilesetSerializer(serializers.ModelSerializer):
             "pmtiles_file",
             "status",
             "metadata",
+            "options",
+            "created_at",
+            "updated_at",
+        ]
+
+
+def parse_tippecanoe_options(raw_options):
+    """Split an option string, rejecting options the server manages."""
+    try:
+        options = shlex.split(raw_options)
+    except ValueError as e:
+        raise serializers.ValidationError(f"Invalid options format: {str(e)}")
+
+    for opt in options:
+        if opt in SERVER_MANAGED_OPTIONS:
+            raise serializers.ValidationError(
+                f"Option '{opt}' is not allowed. Input/output paths are managed by the server."
+            )
+    return options
+
+
+class SweepSerializer(serializers.ModelSerializer):
+    tilesets = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Sweep
+        fields = [
+            "id",
+            "dataset",
+            "name",
+            "max_tile_bytes",
+            "tilesets",
             "created_at",
             "updated_at",
         ]
+        read_only_fields = fields
+
+
+class SweepCreateSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    option_sets = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="Raw tippecanoe option strings, one build each",
+    )
+    grid = serializers.DictField(
+        child=serializers.ListField(child=serializers.JSONField(), min_length=1),
+        required=False,
+        help_text=(
+            "Candidate values of each option, built in every combination: "
+            "true passes the option as a flag, false or null leaves it out and "
+            "anything else is its argument"
+        ),
+    )
+    base_options = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        default="",
+        help_text="Options prepended to every combination of the grid",
+    )
+    max_tile_bytes = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text="Largest tile size of a good enough build",
+    )
+
+    def validate_base_options(self, value):
+        parse_tippecanoe_options(value)
+        return value
+
+    def validate_grid(self, value):
+        for option, values in value.items():
+            if not option.startswith("-"):
+                raise serializers.ValidationError(f"'{option}' is not an option")
+            for v in values:
+                if isinstance(v, (list, dict)):
+                    raise serializers.ValidationError(
+                        f"Values of '{option}' must be scalars"
+                    )
+        # Checked before expanding, so a large grid is never materialized
+        combinations = math.prod(len(values) for values in value.values())
+        if combinations > settings.SWEEP_MAX_BUILDS:
+            raise serializers.ValidationError(
+                f"The grid has {combinations} combinations, more than the "
+                f"{settings.SWEEP_MAX_BUILDS} allowed."
+            )
+        return value
+
+    def validate(self, data):
+        option_sets = list(data.get("option_sets", []))
+        if data.get("grid"):
+            option_sets += expand_option_grid(data["grid"], data["base_options"])
+        option_sets = list(dict.fromkeys(option_sets))
+
+        if not option_sets:
+            raise serializers.ValidationError("Provide option_sets, a grid or both.")
+        if len(option_sets) > settings.SWEEP_MAX_BUILDS:
+            raise serializers.ValidationError(
+                f"The sweep has {len(option_sets)} option sets, more than the "
+                f"{settings.SWEEP_MAX_BUILDS} allowed."
+            )
+
+        data["options"] = []
+        for raw_options in option_sets:
+            options = parse_tippecanoe_options(raw_options)
+            if not options:
+                raise serializers.ValidationError("Option sets must not be empty.")
+            data["options"].append(options)
+        return data
 
 
 class TierListSerializer(serializers.ModelSerializer):
@@ -116,6 +229,8 @@ class TierListSerializer(serializers.ModelSerializer):
             "field",
             "method",
             "breaks",
+            "algorithm",
+            "sample_size",
         ]
         read_only_fields = [
             "id",
@@ -123,4 +238,89 @@ class TierListSerializer(serializers.ModelSerializer):
             "field",
             "method",
             "breaks",
+            "algorithm",
+            "sample_size",
+        ]
+
+
+class ClassifyRequestSerializer(serializers.Serializer):
+    field = serializers.CharField(max_length=255)
+    method = serializers.ChoiceField(choices=CLASSIFICATION_METHOD_CHOICES)
+    k = serializers.IntegerField(min_value=2, max_value=MAX_CLASSES, default=5)
+    percentiles = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=100),
+        required=False,
+        min_length=1,
+        max_length=MAX_CLASSES,
+        help_text="Percentiles of the percentile method, 1-10-50-90-99-100 by default",
+    )
+
+    def validate_percentiles(self, value):
+        return sorted(set(value))
+
+
+class UploadFileSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_filename(self, value):
+        if "/" in value or "\\" in value:
+            raise serializers.ValidationError(
+                "File name must not contain path separators."
+            )
+        return value
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    geojson_file = UploadFileSerializer(required=False)
+    shp_file = UploadFileSerializer(required=False)
+    shx_file = UploadFileSerializer(required=False)
+    dbf_file = UploadFileSerializer(required=False)
+    prj_file = UploadFileSerializer(required=False)
+    cpg_file = UploadFileSerializer(required=False)
+
+    def validate(self, data):
+        validate_dataset_filenames(
+            {
+                field_name: data[field_name]["filename"]
+                for field_name in DATASET_FILE_FIELDS
+                if field_name in data
+            }
+        )
+        return data
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "name",
+            "status",
+            "dataset",
+            "files",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class StageTimingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StageTiming
+        fields = [
+            "id",
+            "dataset",
+            "tileset",
+            "task",
+            "stage",
+            "succeeded",
+            "wall_seconds",
+            "cpu_seconds",
+            "peak_rss_bytes",
+            "peak_rss_is_lifetime",
+            "bytes_moved",
+            "created_at",
         ]
+        read_only_fields = fields
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_delete
 from django.dispatch import receiver
 from django.core.management import call_command
 import os
+from .models import Tileset
+from .utils import invalidate_presigned_url
 
 
 @receiver(post_migrate)
@@ -14,3 +16,12 @@ def generate_api_schema(sender, **kwargs):
         call_command("spectacular", "--file", schema_path)
     except Exception as e:
         print(f"Error generating API schema: {e}")
+
+
+@receiver(post_delete, sender=Tileset)
+def invalidate_tileset_presigned_url(sender, instance, **kwargs):
+    """
+    Drop the cached presigned URL of a deleted tileset's PMTiles object.
+    """
+    if instance.pmtiles_file:
+        invalidate_presigned_url(instance.pmtiles_file.name)
@@ -0,0 +1,65 @@
+import json
+import os
+
+from .columns import ColumnBuilder
+from .profiling import DatasetProfiler
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def open_pipe():
+    """Return (reader, writer) file objects for a new OS pipe."""
+    read_fd, write_fd = os.pipe()
+    return os.fdopen(read_fd, "rb"), os.fdopen(write_fd, "wb")
+
+
+def tee_stream(source, sinks):
+    """
+    Copy the source stream to every sink in chunks and close the sinks at the
+    end. A sink whose reader has gone away is dropped so the others keep
+    flowing; returns the names of the sinks that failed.
+    """
+    failed = set()
+    try:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            for name, sink in sinks.items():
+                if name in failed:
+                    continue
+                try:
+                    sink.write(chunk)
+                except (BrokenPipeError, OSError, ValueError) as e:
+                    print(f"Stopped streaming to {name}: {e}")
+                    failed.add(name)
+    finally:
+        for name, sink in sinks.items():
+            try:
+                sink.close()
+            except (BrokenPipeError, OSError, ValueError):
+                failed.add(name)
+    return failed
+
+
+def read_geojsonseq_columns(stream, fields=None):
+    """
+    Collect the numeric columns of a GeoJSONSeq stream, discovering the
+    numeric fields from the values unless they are given, and profile its
+    features. Returns (columns, profile).
+    """
+    builder = ColumnBuilder(fields)
+    profiler = DatasetProfiler()
+    with stream:
+        for line in stream:
+            size = len(line)
+            # Lines may carry the RFC 8142 record separator
+            line = line.strip().lstrip(b"\x1e")
+            if not line:
+                continue
+            feature = json.loads(line)
+            builder.add(feature.get("properties"))
+            profiler.add(feature.get("geometry"), feature.get("properties"), size)
+
+    print(f"Loaded {builder.feature_count} features")
+    return builder.columns(), profiler.result()
@@ -0,0 +1,128 @@
+import itertools
+import shlex
+
+from django.db.models import Q
+
+from .constants import TaskStatus
+from .models import StageTiming
+
+
+def expand_option_grid(grid, base_options=""):
+    """
+    Expand a grid of tippecanoe options to their candidate values into one
+    option string per combination, each starting with base_options. True
+    passes an option as a flag, false or null leaves it out and any other
+    value is passed as its argument.
+    """
+    option_sets = []
+    for combination in itertools.product(*grid.values()):
+        args = shlex.split(base_options)
+        for option, value in zip(grid, combination):
+            if value is True:
+                args.append(option)
+            elif value is not None and value is not False:
+                args.extend([option, str(value)])
+        option_sets.append(shlex.join(args))
+    return option_sets
+
+
+def get_sweep_status(statuses):
+    if any(s in (TaskStatus.IN_PROGRESS, TaskStatus.WAITING) for s in statuses):
+        return TaskStatus.IN_PROGRESS.value
+    if statuses and all(s == TaskStatus.FAILED for s in statuses):
+        return TaskStatus.FAILED.value
+    return TaskStatus.COMPLETED.value
+
+
+def build_sweep_report(sweep):
+    """
+    Compare the builds of a sweep by tiling time, CPU time, peak memory,
+    PMTiles size, tile sizes per zoom and the features tippecanoe dropped to
+    fit tiles, and recommend the fastest completed
+    build whose largest tile stays within the sweep's max_tile_bytes.
+    """
+    tilesets = list(sweep.tilesets.order_by("id"))
+
+    # A build reused from an identical earlier one has no tiling stage of its
+    # own, so it is timed by the stage of the build with the same key
+    build_keys = [tileset.build_key for tileset in tilesets if tileset.build_key]
+    timings_by_tileset = {}
+    timings_by_build_key = {}
+    for timing in (
+        StageTiming.objects.filter(stage="tiling")
+        .filter(Q(tileset__in=tilesets) | Q(tileset__build_key__in=build_keys))
+        .select_related("tileset")
+        .order_by("created_at")
+    ):
+        timings_by_tileset[timing.tileset_id] = timing
+        if timing.succeeded and timing.tileset.build_key:
+            timings_by_build_key[timing.tileset.build_key] = timing
+
+    builds = []
+    for tileset in tilesets:
+        timing = timings_by_tileset.get(tileset.id) or timings_by_build_key.get(
+            tileset.build_key
+        )
+        metadata = tileset.metadata or {}
+        diagnostics = metadata.get("diagnostics") or {}
+        kept_percents = [
+            stats["min_kept_percent"]
+            for stats in diagnostics.get("zooms", {}).values()
+            if stats["min_kept_percent"] is not None
+        ]
+        tile_stats = metadata.get("tile_stats")
+        max_tile_bytes = (
+            max((stats["max_bytes"] for stats in tile_stats.values()), default=0)
+            if tile_stats is not None
+            else None
+        )
+        builds.append(
+            {
+                "tileset_id": tileset.id,
+                "name": tileset.name,
+                "options": shlex.join(tileset.options or []),
+                "status": tileset.status,
+                "reused": timing is not None and timing.tileset_id != tileset.id,
+                "build_seconds": timing.wall_seconds if timing else None,
+                "cpu_seconds": timing.cpu_seconds if timing else None,
+                "peak_rss_bytes": timing.peak_rss_bytes if timing else None,
+                "pmtiles_bytes": metadata.get("pmtiles_bytes"),
+                "max_zoom": metadata.get("header", {}).get("max_zoom"),
+                "max_tile_bytes": max_tile_bytes,
+                "within_budget": (
+                    max_tile_bytes is not None
+                    and max_tile_bytes <= sweep.max_tile_bytes
+                ),
+                "oversized_tiles": metadata.get("oversized_tiles", {}).get("count"),
+                "retries": diagnostics.get("retries"),
+                "dropping_tiles": diagnostics.get("dropping_tiles"),
+                "min_kept_percent": min(kept_percents, default=None),
+                "tile_stats": tile_stats,
+            }
+        )
+
+    # Completed builds first, fastest first
+    builds.sort(
+        key=lambda b: (
+            b["status"] != TaskStatus.COMPLETED,
+            b["build_seconds"] is None,
+            b["build_seconds"] or 0,
+        )
+    )
+    recommended = next(
+        (
+            b
+            for b in builds
+            if b["status"] == TaskStatus.COMPLETED
+            and b["within_budget"]
+            and b["build_seconds"] is not None
+        ),
+        None,
+    )
+    return {
+        "sweep_id": sweep.id,
+        "status": get_sweep_status([tileset.status for tileset in tilesets]),
+        "max_tile_bytes": sweep.max_tile_bytes,
+        "recommended_tileset_id": recommended["tileset_id"] if recommended else None,
+        "builds": builds,
+    }
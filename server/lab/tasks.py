@@ -1,44 +1,217 @@
 import subprocess
 import os
-import shutil
+import json
+import hashlib
 import shlex
+import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import tempfile
+import fiona
+from botocore.exceptions import ClientError
 from celery import shared_task
+from django.conf import settings
 import re
-import redis
+import time
 from pmtiles.reader import Reader, MmapSource
-import mapclassify
-import fiona
-from .constants import TaskStatus, ClassificationMethod
-from .models import Dataset, Tileset, TierList
-from .utils import s3_service
+from .columns import get_numeric_fields, read_numeric_columns
+from .constants import TaskStatus
+from .models import Dataset, Tileset, StageTiming, Sweep
+from .utils import s3_service, artifact_cache, get_redis_client
+from .progress import publish_progress
+from .admission import build_scheduler
+from .streaming import open_pipe, tee_stream, read_geojsonseq_columns
+from .instrumentation import record_stage, wait_with_rusage
+from .metrics import TIPPECANOE_DURATION, TIPPECANOE_OUTPUT_BYTES
+from .column_store import store_columns
+from .tiers import create_tier_lists, classify_field
+from .profiling import choose_tippecanoe_options
+from .tiles import analyze_tiles
+from .diagnostics import TippecanoeDiagnostics
+
+
+# Recent tiling stages the throughput estimate of auto mode is taken from
+THROUGHPUT_SAMPLE_SIZE = 50
+
+# stderr lines kept to print when tippecanoe fails
+MAX_STDERR_LINES = 200
+
+# Longest a GeoJSONSeq conversion may hold its lock, past the ogr2ogr timeout
+GEOJSONSEQ_LOCK_SECONDS = 2 * 3600
+
+# Encoding of the attributes of uploaded shapefiles
+SHAPEFILE_ENCODING = "CP932"
+
+# Recommended options by the official
+DEFAULT_TIPPECANOE_OPTIONS = [
+    "--maximum-zoom",
+    "g",
+    "--drop-densest-as-needed",
+]
+
+
+def get_geojsonseq_object_name(dataset):
+    # Dataset names are not unique, so the id keeps datasets apart
+    return f"datasets/geojsonseq/{dataset.name}_{dataset.id}.geojsons"
+
+
+def get_geojsonseq_command(source_path, output_path, source_options=()):
+    return [
+        "ogr2ogr",
+        "-f",
+        "GeoJSONSeq",
+        *source_options,
+        "-t_srs",
+        "EPSG:4326",
+        output_path,
+        source_path,
+    ]
+
+
+def convert_to_geojsonseq(source_path, output_path, source_options=()):
+    """Convert a vector file to newline-delimited GeoJSON in WGS84"""
+    result = subprocess.run(
+        get_geojsonseq_command(source_path, output_path, source_options),
+        capture_output=True,
+        text=True,
+        timeout=3600,
+    )
+
+    if result.returncode != 0:
+        raise Exception(f"ogr2ogr failed: {result.stderr}")
+
+
+def upload_geojsonseq(dataset, local_path):
+    """
+    Upload the dataset's canonical GeoJSONSeq and move the local file into the
+    artifact cache so later tasks on this worker do not download it again.
+    """
+    object_name = get_geojsonseq_object_name(dataset)
+    s3_service.upload_file(local_path, object_name)
+    print(f"Uploaded {object_name} to MinIO bucket.")
+
+    try:
+        artifact_cache.put(object_name, local_path)
+    except Exception as e:
+        print(f"Warning: Failed to cache {object_name}: {e}")
+    return object_name
+
+
+def ensure_geojsonseq(dataset):
+    """
+    Return the object name of the dataset's canonical GeoJSONSeq, converting
+    the uploaded GeoJSON first if that has not happened yet.
+    """
+    object_name = get_geojsonseq_object_name(dataset)
+    if s3_service.check_object_exists(object_name):
+        return object_name
+
+    # Tasks of the same dataset wait for one conversion rather than each
+    # running their own
+    lock = get_redis_client().lock(
+        f"{object_name}:lock", timeout=GEOJSONSEQ_LOCK_SECONDS
+    )
+    with lock:
+        if s3_service.check_object_exists(object_name):
+            return object_name
+
+        print(f"Normalizing {dataset.geojson_file.name} to GeoJSONSeq ...")
+        _, ext = os.path.splitext(dataset.geojson_file.name)
+        with artifact_cache.scratch_dir() as work_dir:
+            source_path = artifact_cache.fetch_into(
+                dataset.geojson_file.name, os.path.join(work_dir, f"source{ext}")
+            )
+            local_path = os.path.join(work_dir, f"{dataset.name}.geojsons")
+            convert_to_geojsonseq(source_path, local_path)
+            return upload_geojsonseq(dataset, local_path)
+
+
+def get_build_key(etag, options, layer_name):
+    """
+    Hash the input object's ETag together with the canonical tippecanoe option
+    list and the layer name, so identical builds of identical content share
+    the same key.
+    """
+    payload = json.dumps(
+        {"etag": etag, "options": list(options), "layer_name": layer_name}
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def reuse_completed_build(tileset, build_key):
+    """
+    Point the tileset at the PMTiles object of a completed build with the same
+    key instead of running tippecanoe again. Returns True on reuse.
+    """
+    existing = (
+        Tileset.objects.filter(build_key=build_key, status=TaskStatus.COMPLETED)
+        .exclude(id=tileset.id)
+        .exclude(pmtiles_file="")
+        .first()
+    )
+    if existing is None:
+        return False
 
+    tileset.pmtiles_file.name = existing.pmtiles_file.name
+    tileset.metadata = existing.metadata
+    tileset.options = existing.options
+    tileset.build_key = build_key
+    tileset.status = TaskStatus.COMPLETED
+    tileset.save()
+    print(f"Reused the build of tileset {existing.id} for tileset {tileset.id}")
+    return True
 
-def get_redis_client():
-    return redis.Redis(host="redis", port=6379, db=0)
+
+def save_diagnostics(tileset, diagnostics):
+    result = diagnostics.result()
+    tileset.metadata = {**(tileset.metadata or {}), "diagnostics": result}
+    try:
+        tileset.save(update_fields=["metadata", "updated_at"])
+    except Exception as e:
+        print(f"Warning: Failed to save tippecanoe diagnostics: {e}")
+    print(
+        f"Tippecanoe diagnostics: maximum zoom {result['maximum_zoom']}, "
+        f"base zoom {result['base_zoom']}, {result['too_big_tiles']} tiles too "
+        f"big, {result['retries']} retries, {result['dropping_tiles']} tiles "
+        "dropping features"
+    )
 
 
 def run_tippecanoe_with_progress(
     geojson_path,
     output_path,
     redis_key,
-    additional_options=[
-        "--maximum-zoom",
-        "g",
-        "--drop-densest-as-needed",
-    ],  # Recommended options by the official
+    layer_name,
+    additional_options=DEFAULT_TIPPECANOE_OPTIONS,
+    stdin=None,
+    tileset=None,
 ):
+    """
+    Run tippecanoe, publishing its progress and parsing its stderr into
+    diagnostics saved in the tileset's metadata, if given, whether or not
+    the build succeeds. Returns True on success.
+    """
     redis_client = get_redis_client()
+    diagnostics = TippecanoeDiagnostics()
 
-    cmd = ["tippecanoe", "-o", output_path, "-f"]
+    # The input is always GeoJSONSeq, so -P can split parsing across cores.
+    # The layer is named explicitly, as tippecanoe would otherwise name it
+    # after the input's scratch file, or "stdin" when streaming.
+    cmd = ["tippecanoe", "-o", output_path, "-f", "-P", "-l", layer_name]
 
     if additional_options:
         cmd.extend(additional_options)
 
-    cmd.append(geojson_path)
+    # Without a path tippecanoe reads the features from stdin
+    if geojson_path:
+        cmd.append(geojson_path)
 
+    started_at = time.perf_counter()
     try:
         progress = subprocess.Popen(
             cmd,
+            stdin=stdin,
             stderr=subprocess.PIPE,
             text=False,
             bufsize=0,
@@ -47,7 +220,7 @@ def run_tippecanoe_with_progress(
         buffer = b""
         pattern = re.compile(rb"(\d+(\.\d+)?)%")
         last_progress = 0
-        collected_err = []
+        collected_err = deque(maxlen=MAX_STDERR_LINES)
 
         while True:
             char = progress.stderr.read(1)
@@ -61,23 +234,28 @@ def run_tippecanoe_with_progress(
                 if not line:
                     continue
 
-                collected_err.append(line.decode("utf-8", errors="ignore"))
+                text = line.decode("utf-8", errors="ignore")
+                collected_err.append(text)
+                # Diagnostics such as "keeping 78.23% of the features" are
+                # not progress
+                if diagnostics.add_line(text):
+                    continue
                 match = pattern.search(line)
                 if match:
                     percentage = float(match.group(1).decode())
-                    rounded = int((percentage // 10) * 10)
+                    rounded = int(percentage)
                     if rounded > last_progress:
-                        redis_client.hset(
+                        publish_progress(
+                            redis_client,
                             redis_key,
-                            mapping={
-                                "status": TaskStatus.IN_PROGRESS,
-                                "progress": rounded,
-                            },
+                            TaskStatus.IN_PROGRESS,
+                            rounded,
+                            stage="tiling",
                         )
                         print(f"Progress: {rounded}%")
                         last_progress = rounded
 
-        progress.wait()
+        wait_with_rusage(progress)
         if progress.returncode != 0:
             err_output = "\n".join(collected_err)
             raise subprocess.CalledProcessError(
@@ -87,21 +265,175 @@ def run_tippecanoe_with_progress(
                 stderr=err_output,
             )
 
+        TIPPECANOE_DURATION.labels("succeeded").observe(
+            time.perf_counter() - started_at
+        )
+        TIPPECANOE_OUTPUT_BYTES.observe(os.path.getsize(output_path))
         print("Progress: 100%")
         print("Tippecanoe completed successfully.")
         return True
 
     except subprocess.CalledProcessError as e:
-        redis_client.hset(
-            redis_key,
-            mapping={
-                "status": TaskStatus.FAILED,
-                "progress": last_progress,
-            },
-        )
+        TIPPECANOE_DURATION.labels("failed").observe(time.perf_counter() - started_at)
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, last_progress)
         print(f"Tippecanoe failed: {e.stderr}")
         return False
 
+    finally:
+        if tileset is not None:
+            save_diagnostics(tileset, diagnostics)
+
+
+@contextmanager
+def admit_tippecanoe_build(redis_key, input_size, feature_count=None):
+    """
+    Wait until the node has room for the build's estimated memory and scratch
+    disk, reporting a "waiting" status until then, and hold the reservation
+    for the duration of the block.
+    """
+    redis_client = get_redis_client()
+
+    memory, disk = build_scheduler.estimate(input_size, feature_count)
+    print(
+        f"Estimated tippecanoe usage: {memory // 2**20} MB memory, {disk // 2**20} MB disk"
+    )
+
+    def on_wait():
+        publish_progress(redis_client, redis_key, TaskStatus.WAITING, 0)
+        print("Waiting for capacity on this node ...")
+
+    with build_scheduler.admit(redis_client, redis_key, memory, disk, on_wait):
+        yield
+
+
+def run_tippecanoe_with_admission(
+    geojson_path,
+    output_path,
+    redis_key,
+    additional_options,
+    dataset,
+    tileset,
+):
+    """
+    Run tippecanoe once admitted on the node, recording the run (but not the
+    wait) as the tileset's tiling stage.
+    """
+    input_size = os.path.getsize(geojson_path)
+    with admit_tippecanoe_build(redis_key, input_size, dataset.feature_count):
+        with record_stage("tiling", dataset, tileset) as timer:
+            timer.bytes_moved = input_size
+            timer.succeeded = run_tippecanoe_with_progress(
+                geojson_path,
+                output_path,
+                redis_key,
+                dataset.name,
+                additional_options,
+                tileset=tileset,
+            )
+            return timer.succeeded
+
+
+def upload_stream_to_minio(stream, object_name):
+    with stream:
+        s3_service.upload_fileobj(stream, object_name)
+    print(f"Uploaded {object_name} to MinIO bucket.")
+
+
+def stream_shapefile_to_tiles(
+    shp_path, local_geojson_path, geojson_object_name, output_path, redis_key, tileset
+):
+    """
+    Convert the shapefile with ogr2ogr and stream its GeoJSONSeq output to
+    tippecanoe, the MinIO upload, a local copy and the attribute extractor at
+    the same time, so the whole pass takes about as long as its slowest
+    stage. Returns the numeric columns and the profile of the features;
+    raises if any stage fails.
+    """
+    # Take the numeric fields from the shapefile's schema, as indexing the
+    # converted GeoJSONSeq does
+    with fiona.open(shp_path, encoding=SHAPEFILE_ENCODING) as src:
+        numeric_fields = get_numeric_fields(src.schema)
+
+    try:
+        with tempfile.TemporaryFile() as converter_errors:
+            converter = subprocess.Popen(
+                get_geojsonseq_command(
+                    shp_path,
+                    "/vsistdout/",
+                    source_options=["-oo", f"ENCODING={SHAPEFILE_ENCODING}"],
+                ),
+                stdout=subprocess.PIPE,
+                stderr=converter_errors,
+            )
+
+            tippecanoe_stdin, tippecanoe_sink = open_pipe()
+            upload_stream, upload_sink = open_pipe()
+            columns_stream, columns_sink = open_pipe()
+            sinks = {
+                "tippecanoe": tippecanoe_sink,
+                "upload": upload_sink,
+                "attributes": columns_sink,
+                "local copy": open(local_geojson_path, "wb"),
+            }
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                tee = executor.submit(tee_stream, converter.stdout, sinks)
+                upload = executor.submit(
+                    upload_stream_to_minio, upload_stream, geojson_object_name
+                )
+                columns = executor.submit(
+                    read_geojsonseq_columns, columns_stream, numeric_fields
+                )
+
+                success = False
+                try:
+                    success = run_tippecanoe_with_progress(
+                        None,
+                        output_path,
+                        redis_key,
+                        tileset.dataset.name,
+                        stdin=tippecanoe_stdin,
+                        tileset=tileset,
+                    )
+                finally:
+                    # Let the tee drop tippecanoe if it exited before the end
+                    tippecanoe_stdin.close()
+                    # and stop converting, since the build has failed anyway
+                    if not success:
+                        converter.kill()
+                    failed_sinks = tee.result()
+                    converter.stdout.close()
+                    wait_with_rusage(converter)
+
+                upload_error = upload.exception()
+                columns_error = columns.exception()
+
+            if converter.returncode not in (0, -signal.SIGKILL):
+                converter_errors.seek(0)
+                raise Exception(
+                    f"ogr2ogr failed: {converter_errors.read().decode(errors='ignore')}"
+                )
+
+        if not success:
+            raise Exception("Tippecanoe failed")
+        if upload_error is not None:
+            raise Exception(f"Failed to upload converted GeoJSONSeq: {upload_error}")
+        if "local copy" in failed_sinks:
+            raise Exception("Failed to write the local GeoJSONSeq copy")
+        if columns_error is not None:
+            raise columns_error
+    except Exception:
+        # Do not leave a truncated canonical copy behind
+        try:
+            s3_service.internal_client.delete_object(
+                Bucket=s3_service.bucket_name, Key=geojson_object_name
+            )
+        except ClientError as e:
+            print(f"Failed to delete {geojson_object_name}: {e}")
+        raise
+
+    return columns.result()
+
 
 def extract_pmtiles_metadata(pmtiles_path):
     try:
@@ -111,7 +443,13 @@ def extract_pmtiles_metadata(pmtiles_path):
 
             header = reader.header()
             metadata = reader.metadata()
+            tile_stats, oversized_tiles = analyze_tiles(
+                source, header, settings.TILE_BYTES_BUDGET
+            )
             return {
+                "pmtiles_bytes": os.path.getsize(pmtiles_path),
+                "tile_stats": tile_stats,
+                "oversized_tiles": oversized_tiles,
                 "header": {
                     "min_zoom": header["min_zoom"],
                     "max_zoom": header["max_zoom"],
@@ -137,9 +475,7 @@ def extract_pmtiles_metadata(pmtiles_path):
 
 def upload_pmtiles_to_minio(local_path, object_name):
     try:
-        s3_service.internal_client.upload_file(
-            local_path, s3_service.bucket_name, object_name
-        )
+        s3_service.upload_file(local_path, object_name)
         print(f"Uploaded {object_name} to MinIO bucket.")
         return True
     except Exception as e:
@@ -147,142 +483,163 @@ def upload_pmtiles_to_minio(local_path, object_name):
         return False
 
 
-def create_tier_lists_from_geojson(dataset):
-    print(f"Creating tier lists for dataset {dataset.id} ({dataset.name})")
+def complete_tileset_build(
+    tileset,
+    local_pmtiles_path,
+    pmtiles_object_name,
+    build_key,
+    additional_options,
+    redis_key,
+):
+    """
+    Save the PMTiles metadata on the tileset, upload the archive and mark the
+    tileset completed, or failed if the upload does not go through.
+    """
+    redis_client = get_redis_client()
 
-    # Download GeoJSON file from MinIO to temporary location
-    geojson_object_name = f"datasets/geojson/{dataset.name}.geojson"
-    local_geojson_path = f"/tmp/{dataset.name}_{dataset.id}_tierlist.geojson"
+    # Extract and save metadata
+    print("Extracting metadata from PMTiles...")
+    with record_stage("metadata", tileset.dataset, tileset) as timer:
+        pmtiles_metadata = extract_pmtiles_metadata(local_pmtiles_path)
+        timer.succeeded = pmtiles_metadata is not None
 
-    try:
-        # Download GeoJSON from MinIO
-        s3_service.internal_client.download_file(
-            s3_service.bucket_name, geojson_object_name, local_geojson_path
-        )
+    if pmtiles_metadata:
+        tileset.metadata = {**(tileset.metadata or {}), **pmtiles_metadata}
+        tileset.save()
+        print(f"Saved metadata to tileset {tileset.id}")
+    else:
+        print("No metadata found in PMTiles file")
 
-        # Load GeoJSON with fiona and extract properties
-        print("Loading GeoJSON features and extracting properties...")
-        features_properties = []
+    # Upload to MinIO
+    print("Uploading pmtiles to MinIO ...")
+    publish_progress(
+        redis_client, redis_key, TaskStatus.IN_PROGRESS, 100, stage="uploading"
+    )
 
-        with fiona.open(local_geojson_path) as src:
-            for feature in src:
-                if feature.get("properties"):
-                    features_properties.append(feature["properties"])
+    with record_stage("uploading", tileset.dataset, tileset) as timer:
+        timer.bytes_moved = os.path.getsize(local_pmtiles_path)
+        timer.succeeded = upload_pmtiles_to_minio(
+            local_pmtiles_path, pmtiles_object_name
+        )
 
-        if not features_properties:
-            print("No features with properties found in GeoJSON")
-            return
+    if timer.succeeded:
+        tileset.pmtiles_file.name = pmtiles_object_name
+        tileset.build_key = build_key
+        tileset.options = additional_options
+        tileset.status = TaskStatus.COMPLETED
+        tileset.save()
 
-        print(f"Loaded {len(features_properties)} features")
+        publish_progress(redis_client, redis_key, TaskStatus.COMPLETED, 100)
+        print(f"Updated Tileset {tileset.id} with completion status")
+    else:
+        tileset.status = TaskStatus.FAILED
+        tileset.save()
 
-        # Identify numeric fields and collect their values
-        numeric_fields = {}
 
-        # Get all field names from the first feature
-        if features_properties:
-            field_names = features_properties[0].keys()
+@shared_task
+def index_dataset_columns(dataset_id):
+    """
+    Store the numeric columns of a dataset's GeoJSONSeq, from which its tier
+    lists are computed on demand, and its profile.
+    """
+    try:
+        dataset = Dataset.objects.get(id=dataset_id)
+    except Dataset.DoesNotExist:
+        print(f"Dataset with id {dataset_id} does not exist")
+        return
 
-            for field_name in field_names:
-                numeric_values = []
+    print(f"Indexing columns of dataset {dataset.id} ({dataset.name})")
+    scratch = artifact_cache.scratch_dir()
+    local_geojson_path = os.path.join(scratch.name, f"{dataset.name}.geojsons")
+    try:
+        with record_stage("indexing", dataset) as timer:
+            # Fetch GeoJSONSeq through the worker's artifact cache
+            artifact_cache.fetch_into(
+                get_geojsonseq_object_name(dataset), local_geojson_path
+            )
 
-                # Collect all numeric values for this field
-                for properties in features_properties:
-                    value = properties.get(field_name)
-                    if (
-                        value is not None
-                        and isinstance(value, (int, float))
-                        and not isinstance(value, bool)
-                    ):
-                        numeric_values.append(float(value))
+            # Build one typed column per numeric field and profile the
+            # features in a single pass
+            print("Loading GeoJSON features and extracting numeric columns...")
+            numeric_fields, profile = read_numeric_columns(local_geojson_path)
 
-                # Only keep fields with at least 2 numeric values
-                if len(numeric_values) >= 2:
-                    numeric_fields[field_name] = numeric_values
+            dataset.feature_count = profile["feature_count"]
+            dataset.profile = profile
+            dataset.save(update_fields=["feature_count", "profile", "updated_at"])
+            timer.bytes_moved = store_columns(dataset, numeric_fields)
+        create_dataset_tier_lists.delay(dataset.id)
+    except Exception as e:
+        print(f"Error indexing columns of dataset {dataset.id}: {e}")
+    finally:
+        scratch.cleanup()
 
-        print(f"Found numeric fields: {list(numeric_fields.keys())}")
 
-        # Create tier lists for each numeric field
-        for field_name, values in numeric_fields.items():
-            try:
-                print(f"Processing field {field_name}...")
+@shared_task
+def classify_dataset_field(dataset_id, field, method, k, percentiles=None):
+    """Classify a numeric field of a dataset, as the classify endpoint asks."""
+    dataset = Dataset.objects.get(id=dataset_id)
+    return classify_field(dataset, field, method, k, percentiles)
 
-                unique_values = set(values)
-                if len(unique_values) == 1:
-                    print("All values are the same. Skipping...")
-                    continue
 
-                num_classes_standard = min(5, len(unique_values))
+@shared_task
+def create_dataset_tier_lists(dataset_id):
+    """Compute the tier lists of a dataset from its stored columns."""
+    try:
+        dataset = Dataset.objects.get(id=dataset_id)
+    except Dataset.DoesNotExist:
+        print(f"Dataset with id {dataset_id} does not exist")
+        return
 
-                try:
-                    classifier = mapclassify.Quantiles(values, k=num_classes_standard)
-                    breaks = classifier.bins.tolist()
-                    TierList.objects.create(
-                        dataset=dataset,
-                        field=field_name,
-                        method=ClassificationMethod.QUANTILE,
-                        breaks=breaks,
-                    )
-                    print(f"Created quantile tier list for field {field_name}")
-                except Exception as e:
-                    print(
-                        f"Error creating quantile tier list for field {field_name}: {e}"
-                    )
+    try:
+        with record_stage("classifying", dataset):
+            create_tier_lists(dataset)
+    except Exception as e:
+        print(f"Error creating tier lists of dataset {dataset.id}: {e}")
 
-                try:
-                    classifier = mapclassify.NaturalBreaks(
-                        values, k=num_classes_standard
-                    )
-                    breaks = classifier.bins.tolist()
-                    TierList.objects.create(
-                        dataset=dataset,
-                        field=field_name,
-                        method=ClassificationMethod.NATURAL_BREAKS,
-                        breaks=breaks,
-                    )
-                    print(f"Created natural breaks tier list for field {field_name}")
-                except Exception as e:
-                    print(
-                        f"Error creating natural breaks tier list for field {field_name}: {e}"
-                    )
 
-                try:
-                    classifier = mapclassify.Percentiles(
-                        values, pct=[1, 10, 50, 90, 99, 100]
-                    )
-                    breaks = classifier.bins.tolist()
-                    TierList.objects.create(
-                        dataset=dataset,
-                        field=field_name,
-                        method=ClassificationMethod.PERCENTILE,
-                        breaks=breaks,
-                    )
-                    print(f"Created percentile tier list for field {field_name}")
-                except Exception as e:
-                    print(
-                        f"Error creating percentile tier list for field {field_name}: {e}"
-                    )
+def get_tiling_throughput():
+    """
+    Median input bytes tiled per second over recent successful builds, or the
+    configured default before there are any.
+    """
+    rates = sorted(
+        bytes_moved / wall_seconds
+        for bytes_moved, wall_seconds in StageTiming.objects.filter(
+            stage="tiling", succeeded=True, bytes_moved__gt=0, wall_seconds__gt=0
+        )
+        .order_by("-created_at")
+        .values_list("bytes_moved", "wall_seconds")[:THROUGHPUT_SAMPLE_SIZE]
+    )
+    if not rates:
+        return settings.TILING_BYTES_PER_SECOND
+    return rates[len(rates) // 2]
 
-            except Exception as e:
-                print(f"Error processing field {field_name}: {e}")
-                continue
 
-        # Clean up temporary file
-        try:
-            os.remove(local_geojson_path)
-        except Exception as e:
-            print(f"Warning: Could not remove temporary file {local_geojson_path}: {e}")
+def choose_auto_options(tileset, target_tile_bytes=None, build_seconds_budget=None):
+    """
+    Pick the tippecanoe options of an auto mode build from the dataset's
+    profile and record the decisions in the tileset's metadata. Falls back to
+    the default options while the dataset has not been profiled.
+    """
+    profile = tileset.dataset.profile
+    if not profile or not profile["feature_count"]:
+        print("Dataset has no profile yet, using the default options")
+        return DEFAULT_TIPPECANOE_OPTIONS
+
+    additional_options, decisions = choose_tippecanoe_options(
+        profile,
+        target_tile_bytes or settings.AUTO_TARGET_TILE_BYTES,
+        build_seconds_budget or settings.AUTO_BUILD_SECONDS_BUDGET,
+        get_tiling_throughput(),
+    )
+    print(f"Auto options for {tileset.name}: {shlex.join(additional_options)}")
 
-    except Exception as e:
-        print(f"Error downloading or processing GeoJSON for tier lists: {e}")
-        # Try to clean up on error
-        try:
-            if os.path.exists(local_geojson_path):
-                os.remove(local_geojson_path)
-        except Exception:
-            pass
+    tileset.metadata = {**(tileset.metadata or {}), "auto_options": decisions}
+    tileset.save()
+    return additional_options
 
 
-@shared_task
+@shared_task(acks_late=True)
 def generate_tileset_with_options(
     dataset_name,
     tileset_id,
@@ -292,6 +649,9 @@ def generate_tileset_with_options(
     coalesce_densest_as_needed=False,
     extend_zooms_if_still_dropping=False,
     raw_options=None,
+    auto=False,
+    target_tile_bytes=None,
+    build_seconds_budget=None,
 ):
     print(f"Start to generate tileset '{tileset_name}' ...")
 
@@ -304,46 +664,26 @@ def generate_tileset_with_options(
     redis_client = get_redis_client()
 
     redis_key = f"tileset:{tileset.id}"
-    geojson_object_name = f"datasets/geojson/{dataset_name}.geojson"
-    local_geojson_path = f"/tmp/{dataset_name}.geojson"
+    scratch = artifact_cache.scratch_dir()
+    local_geojson_path = os.path.join(scratch.name, f"{tileset_name}.geojsons")
     local_pmtiles_path = f"/tmp/{tileset_name}_{tileset.id}.pmtiles"
 
-    # Download GeoJSON from MinIO
-    try:
-        s3_service.internal_client.download_file(
-            s3_service.bucket_name, geojson_object_name, local_geojson_path
-        )
-        print(f"Downloaded {geojson_object_name} from MinIO bucket.")
-    except Exception as e:
-        redis_client.hset(
-            redis_key,
-            mapping={
-                "status": TaskStatus.FAILED,
-                "progress": 0,
-            },
-        )
-        tileset.status = TaskStatus.FAILED
-        tileset.save()
-        print(f"Failed to download geojson from MinIO: {e}")
-        return
-
     # Prepare tippecanoe options
     if raw_options:
         try:
             additional_options = shlex.split(raw_options)
             print(f"Running tippecanoe for {tileset_name} with options: {raw_options}")
         except ValueError as e:
-            redis_client.hset(
-                redis_key,
-                mapping={
-                    "status": TaskStatus.FAILED,
-                    "progress": 0,
-                },
-            )
+            publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
             tileset.status = TaskStatus.FAILED
             tileset.save()
             print(f"Failed to parse raw options '{raw_options}': {e}")
+            scratch.cleanup()
             return
+    elif auto:
+        additional_options = choose_auto_options(
+            tileset, target_tile_bytes, build_seconds_budget
+        )
     else:
         # Build options from individual parameters (basic mode)
         print(
@@ -357,47 +697,141 @@ def generate_tileset_with_options(
         if extend_zooms_if_still_dropping:
             additional_options.append("--extend-zooms-if-still-dropping")
 
+    # Reuse an identical completed build, otherwise fetch GeoJSONSeq through
+    # the worker's artifact cache
+    try:
+        with record_stage("downloading", tileset.dataset, tileset) as timer:
+            geojson_object_name = ensure_geojsonseq(tileset.dataset)
+            build_key = get_build_key(
+                s3_service.get_object_etag(geojson_object_name),
+                additional_options,
+                tileset.dataset.name,
+            )
+            if reuse_completed_build(tileset, build_key):
+                publish_progress(redis_client, redis_key, TaskStatus.COMPLETED, 100)
+                scratch.cleanup()
+                return
+
+            # The link keeps the cached copy from being evicted while the
+            # build waits for admission and runs
+            artifact_cache.fetch_into(geojson_object_name, local_geojson_path)
+            timer.bytes_moved = os.path.getsize(local_geojson_path)
+    except Exception as e:
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
+        tileset.status = TaskStatus.FAILED
+        tileset.save()
+        print(f"Failed to download geojson from MinIO: {e}")
+        scratch.cleanup()
+        return
+
     # Run tippecanoe with progress tracking
-    success = run_tippecanoe_with_progress(
-        local_geojson_path, local_pmtiles_path, redis_key, additional_options
-    )
+    try:
+        success = run_tippecanoe_with_admission(
+            local_geojson_path,
+            local_pmtiles_path,
+            redis_key,
+            additional_options,
+            tileset.dataset,
+            tileset,
+        )
+    finally:
+        scratch.cleanup()
 
     if not success:
         tileset.status = TaskStatus.FAILED
         tileset.save()
         return
 
-    # Extract and save metadata
-    print("Extracting metadata from PMTiles...")
-    pmtiles_metadata = extract_pmtiles_metadata(local_pmtiles_path)
+    pmtiles_object_name = f"datasets/pmtiles/{tileset_name}_{tileset.id}.pmtiles"
+    complete_tileset_build(
+        tileset,
+        local_pmtiles_path,
+        pmtiles_object_name,
+        build_key,
+        additional_options,
+        redis_key,
+    )
 
-    if pmtiles_metadata:
-        tileset.metadata = pmtiles_metadata
-        tileset.save()
-        print(f"Saved metadata to tileset {tileset.id}")
-    else:
-        print("No metadata found in PMTiles file")
 
-    # Upload to MinIO
-    print("Uploading pmtiles to MinIO ...")
-    pmtiles_object_name = f"datasets/pmtiles/{tileset_name}_{tileset.id}.pmtiles"
+@shared_task
+def run_sweep(sweep_id):
+    """
+    Fetch the dataset's GeoJSONSeq into the artifact cache shared by the
+    workers once, then start every build of the sweep so they run in
+    parallel from that copy.
+    """
+    try:
+        sweep = Sweep.objects.select_related("dataset").get(id=sweep_id)
+    except Sweep.DoesNotExist:
+        print(f"Sweep with id {sweep_id} does not exist")
+        return
 
-    if upload_pmtiles_to_minio(local_pmtiles_path, pmtiles_object_name):
-        tileset.pmtiles_file.name = pmtiles_object_name
-        tileset.status = TaskStatus.COMPLETED
-        tileset.save()
+    tilesets = list(sweep.tilesets.order_by("id"))
+    try:
+        with record_stage("downloading", sweep.dataset) as timer:
+            geojson_object_name = ensure_geojsonseq(sweep.dataset)
+            local_geojson_path = artifact_cache.fetch(geojson_object_name)
+            timer.bytes_moved = os.path.getsize(local_geojson_path)
+    except Exception as e:
+        redis_client = get_redis_client()
+        for tileset in tilesets:
+            publish_progress(
+                redis_client, f"tileset:{tileset.id}", TaskStatus.FAILED, 0
+            )
+        Tileset.objects.filter(sweep=sweep).update(status=TaskStatus.FAILED)
+        print(f"Failed to prepare the input of sweep {sweep.id}: {e}")
+        return
 
-        redis_client.hset(
-            redis_key,
-            mapping={
-                "status": TaskStatus.COMPLETED,
-                "progress": 100,
-            },
+    for tileset in tilesets:
+        generate_tileset_with_options.delay(
+            sweep.dataset.name,
+            tileset.id,
+            tileset.name,
+            raw_options=shlex.join(tileset.options),
         )
-        print(f"Updated Tileset {tileset.id} with completion status")
-    else:
-        tileset.status = TaskStatus.FAILED
-        tileset.save()
+    print(f"Started {len(tilesets)} builds of sweep {sweep.id}")
+
+
+def fetch_shapefile_components(dataset, temp_dir):
+    """
+    Make the dataset's shapefile components available under temp_dir and
+    return their local paths by extension.
+    """
+    shapefile_components = {
+        "shp": dataset.shp_file,
+        "shx": dataset.shx_file,
+        "dbf": dataset.dbf_file,
+        "prj": dataset.prj_file,
+        "cpg": dataset.cpg_file,
+    }
+
+    object_names = {
+        ext: file_field.name
+        for ext, file_field in shapefile_components.items()
+        if file_field
+    }
+    # Fetch all components at once rather than one after another
+    cached_paths = artifact_cache.fetch_many(list(object_names.values()))
+
+    downloaded_files = {}
+
+    for ext, object_name in object_names.items():
+        cached_path = cached_paths[object_name]
+        if isinstance(cached_path, Exception):
+            print(f"Failed to download {object_name}: {cached_path}")
+            if ext in ["shp", "shx", "dbf"]:
+                raise cached_path
+            continue
+
+        # ogr2ogr finds the sidecar files by name, so link the cached copies
+        # into the working directory, which also keeps them from being
+        # evicted until it is removed
+        local_path = os.path.join(temp_dir, f"{dataset.name}.{ext}")
+        downloaded_files[ext] = artifact_cache.fetch_into(
+            object_name, local_path, cached_path
+        )
+
+    return downloaded_files
 
 
 @shared_task
@@ -417,122 +851,63 @@ def process_uploaded_shapefile(dataset_id, dataset_name):
     redis_client = get_redis_client()
     redis_key = f"dataset:{dataset_id}"
 
-    redis_client.hset(
-        redis_key,
-        mapping={
-            "status": TaskStatus.IN_PROGRESS,
-            "progress": 0,
-        },
+    publish_progress(
+        redis_client, redis_key, TaskStatus.IN_PROGRESS, 0, stage="converting"
     )
 
-    temp_dir = f"/tmp/shapefile_{dataset_id}"
-    os.makedirs(temp_dir, exist_ok=True)
+    scratch = artifact_cache.scratch_dir()
 
     try:
-        shapefile_components = {
-            "shp": dataset.shp_file,
-            "shx": dataset.shx_file,
-            "dbf": dataset.dbf_file,
-            "prj": dataset.prj_file,
-            "cpg": dataset.cpg_file,
-        }
-
-        downloaded_files = {}
-
-        for ext, file_field in shapefile_components.items():
-            if file_field:
-                object_name = file_field.name
-                local_path = os.path.join(temp_dir, f"{dataset_name}.{ext}")
-
-                try:
-                    s3_service.internal_client.download_file(
-                        s3_service.bucket_name, object_name, local_path
-                    )
-                    downloaded_files[ext] = local_path
-                except Exception as e:
-                    print(f"Failed to download {object_name}: {e}")
-                    if ext in ["shp", "shx", "dbf"]:
-                        raise e
+        with record_stage("downloading", dataset) as timer:
+            downloaded_files = fetch_shapefile_components(dataset, scratch.name)
+            timer.bytes_moved = sum(
+                os.path.getsize(path) for path in downloaded_files.values()
+            )
 
-        # Convert shapefile to GeoJSON
+        # Convert shapefile straight to the canonical GeoJSONSeq
         shp_path = downloaded_files["shp"]
-        geojson_path = f"/tmp/{dataset_name}.geojson"
-
-        print("Converting shapefile to GeoJSON ...")
-
-        ogr2ogr_cmd = [
-            "ogr2ogr",
-            "-f",
-            "GeoJSON",
-            "-oo",
-            "ENCODING=CP932",
-            "-lco",
-            "ENCODING=UTF-8",
-            "-t_srs",
-            "EPSG:4326",
-            geojson_path,
-            shp_path,
-        ]
-
-        result = subprocess.run(
-            ogr2ogr_cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,
-        )
-
-        if result.returncode != 0:
-            raise Exception(f"ogr2ogr failed: {result.stderr}")
-
-        print("Successfully converted shapefile to GeoJSON")
-
-        print("Uploading converted GeoJSON to MinIO ...")
+        geojson_path = os.path.join(scratch.name, f"{dataset_name}.geojsons")
+
+        print("Converting shapefile to GeoJSONSeq ...")
+        with record_stage("converting", dataset) as timer:
+            convert_to_geojsonseq(
+                shp_path,
+                geojson_path,
+                source_options=["-oo", f"ENCODING={SHAPEFILE_ENCODING}"],
+            )
+            timer.bytes_moved = os.path.getsize(geojson_path)
+        print("Successfully converted shapefile to GeoJSONSeq")
 
-        # Upload the converted GeoJSON to MinIO
-        geojson_object_name = f"datasets/geojson/{dataset_name}.geojson"
+        print("Uploading converted GeoJSONSeq to MinIO ...")
 
         try:
-            s3_service.internal_client.upload_file(
-                geojson_path, s3_service.bucket_name, geojson_object_name
-            )
-            print("Uploaded converted GeoJSON to MinIO")
+            with record_stage("uploading", dataset) as timer:
+                timer.bytes_moved = os.path.getsize(geojson_path)
+                geojson_object_name = upload_geojsonseq(dataset, geojson_path)
 
             dataset.geojson_file.name = geojson_object_name
             dataset.save()
 
         except Exception as e:
-            raise Exception(f"Failed to upload converted GeoJSON to MinIO: {e}")
-
-        # Clean up temporary files
-        try:
-            shutil.rmtree(temp_dir)
-            os.remove(geojson_path)
-        except Exception as e:
-            print(f"Warning: Failed to clean up temporary files: {e}")
+            raise Exception(f"Failed to upload converted GeoJSONSeq to MinIO: {e}")
 
         process_uploaded_geojson.delay(dataset_id, dataset_name)
 
     except Exception as e:
         print(f"Error processing shapefile: {e}")
-        redis_client.hset(
-            redis_key,
-            mapping={
-                "status": TaskStatus.FAILED,
-                "progress": 0,
-            },
-        )
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
 
-        # Clean up on error
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except Exception as cleanup_error:
-            print(f"Failed to clean up after error: {cleanup_error}")
+    finally:
+        scratch.cleanup()
 
 
-@shared_task
-def process_uploaded_geojson(dataset_id, dataset_name):
-    print(f"Start to process {dataset_name} ...")
+@shared_task(acks_late=True)
+def stream_uploaded_shapefile(dataset_id, dataset_name):
+    """
+    Convert, tile and classify an uploaded shapefile in a single streaming
+    pass instead of going through an intermediate GeoJSON in MinIO.
+    """
+    print(f"Start to stream shapefile {dataset_name} ...")
 
     try:
         dataset = Dataset.objects.get(id=dataset_id)
@@ -540,80 +915,190 @@ def process_uploaded_geojson(dataset_id, dataset_name):
         print(f"Dataset with id {dataset_id} does not exist")
         return
 
-    # Create tier lists for numeric attributes from the dataset
-    create_tier_lists_from_geojson(dataset)
+    redis_client = get_redis_client()
+    redis_key = f"dataset:{dataset_id}"
+
+    publish_progress(
+        redis_client, redis_key, TaskStatus.IN_PROGRESS, 0, stage="converting"
+    )
+
+    scratch = artifact_cache.scratch_dir()
+
+    try:
+        with record_stage("downloading", dataset) as timer:
+            downloaded_files = fetch_shapefile_components(dataset, scratch.name)
+            timer.bytes_moved = sum(
+                os.path.getsize(path) for path in downloaded_files.values()
+            )
+        with fiona.open(downloaded_files["shp"]) as src:
+            dataset.feature_count = len(src)
+        dataset.save()
+    except Exception as e:
+        print(f"Error processing shapefile: {e}")
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
+        scratch.cleanup()
+        return
 
     tileset = Tileset.objects.create(
         dataset=dataset, name="default", status=TaskStatus.IN_PROGRESS, metadata={}
     )
     print(f"Created Tileset with id {tileset.id}")
 
-    redis_client = get_redis_client()
-    redis_key = f"dataset:{dataset_id}"
-
-    geojson_object_name = f"datasets/geojson/{dataset_name}.geojson"
-    local_geojson_path = f"/tmp/{dataset_name}.geojson"
-    local_pmtiles_path = f"/tmp/{dataset_name}.pmtiles"
+    geojson_object_name = get_geojsonseq_object_name(dataset)
+    local_geojson_path = os.path.join(scratch.name, f"{dataset_name}.geojsons")
+    local_pmtiles_path = f"/tmp/{dataset_name}_{dataset_id}.pmtiles"
+    # GeoJSON text takes a few times the space of the binary shapefile
+    input_size = 3 * sum(
+        os.path.getsize(downloaded_files[ext]) for ext in ("shp", "dbf")
+    )
 
-    # Download GeoJSON from MinIO
     try:
-        s3_service.internal_client.download_file(
-            s3_service.bucket_name, geojson_object_name, local_geojson_path
-        )
-        print(f"Downloaded {geojson_object_name} from MinIO bucket.")
+        with admit_tippecanoe_build(redis_key, input_size, dataset.feature_count):
+            with record_stage("streaming", dataset, tileset) as timer:
+                numeric_fields, profile = stream_shapefile_to_tiles(
+                    downloaded_files["shp"],
+                    local_geojson_path,
+                    geojson_object_name,
+                    local_pmtiles_path,
+                    redis_key,
+                    tileset,
+                )
+                timer.bytes_moved = os.path.getsize(local_geojson_path)
     except Exception as e:
-        redis_client.hset(
-            redis_key,
-            mapping={
-                "status": TaskStatus.FAILED,
-                "progress": 0,
-            },
-        )
+        print(f"Error streaming shapefile: {e}")
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
         tileset.status = TaskStatus.FAILED
         tileset.save()
-        print(f"Failed to download geojson from MinIO: {e}")
+        scratch.cleanup()
         return
 
-    # Run tippecanoe with progress tracking with default options
-    print(f"Running tippecanoe for {dataset_name} ...")
+    dataset.geojson_file.name = geojson_object_name
+    dataset.profile = profile
+    dataset.save()
 
-    success = run_tippecanoe_with_progress(
-        local_geojson_path, local_pmtiles_path, redis_key
+    # Hand the local copy to the artifact cache for later builds
+    try:
+        artifact_cache.put(geojson_object_name, local_geojson_path)
+    except Exception as e:
+        print(f"Warning: Failed to cache {geojson_object_name}: {e}")
+    finally:
+        scratch.cleanup()
+
+    additional_options = DEFAULT_TIPPECANOE_OPTIONS
+    build_key = get_build_key(
+        s3_service.get_object_etag(geojson_object_name),
+        additional_options,
+        dataset.name,
+    )
+    pmtiles_object_name = f"datasets/pmtiles/{dataset_name}_{tileset.id}.pmtiles"
+    complete_tileset_build(
+        tileset,
+        local_pmtiles_path,
+        pmtiles_object_name,
+        build_key,
+        additional_options,
+        redis_key,
     )
 
-    if not success:
-        tileset.status = TaskStatus.FAILED
-        tileset.save()
+    # Store the columns read during the stream once the tiles are out
+    try:
+        with record_stage("indexing", dataset, tileset) as timer:
+            timer.bytes_moved = store_columns(dataset, numeric_fields)
+        create_dataset_tier_lists.delay(dataset.id)
+    except Exception as e:
+        print(f"Error indexing columns of dataset {dataset.id}: {e}")
+
+
+@shared_task(acks_late=True)
+def process_uploaded_geojson(dataset_id, dataset_name):
+    print(f"Start to process {dataset_name} ...")
+
+    try:
+        dataset = Dataset.objects.get(id=dataset_id)
+    except Dataset.DoesNotExist:
+        print(f"Dataset with id {dataset_id} does not exist")
         return
 
-    # Extract and save metadata
-    print("Extracting metadata from PMTiles...")
-    pmtiles_metadata = extract_pmtiles_metadata(local_pmtiles_path)
+    redis_client = get_redis_client()
+    redis_key = f"dataset:{dataset_id}"
 
-    if pmtiles_metadata:
-        tileset.metadata = pmtiles_metadata
-        tileset.save()
-        print(f"Saved metadata to tileset {tileset.id}")
-    else:
-        print("No metadata found in PMTiles file")
+    # Normalize the upload to GeoJSONSeq unless the shapefile conversion
+    # already produced it
+    publish_progress(
+        redis_client, redis_key, TaskStatus.IN_PROGRESS, 0, stage="converting"
+    )
+    scratch = artifact_cache.scratch_dir()
+    local_geojson_path = os.path.join(scratch.name, f"{dataset_name}.geojsons")
+    try:
+        with record_stage("converting", dataset):
+            geojson_object_name = ensure_geojsonseq(dataset)
+        # Fetched once for the whole build, and linked so the cached copy is
+        # not evicted while the build waits for admission and runs
+        with record_stage("downloading", dataset) as timer:
+            artifact_cache.fetch_into(geojson_object_name, local_geojson_path)
+            timer.bytes_moved = os.path.getsize(local_geojson_path)
+    except Exception as e:
+        publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
+        print(f"Failed to convert {dataset_name} to GeoJSONSeq: {e}")
+        scratch.cleanup()
+        return
 
-    # Upload to MinIO
-    print("Uploading pmtiles to MinIO ...")
-    pmtiles_object_name = f"datasets/pmtiles/{dataset_name}.pmtiles"
+    # Index the numeric attributes for tier lists alongside the tiling rather
+    # than ahead of it
+    index_dataset_columns.delay(dataset.id)
 
-    if upload_pmtiles_to_minio(local_pmtiles_path, pmtiles_object_name):
-        tileset.pmtiles_file.name = pmtiles_object_name
-        tileset.status = TaskStatus.COMPLETED
-        tileset.save()
+    tileset = Tileset.objects.create(
+        dataset=dataset, name="default", status=TaskStatus.IN_PROGRESS, metadata={}
+    )
+    print(f"Created Tileset with id {tileset.id}")
 
-        redis_client.hset(
+    local_pmtiles_path = f"/tmp/{dataset_name}_{dataset_id}.pmtiles"
+
+    additional_options = DEFAULT_TIPPECANOE_OPTIONS
+
+    try:
+        # Reuse an identical completed build
+        try:
+            build_key = get_build_key(
+                s3_service.get_object_etag(geojson_object_name),
+                additional_options,
+                dataset.name,
+            )
+            if reuse_completed_build(tileset, build_key):
+                publish_progress(redis_client, redis_key, TaskStatus.COMPLETED, 100)
+                return
+        except Exception as e:
+            publish_progress(redis_client, redis_key, TaskStatus.FAILED, 0)
+            tileset.status = TaskStatus.FAILED
+            tileset.save()
+            print(f"Failed to look up an identical build: {e}")
+            return
+
+        # Run tippecanoe with progress tracking with default options
+        print(f"Running tippecanoe for {dataset_name} ...")
+
+        success = run_tippecanoe_with_admission(
+            local_geojson_path,
+            local_pmtiles_path,
             redis_key,
-            mapping={
-                "status": TaskStatus.COMPLETED,
-                "progress": 100,
-            },
+            additional_options,
+            dataset,
+            tileset,
         )
-        print(f"Updated Tileset {tileset.id} with completion status")
-    else:
+    finally:
+        scratch.cleanup()
+
+    if not success:
         tileset.status = TaskStatus.FAILED
         tileset.save()
+        return
+
+    pmtiles_object_name = f"datasets/pmtiles/{dataset_name}_{tileset.id}.pmtiles"
+    complete_tileset_build(
+        tileset,
+        local_pmtiles_path,
+        pmtiles_object_name,
+        build_key,
+        additional_options,
+        redis_key,
+    )
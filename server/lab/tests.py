@@ -1 +1,1669 @@
-# Create your tests here.
+import contextlib
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+from unittest import mock
+
+import fiona
+import mapclassify
+import numpy as np
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.core.handlers.asgi import ASGIHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from botocore.exceptions import ClientError
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from pmtiles.tile import (
+    Compression,
+    Entry,
+    TileType,
+    serialize_directory,
+    tileid_to_zxy,
+)
+
+from .admission import BuildScheduler
+from .classification import (
+    classify,
+    compute_breaks,
+    count_classes,
+    fisher_jenks,
+    natural_breaks,
+    stratified_sample,
+)
+from .columns import column_statistics
+from .column_store import get_column_object_name, get_manifest_object_name
+from .constants import ClassificationMethod, TaskStatus, UploadStatus
+from .diagnostics import TippecanoeDiagnostics
+from .profiling import DatasetProfiler, choose_tippecanoe_options
+from .models import Dataset, Tileset, TierList, UploadSession
+from .progress import format_event
+from .serializers import SweepCreateSerializer
+from .streaming import CHUNK_SIZE, open_pipe, tee_stream
+from .utils import ArtifactCache, get_cached_presigned_urls
+from .sweeps import expand_option_grid
+from .tasks import (
+    ensure_geojsonseq,
+    get_build_key,
+    process_uploaded_geojson,
+    run_tippecanoe_with_progress,
+    stream_shapefile_to_tiles,
+)
+from .tiles import analyze_tiles
+
+# mapclassify warns that it falls back to pure Python without numba
+warnings.filterwarnings("ignore", message="Numba not installed")
+
+GIB = 1024**3
+
+
+def encode(value):
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """In-memory stand-in for the hash, lock and pipeline commands used here."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.published = []
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.hashes.setdefault(key, {}).update(
+            {encode(f): encode(v) for f, v in fields.items()}
+        )
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(encode(field), None)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def lock(self, name, timeout=None):
+        return contextlib.nullcontext()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.client, name), args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+def squared_deviations(values, breaks):
+    """Total squared deviation of values from the means of their classes."""
+    classes = np.searchsorted(breaks, values, side="left")
+    return sum(
+        ((values[classes == c] - values[classes == c].mean()) ** 2).sum()
+        for c in np.unique(classes)
+    )
+
+
+class FisherJenksTests(SimpleTestCase):
+    def test_matches_mapclassify_on_distinct_values(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            values = np.sort(rng.normal(size=int(rng.integers(10, 60))))
+            k = int(rng.integers(2, 7))
+            expected = mapclassify.FisherJenks(values, k=k).bins
+            breaks = fisher_jenks(values, np.ones(values.size), k)
+            np.testing.assert_allclose(breaks, expected)
+
+    def test_weights_stand_for_repeated_values(self):
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            values = rng.integers(0, 30, size=100).astype(np.float64)
+            k = int(rng.integers(2, 6))
+            unique_values, counts = np.unique(values, return_counts=True)
+            breaks = fisher_jenks(unique_values, counts.astype(np.float64), k)
+            expected = mapclassify.FisherJenks(values, k=k).bins
+            # Ties may split differently, but the fit must be as good
+            self.assertAlmostEqual(
+                squared_deviations(values, breaks),
+                squared_deviations(values, expected),
+            )
+
+    def test_one_class_per_value(self):
+        values = np.array([1.0, 2.0, 3.0])
+        self.assertEqual(fisher_jenks(values, np.ones(3), 3), [1.0, 2.0, 3.0])
+
+
+class NaturalBreaksTests(SimpleTestCase):
+    def test_exact_below_sample_size(self):
+        values = np.random.default_rng(2).normal(size=200)
+        breaks, sample_size = natural_breaks(values, 5, sample_size=500)
+        self.assertIsNone(sample_size)
+        np.testing.assert_allclose(
+            breaks, mapclassify.FisherJenks(np.sort(values), k=5).bins
+        )
+
+    def test_class_count_is_capped_by_unique_values(self):
+        breaks, _ = natural_breaks(np.array([1.0, 1.0, 2.0, 2.0]), 5, 100)
+        self.assertEqual(breaks, [1.0, 2.0])
+
+    def test_sampled_above_sample_size(self):
+        values = np.round(np.random.default_rng(3).lognormal(size=20000), 2)
+        breaks, sample_size = natural_breaks(values, 5, sample_size=800)
+        self.assertEqual(sample_size, 800)
+        self.assertEqual(len(breaks), 5)
+        self.assertEqual(breaks, sorted(breaks))
+        # The top class reaches the largest value even outside the sample
+        self.assertEqual(breaks[-1], values.max())
+        # And the fit is close to the exact one
+        exact, exact_sample_size = natural_breaks(values, 5, sample_size=5000)
+        self.assertIsNone(exact_sample_size)
+        self.assertLess(
+            squared_deviations(values, breaks),
+            1.1 * squared_deviations(values, exact),
+        )
+
+
+class StratifiedSampleTests(SimpleTestCase):
+    def test_weights_add_up_to_the_value_count(self):
+        unique_values = np.arange(1000, dtype=np.float64)
+        counts = np.random.default_rng(4).integers(1, 50, size=1000)
+        sampled, weights = stratified_sample(unique_values, counts, 100)
+        self.assertAlmostEqual(weights.sum(), counts.sum())
+        self.assertLessEqual(sampled.size, 100)
+        self.assertTrue(np.all(np.diff(sampled) > 0))
+
+    def test_one_value_per_stratum_of_equal_counts(self):
+        unique_values = np.arange(10, dtype=np.float64)
+        sampled, weights = stratified_sample(unique_values, np.full(10, 3), 5)
+        # Midpoints of five strata of six values each
+        np.testing.assert_array_equal(sampled, [1, 3, 5, 7, 9])
+        np.testing.assert_array_equal(weights, [6, 6, 6, 6, 6])
+
+    def test_heavy_values_collect_the_weight_of_their_strata(self):
+        unique_values = np.array([0.0, 1.0, 2.0])
+        sampled, weights = stratified_sample(unique_values, np.array([1, 98, 1]), 10)
+        np.testing.assert_array_equal(sampled, [1.0])
+        np.testing.assert_array_equal(weights, [100.0])
+
+
+class CountClassesTests(SimpleTestCase):
+    def test_values_on_a_break_belong_below_it(self):
+        values = np.array([0.0, 1.0, 1.5, 2.0, 3.0, 3.0])
+        self.assertEqual(count_classes(values, [1.0, 2.0, 3.0]), [2, 2, 2])
+
+    def test_every_class_is_counted(self):
+        values = np.array([5.0, 5.0])
+        self.assertEqual(count_classes(values, [1.0, 2.0, 5.0]), [0, 0, 2])
+
+
+class ClassifyTests(SimpleTestCase):
+    values = np.random.default_rng(5).gamma(2.0, size=5000)
+
+    def test_algorithm_matches_stored_tier_lists(self):
+        for method in (
+            ClassificationMethod.QUANTILE,
+            ClassificationMethod.NATURAL_BREAKS,
+            ClassificationMethod.PERCENTILE,
+        ):
+            _, stored, _ = compute_breaks(self.values, method, 2000)
+            _, algorithm, _ = classify(self.values, method, 5, None, 2000)
+            self.assertEqual(algorithm, stored)
+
+    def test_quantile(self):
+        breaks, algorithm, sample_size = classify(
+            self.values, ClassificationMethod.QUANTILE, 4, None, 2000
+        )
+        np.testing.assert_allclose(
+            breaks, np.quantile(self.values, [0.25, 0.5, 0.75, 1])
+        )
+        self.assertEqual(algorithm, "quantiles")
+        self.assertIsNone(sample_size)
+
+    def test_quantile_merges_collapsed_classes(self):
+        values = np.array([1.0] * 90 + [2.0] * 10)
+        breaks, _, _ = classify(values, ClassificationMethod.QUANTILE, 5, None, 2000)
+        self.assertEqual(breaks, [1.0, 2.0])
+
+    def test_percentile(self):
+        breaks, _, _ = classify(
+            self.values, ClassificationMethod.PERCENTILE, 5, [10, 50, 100], 2000
+        )
+        np.testing.assert_allclose(breaks, np.percentile(self.values, [10, 50, 100]))
+
+    def test_natural_breaks(self):
+        breaks, algorithm, sample_size = classify(
+            self.values, ClassificationMethod.NATURAL_BREAKS, 4, None, 500
+        )
+        self.assertEqual(len(breaks), 4)
+        self.assertEqual(algorithm, "fisher_jenks")
+        self.assertEqual(sample_size, 500)
+
+    def test_equal_interval(self):
+        values = np.array([0.0, 3.0, 10.0])
+        breaks, _, _ = classify(
+            values, ClassificationMethod.EQUAL_INTERVAL, 5, None, 2000
+        )
+        self.assertEqual(breaks, [2.0, 4.0, 6.0, 8.0, 10.0])
+
+    def test_std_mean(self):
+        values = np.random.default_rng(6).normal(10, 2, size=10000)
+        breaks, _, _ = classify(values, ClassificationMethod.STD_MEAN, 4, None, 2000)
+        mean, std = values.mean(), values.std()
+        np.testing.assert_allclose(breaks, [mean - std, mean, mean + std, values.max()])
+
+    def test_std_mean_drops_bounds_outside_the_values(self):
+        # Bounds at 1.5 standard deviations from the mean fall outside
+        values = np.array([0.0, 2.0])
+        breaks, _, _ = classify(values, ClassificationMethod.STD_MEAN, 5, None, 2000)
+        self.assertEqual(breaks, [0.5, 1.5, 2.0])
+
+    def test_std_mean_two_classes_split_at_the_mean(self):
+        values = np.array([0.0, 1.0, 5.0])
+        breaks, _, _ = classify(values, ClassificationMethod.STD_MEAN, 2, None, 2000)
+        self.assertEqual(breaks, [2.0, 5.0])
+
+    def test_head_tail(self):
+        values = np.array([1.0] * 80 + [10.0] * 15 + [100.0] * 5)
+        breaks, _, _ = classify(values, ClassificationMethod.HEAD_TAIL, 5, None, 2000)
+        self.assertEqual(breaks[-1], 100.0)
+        self.assertAlmostEqual(breaks[0], values.mean())
+        self.assertEqual(len(breaks), 3)
+
+    def test_head_tail_stops_when_the_head_is_no_minority(self):
+        values = np.arange(100, dtype=np.float64)
+        breaks, _, _ = classify(values, ClassificationMethod.HEAD_TAIL, 5, None, 2000)
+        self.assertEqual(breaks, [99.0])
+
+    def test_head_tail_respects_the_class_count(self):
+        values = np.array([1.0] * 1000 + [10.0] * 100 + [100.0] * 10 + [1000.0])
+        breaks, _, _ = classify(values, ClassificationMethod.HEAD_TAIL, 3, None, 2000)
+        self.assertEqual(len(breaks), 3)
+        self.assertEqual(breaks[-1], 1000.0)
+        more_breaks, _, _ = classify(
+            values, ClassificationMethod.HEAD_TAIL, 5, None, 2000
+        )
+        self.assertEqual(len(more_breaks), 4)
+
+    def test_head_tail_of_a_single_value(self):
+        breaks, _, _ = classify(
+            np.array([4.0, 4.0]), ClassificationMethod.HEAD_TAIL, 5, None, 2000
+        )
+        self.assertEqual(breaks, [4.0])
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@mock.patch("lab.admission.shutil.disk_usage")
+@mock.patch("lab.admission.read_meminfo")
+class BuildSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.scheduler = BuildScheduler()
+        self.scheduler.poll_seconds = 0
+
+    def set_node(self, read_meminfo, disk_usage, memory=10 * GIB, disk=100 * GIB):
+        read_meminfo.return_value = (memory, memory)
+        disk_usage.return_value = mock.Mock(total=disk, free=disk)
+
+    def reservations(self):
+        return self.redis.hgetall(self.scheduler.reservations_key)
+
+    def test_admit_reserves_and_releases(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        with self.scheduler.admit(self.redis, "job-1", 2 * GIB, 5 * GIB):
+            reservation = json.loads(self.reservations()[b"job-1"])
+            self.assertEqual(reservation["memory"], 2 * GIB)
+            self.assertEqual(reservation["disk"], 5 * GIB)
+        self.assertEqual(self.reservations(), {})
+
+    def test_admit_releases_when_the_build_fails(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        with self.assertRaises(RuntimeError):
+            with self.scheduler.admit(self.redis, "job-1", GIB, GIB):
+                raise RuntimeError
+        self.assertEqual(self.reservations(), {})
+
+    def test_builds_that_fit_run_together(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "a", 4 * GIB, GIB))
+        # 80% of 10 GiB leaves room for a second 4 GiB build but not a third
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "b", 4 * GIB, GIB))
+        self.assertFalse(self.scheduler.try_reserve(self.redis, "c", 4 * GIB, GIB))
+        self.scheduler.release(self.redis, "a")
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "c", 4 * GIB, GIB))
+
+    def test_disk_budget_is_enforced(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage, disk=10 * GIB)
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "a", GIB, 6 * GIB))
+        self.assertFalse(self.scheduler.try_reserve(self.redis, "b", GIB, 6 * GIB))
+
+    def test_admit_waits_until_capacity_frees_up(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        self.scheduler.try_reserve(self.redis, "running", 6 * GIB, GIB)
+        on_wait = mock.Mock()
+        sleeps = []
+
+        def sleep(seconds):
+            # The running build finishes after a couple of polls
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                self.scheduler.release(self.redis, "running")
+
+        with mock.patch("lab.admission.time.sleep", side_effect=sleep):
+            with self.scheduler.admit(self.redis, "waiting", 6 * GIB, GIB, on_wait):
+                self.assertEqual(list(self.reservations()), [b"waiting"])
+
+        self.assertEqual(len(sleeps), 2)
+        on_wait.assert_called_once_with()
+
+    def test_reservations_of_dead_processes_are_pruned(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        self.redis.hset(
+            self.scheduler.reservations_key,
+            "killed",
+            json.dumps({"memory": 8 * GIB, "disk": GIB, "pid": dead_pid()}),
+        )
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "new", 4 * GIB, GIB))
+        self.assertEqual(list(self.reservations()), [b"new"])
+
+    def test_lone_oversized_build_is_admitted(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        self.assertTrue(self.scheduler.try_reserve(self.redis, "big", 50 * GIB, GIB))
+
+    def test_oversized_build_waits_for_others(self, read_meminfo, disk_usage):
+        self.set_node(read_meminfo, disk_usage)
+        self.scheduler.try_reserve(self.redis, "small", GIB, GIB)
+        self.assertFalse(self.scheduler.try_reserve(self.redis, "big", 50 * GIB, GIB))
+
+
+def build_directories(root_entries, leaf_entries):
+    """Archive bytes holding a root directory followed by one leaf directory."""
+    leaf = serialize_directory(leaf_entries)
+    root = serialize_directory(
+        root_entries + [Entry(leaf_entries[0].tile_id, 0, len(leaf), 0)]
+    )
+    data = root + leaf
+    header = {
+        "root_offset": 0,
+        "root_length": len(root),
+        "leaf_directory_offset": len(root),
+    }
+    return (lambda offset, length: data[offset : offset + length]), header
+
+
+class AnalyzeTilesTests(SimpleTestCase):
+    def setUp(self):
+        get_bytes, header = build_directories(
+            [
+                Entry(0, 0, 100, 1),
+                # Tiles 1 and 2 share their contents
+                Entry(1, 300, 600, 1),
+                Entry(2, 300, 600, 1),
+                # A run over the last two tiles of zoom 1 and the first of zoom 2
+                Entry(3, 100, 200, 3),
+            ],
+            [Entry(6, 900, 50, 10), Entry(16, 950, 1000, 1)],
+        )
+        self.tile_stats, self.oversized_tiles = analyze_tiles(
+            get_bytes, header, budget_bytes=500
+        )
+
+    def test_runs_are_split_at_zoom_boundaries(self):
+        self.assertEqual(
+            {z: stats["tiles"] for z, stats in self.tile_stats.items()},
+            {"0": 1, "1": 4, "2": 12},
+        )
+        self.assertEqual(self.tile_stats["1"]["bytes"], 600 * 2 + 200 * 2)
+        self.assertEqual(self.tile_stats["2"]["bytes"], 200 + 50 * 10 + 1000)
+
+    def test_percentiles_are_weighted_by_run_length(self):
+        self.assertEqual(self.tile_stats["1"]["p50_bytes"], 200)
+        self.assertEqual(self.tile_stats["1"]["p95_bytes"], 600)
+        self.assertEqual(self.tile_stats["2"]["p50_bytes"], 50)
+        self.assertEqual(self.tile_stats["2"]["p95_bytes"], 1000)
+        self.assertEqual(self.tile_stats["2"]["max_bytes"], 1000)
+
+    def test_dedup_ratio_counts_shared_offsets_once(self):
+        self.assertEqual(self.tile_stats["0"]["dedup_ratio"], 1.0)
+        self.assertEqual(self.tile_stats["1"]["unique_tiles"], 2)
+        self.assertEqual(self.tile_stats["1"]["dedup_ratio"], 2.0)
+        self.assertEqual(self.tile_stats["2"]["unique_tiles"], 3)
+        self.assertEqual(self.tile_stats["2"]["dedup_ratio"], 4.0)
+
+    def test_oversized_tiles_are_listed_largest_first(self):
+        self.assertEqual(self.tile_stats["1"]["oversized_tiles"], 2)
+        self.assertEqual(self.tile_stats["2"]["oversized_tiles"], 1)
+        self.assertEqual(self.oversized_tiles["budget_bytes"], 500)
+        self.assertEqual(self.oversized_tiles["count"], 3)
+        self.assertEqual(
+            [
+                ((tile["z"], tile["x"], tile["y"]), tile["bytes"])
+                for tile in self.oversized_tiles["largest"]
+            ],
+            [
+                (tileid_to_zxy(16), 1000),
+                (tileid_to_zxy(1), 600),
+                (tileid_to_zxy(2), 600),
+            ],
+        )
+
+
+TIPPECANOE_STDERR = [
+    'For layer 0, using name "parcels"',
+    "120000 features, 9876543 bytes of geometry, 4321 bytes of separate "
+    "metadata, 56789 bytes of string pool",
+    "Choosing a maxzoom of -z14 for features about 3 feet (1 meters) apart",
+    "Choosing a base zoom of -B0 to keep 4 features in tile 0/0/0.",
+    "Choosing a drop rate of -r2.500000 to keep 5 features in tile 0/0/0.",
+    "Read 1.50 million features",
+    "  12.5%  3/4/2  ",
+    "tile 10/163/395 size is 640123 with detail 12, >500000",
+    "Going to try keeping the sparsest 78.23% of the features to make it fit",
+    "tile 10/163/395 size is 520456 with detail 12, >500000",
+    "Going to try keeping the sparsest 70.40% of the features to make it fit",
+    "tile 11/327/791 has 210000 features, >200000",
+    "Going to try keeping the sparsest 95.00% of the features to make it fit",
+    "could not make tile 12/654/1583 small enough",
+    "  99.9%  14/2620/6332  ",
+    "Unknown warning about attribute types",
+]
+
+
+class TippecanoeDiagnosticsTests(SimpleTestCase):
+    def parse(self, lines):
+        diagnostics = TippecanoeDiagnostics()
+        unparsed = [line for line in lines if not diagnostics.add_line(line)]
+        return diagnostics.result(), unparsed
+
+    def test_progress_lines_are_left_to_the_caller(self):
+        _, unparsed = self.parse(TIPPECANOE_STDERR)
+        self.assertEqual(
+            unparsed,
+            [
+                "Read 1.50 million features",
+                "  12.5%  3/4/2  ",
+                "  99.9%  14/2620/6332  ",
+            ],
+        )
+
+    def test_build_choices_are_parsed(self):
+        result, _ = self.parse(TIPPECANOE_STDERR)
+        self.assertEqual(result["layers"], ["parcels"])
+        self.assertEqual(result["feature_count"], 120000)
+        self.assertEqual(result["maximum_zoom"], 14)
+        self.assertEqual(result["base_zoom"], 0)
+        self.assertEqual(result["drop_rate"], 2.5)
+
+    def test_retried_tiles_are_counted_once(self):
+        result, _ = self.parse(TIPPECANOE_STDERR)
+        self.assertEqual(result["too_big_tiles"], 1)
+        self.assertEqual(result["retries"], 3)
+        self.assertEqual(result["dropping_tiles"], 2)
+        self.assertEqual(
+            result["zooms"]["10"],
+            {
+                "too_big_tiles": 1,
+                "too_many_features_tiles": 0,
+                "retries": 2,
+                "unfit_tiles": 0,
+                "dropping_tiles": 1,
+                # The last retry decides what the tile kept
+                "min_kept_percent": 70.4,
+                "mean_kept_percent": 70.4,
+            },
+        )
+        self.assertEqual(result["zooms"]["11"]["too_many_features_tiles"], 1)
+        self.assertEqual(result["zooms"]["11"]["min_kept_percent"], 95.0)
+        self.assertEqual(result["zooms"]["12"]["unfit_tiles"], 1)
+
+    def test_unmatched_lines_are_kept_as_messages(self):
+        result, _ = self.parse(TIPPECANOE_STDERR)
+        self.assertEqual(result["messages"], ["Unknown warning about attribute types"])
+        self.assertEqual(result["message_count"], 1)
+
+    def test_messages_are_capped(self):
+        result, _ = self.parse([f"warning {i}" for i in range(60)])
+        self.assertEqual(len(result["messages"]), 50)
+        self.assertEqual(result["message_count"], 60)
+
+
+# Stands in for tippecanoe: writes the given stderr, redrawing progress with
+# carriage returns as tippecanoe does, and records its arguments as the output
+FAKE_TIPPECANOE = """\
+#!{python}
+import json
+import sys
+output = sys.argv[sys.argv.index("-o") + 1]
+with open(output, "w") as f:
+    json.dump(sys.argv[1:], f)
+for line in {lines!r}:
+    end = "\\r" if line.lstrip()[:1].isdigit() else "\\n"
+    sys.stderr.write(line + end)
+sys.exit({exit_code})
+"""
+
+
+class RunTippecanoeWithProgressTests(SimpleTestCase):
+    def run_tippecanoe(self, exit_code=0):
+        with tempfile.TemporaryDirectory() as bin_dir:
+            script = os.path.join(bin_dir, "tippecanoe")
+            with open(script, "w") as f:
+                f.write(
+                    FAKE_TIPPECANOE.format(
+                        python=sys.executable,
+                        lines=TIPPECANOE_STDERR,
+                        exit_code=exit_code,
+                    )
+                )
+            os.chmod(script, 0o755)
+            path = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+            with (
+                mock.patch.dict(os.environ, {"PATH": path}),
+                mock.patch("lab.tasks.get_redis_client", return_value=FakeRedis()),
+                mock.patch("lab.tasks.publish_progress") as publish_progress,
+            ):
+                output_path = os.path.join(bin_dir, "out.pmtiles")
+                succeeded = run_tippecanoe_with_progress(
+                    "/tmp/parcels_7_input.geojsons",
+                    output_path,
+                    "key",
+                    "parcels",
+                    ["--maximum-zoom", "g"],
+                )
+            with open(output_path) as f:
+                args = json.load(f)
+        published = [call.args[2:] for call in publish_progress.call_args_list]
+        return succeeded, published, args
+
+    def test_layer_is_named_after_the_dataset(self):
+        _, _, args = self.run_tippecanoe()
+        self.assertEqual(args[0], "-o")
+        self.assertEqual(
+            args[2:],
+            [
+                "-f",
+                "-P",
+                "-l",
+                "parcels",
+                "--maximum-zoom",
+                "g",
+                "/tmp/parcels_7_input.geojsons",
+            ],
+        )
+
+    def test_only_progress_lines_are_published(self):
+        succeeded, published, _ = self.run_tippecanoe()
+        self.assertTrue(succeeded)
+        # "keeping 78.23% of the features" is not progress
+        self.assertEqual(
+            published, [(TaskStatus.IN_PROGRESS, 12), (TaskStatus.IN_PROGRESS, 99)]
+        )
+
+    def test_failure_publishes_the_last_progress(self):
+        succeeded, published, _ = self.run_tippecanoe(exit_code=1)
+        self.assertFalse(succeeded)
+        self.assertEqual(published[-1], (TaskStatus.FAILED, 99))
+
+
+class ProgressBatchTests(TestCase):
+    url = "/api/v1/progress/"
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch("lab.views.get_redis_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, dataset_ids=(), tileset_ids=()):
+        return self.client.get(
+            self.url,
+            {
+                "dataset_ids": ",".join(map(str, dataset_ids)),
+                "tileset_ids": ",".join(map(str, tileset_ids)),
+            },
+        )
+
+    def test_progress_is_read_from_redis(self):
+        self.redis.hset("dataset:1", mapping={"status": "in_progress", "progress": 40})
+        self.redis.hset(
+            "tileset:2",
+            mapping={"status": "in_progress", "progress": 70, "stage": "tiling"},
+        )
+        response = self.get([1], [2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "datasets": [
+                    {"dataset_id": 1, "status": "in_progress", "progress": 40}
+                ],
+                "tilesets": [
+                    {
+                        "tileset_id": 2,
+                        "status": "in_progress",
+                        "progress": 70,
+                        "stage": "tiling",
+                    }
+                ],
+            },
+        )
+
+    def test_ids_missing_from_redis_fall_back_to_the_database(self):
+        built = Dataset.objects.create(name="built")
+        Tileset.objects.create(
+            dataset=built, name="default", status=TaskStatus.COMPLETED
+        )
+        unbuilt = Dataset.objects.create(name="unbuilt")
+        failed = Tileset.objects.create(
+            dataset=built, name="custom", status=TaskStatus.FAILED
+        )
+        missing_id = failed.id + 1000
+
+        response = self.get([built.id, unbuilt.id, missing_id], [failed.id, missing_id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "datasets": [
+                    {"dataset_id": built.id, "status": "completed", "progress": 100},
+                    {"dataset_id": unbuilt.id, "status": "in_progress", "progress": 0},
+                ],
+                "tilesets": [
+                    {"tileset_id": failed.id, "status": "failed", "progress": 0}
+                ],
+            },
+        )
+
+    def test_at_most_500_ids_are_accepted(self):
+        self.assertEqual(self.get(range(250), range(250)).status_code, 200)
+        response = self.get(range(250), range(251))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("500", response.json()["error"])
+
+    def test_duplicate_ids_count_once(self):
+        self.assertEqual(self.get([1] * 501).status_code, 200)
+
+    def test_ids_must_be_integers(self):
+        self.assertEqual(self.get(["a"]).status_code, 400)
+
+
+class ExpandOptionGridTests(SimpleTestCase):
+    def test_every_combination_is_expanded(self):
+        self.assertEqual(
+            expand_option_grid(
+                {"-z": [12, 14], "--drop-densest-as-needed": [True, False]}
+            ),
+            [
+                "-z 12 --drop-densest-as-needed",
+                "-z 12",
+                "-z 14 --drop-densest-as-needed",
+                "-z 14",
+            ],
+        )
+
+    def test_base_options_come_first(self):
+        self.assertEqual(
+            expand_option_grid({"-r": [None, 2.5]}, base_options="-l 'my layer'"),
+            ["-l 'my layer'", "-l 'my layer' -r 2.5"],
+        )
+
+
+@override_settings(SWEEP_MAX_BUILDS=4)
+class SweepCreateSerializerTests(SimpleTestCase):
+    def validate(self, **data):
+        serializer = SweepCreateSerializer(data={"name": "sweep", **data})
+        return serializer.is_valid(), serializer
+
+    def test_options_are_split_and_deduplicated(self):
+        valid, serializer = self.validate(
+            option_sets=["-z 14"], grid={"-z": [14, 12]}, base_options=""
+        )
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(
+            serializer.validated_data["options"], [["-z", "14"], ["-z", "12"]]
+        )
+
+    def test_builds_up_to_the_limit_are_accepted(self):
+        valid, serializer = self.validate(grid={"-z": [12, 14], "-r": [1, 2]})
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(len(serializer.validated_data["options"]), 4)
+
+    def test_grid_over_the_limit_is_rejected(self):
+        valid, serializer = self.validate(grid={"-z": [10, 12, 14], "-r": [1, 2]})
+        self.assertFalse(valid)
+        self.assertIn("grid", serializer.errors)
+
+    def test_option_sets_and_grid_over_the_limit_are_rejected(self):
+        valid, serializer = self.validate(
+            option_sets=["-z 8"], grid={"-z": [12, 14], "-r": [1, 2]}
+        )
+        self.assertFalse(valid)
+        self.assertIn("more than the 4 allowed", str(serializer.errors))
+
+    def test_server_managed_options_are_rejected(self):
+        valid, _ = self.validate(option_sets=["-o out.pmtiles"])
+        self.assertFalse(valid)
+
+
+class RecordingSink(io.BytesIO):
+    def close(self):
+        self.received = self.getvalue()
+        super().close()
+
+
+class FailingCloseSink(RecordingSink):
+    def close(self):
+        super().close()
+        raise BrokenPipeError
+
+
+class TeeStreamTests(SimpleTestCase):
+    data = os.urandom(CHUNK_SIZE * 2 + 10)
+
+    def test_every_sink_receives_the_stream(self):
+        sinks = {"a": RecordingSink(), "b": RecordingSink()}
+        self.assertEqual(tee_stream(io.BytesIO(self.data), sinks), set())
+        self.assertEqual(sinks["a"].received, self.data)
+        self.assertEqual(sinks["b"].received, self.data)
+
+    def test_sink_whose_reader_is_gone_is_dropped(self):
+        reader, writer = open_pipe()
+        reader.close()
+        healthy = RecordingSink()
+        failed = tee_stream(
+            io.BytesIO(self.data), {"tippecanoe": writer, "columns": healthy}
+        )
+        self.assertEqual(failed, {"tippecanoe"})
+        self.assertTrue(writer.closed)
+        self.assertEqual(healthy.received, self.data)
+
+    def test_sink_failing_to_close_is_reported(self):
+        sinks = {"a": FailingCloseSink(), "b": RecordingSink()}
+        self.assertEqual(tee_stream(io.BytesIO(self.data), sinks), {"a"})
+        self.assertEqual(sinks["b"].received, self.data)
+
+
+@mock.patch("lab.views.s3_service")
+class UploadSessionCreateTests(TestCase):
+    url = "/api/v1/uploads/"
+
+    def create(self, filename):
+        return self.client.post(
+            self.url,
+            {"name": "parcels", "geojson_file": {"filename": filename, "size": 10}},
+            content_type="application/json",
+        )
+
+    def test_objects_are_keyed_by_session(self, s3_service):
+        s3_service.create_multipart_upload.return_value = "upload"
+        s3_service.list_uploaded_parts.return_value = []
+        s3_service.generate_presigned_part_url.return_value = "http://minio/part"
+        first = self.create("parcels.geojson")
+        second = self.create("parcels.geojson")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        for response in (first, second):
+            session_id = response.json()["id"]
+            self.assertEqual(
+                UploadSession.objects.get(id=session_id).files["geojson_file"][
+                    "object_name"
+                ],
+                f"datasets/geojson/{session_id}/parcels.geojson",
+            )
+
+    def test_path_separators_are_rejected(self, s3_service):
+        for filename in ("../escape.geojson", "nested/parcels.geojson", "a\\b.geojson"):
+            self.assertEqual(self.create(filename).status_code, 400)
+        s3_service.create_multipart_upload.assert_not_called()
+        self.assertFalse(UploadSession.objects.exists())
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code}}, "Operation")
+
+
+@mock.patch("lab.views.s3_service")
+class UploadSessionCompleteTests(TestCase):
+    def setUp(self):
+        self.session = UploadSession.objects.create(
+            name="parcels",
+            files={
+                field_name: {
+                    "filename": f"parcels.{ext}",
+                    "object_name": f"datasets/shapefile/1/parcels.{ext}",
+                    "upload_id": f"upload-{ext}",
+                    "size": 10,
+                    "part_size": 10,
+                    "part_count": 1,
+                }
+                for field_name, ext in (("shp_file", "shp"), ("dbf_file", "dbf"))
+            },
+        )
+        self.url = f"/api/v1/uploads/{self.session.id}/complete/"
+        patcher = mock.patch("lab.views.start_dataset_processing")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_resumes_after_a_partial_failure(self, s3_service):
+        s3_service.list_uploaded_parts.return_value = [
+            {"PartNumber": 1, "ETag": "etag", "Size": 10}
+        ]
+        s3_service.complete_multipart_upload.side_effect = [
+            None,
+            client_error("InternalError"),
+        ]
+        self.assertEqual(self.client.post(self.url).status_code, 500)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadStatus.PENDING)
+        self.assertTrue(self.session.files["shp_file"]["completed"])
+        self.assertNotIn("completed", self.session.files["dbf_file"])
+
+        s3_service.complete_multipart_upload.reset_mock(side_effect=True)
+        self.assertEqual(self.client.post(self.url).status_code, 201)
+        s3_service.complete_multipart_upload.assert_called_once()
+        self.assertEqual(
+            s3_service.complete_multipart_upload.call_args.args[1], "upload-dbf"
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadStatus.COMPLETED)
+        self.assertEqual(
+            self.session.dataset.shp_file.name, "datasets/shapefile/1/parcels.shp"
+        )
+
+    def test_upload_assembled_earlier_counts_as_done(self, s3_service):
+        s3_service.list_uploaded_parts.side_effect = client_error("NoSuchUpload")
+        s3_service.get_object_size.return_value = 10
+        self.assertEqual(self.client.post(self.url).status_code, 201)
+        s3_service.complete_multipart_upload.assert_not_called()
+
+    def test_missing_upload_without_its_object_fails(self, s3_service):
+        s3_service.list_uploaded_parts.side_effect = client_error("NoSuchUpload")
+        s3_service.get_object_size.side_effect = client_error("404")
+        self.assertEqual(self.client.post(self.url).status_code, 500)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadStatus.PENDING)
+
+    def test_completed_session_conflicts(self, s3_service):
+        self.session.status = UploadStatus.COMPLETED
+        self.session.save()
+        self.assertEqual(self.client.post(self.url).status_code, 409)
+        s3_service.list_uploaded_parts.assert_not_called()
+
+
+class FakeS3:
+    """Objects of 100 bytes whose ETag is their name."""
+
+    bucket_name = "bucket"
+
+    def __init__(self):
+        self.internal_client = self
+        self.downloads = []
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": f'"{Key}"', "ContentLength": 100}
+
+    def download_file(self, object_name, local_path, extra_args=None):
+        self.downloads.append(object_name)
+        with open(local_path, "wb") as f:
+            f.write(b"x" * 100)
+
+
+class ArtifactCacheTests(SimpleTestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.work_dir = temp_dir.name
+        self.s3 = FakeS3()
+        self.cache = ArtifactCache(self.s3)
+        self.cache.cache_dir = os.path.join(temp_dir.name, "cache")
+        # Room for two entries
+        self.cache.max_bytes = 200
+
+    def cached(self):
+        return len(os.listdir(self.cache.cache_dir))
+
+    def test_fetch_reuses_entries(self):
+        first = self.cache.fetch("a.geojsons")
+        self.assertEqual(self.cache.fetch("a.geojsons"), first)
+        self.assertEqual(self.s3.downloads, ["a.geojsons"])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        a = self.cache.fetch("a.geojsons")
+        os.utime(a, (0, 0))
+        self.cache.fetch("b.geojsons")
+        self.cache.fetch("c.geojsons")
+        self.assertFalse(os.path.exists(a))
+        self.assertEqual(self.cached(), 2)
+
+    def test_linked_entries_are_not_evicted(self):
+        local_path = os.path.join(self.work_dir, "a.geojsons")
+        self.cache.fetch_into("a.geojsons", local_path)
+        a = self.cache.fetch("a.geojsons")
+        os.utime(a, (0, 0))
+        self.cache.fetch("b.geojsons")
+        self.cache.fetch("c.geojsons")
+        self.assertTrue(os.path.exists(a))
+        self.assertEqual(self.cached(), 2)
+
+        # Removing the link releases the entry
+        os.remove(local_path)
+        self.cache.fetch("d.geojsons")
+        self.assertFalse(os.path.exists(a))
+
+    def test_scratch_dirs_are_on_the_cache_filesystem(self):
+        with self.cache.scratch_dir() as scratch:
+            self.assertEqual(
+                os.path.commonpath([scratch, self.cache.cache_dir]),
+                self.cache.cache_dir,
+            )
+            local_path = os.path.join(scratch, "a.geojsons")
+            self.cache.fetch_into("a.geojsons", local_path)
+            self.assertEqual(os.stat(local_path).st_nlink, 2)
+
+            # Eviction leaves the scratch directories alone
+            self.cache.fetch("b.geojsons")
+            self.cache.fetch("c.geojsons")
+            self.assertTrue(os.path.exists(local_path))
+
+    def test_entry_evicted_before_linking_is_fetched_again(self):
+        stale_path = self.cache.fetch("a.geojsons")
+        os.remove(stale_path)
+        local_path = os.path.join(self.work_dir, "a.geojsons")
+        self.cache.fetch_into("a.geojsons", local_path, stale_path)
+        self.assertEqual(os.stat(local_path).st_nlink, 2)
+        self.assertEqual(self.s3.downloads, ["a.geojsons", "a.geojsons"])
+
+
+class ColumnStoreNamingTests(SimpleTestCase):
+    def test_datasets_of_the_same_name_do_not_share_columns(self):
+        first, second = Dataset(id=1, name="parcels"), Dataset(id=2, name="parcels")
+        self.assertNotEqual(
+            get_manifest_object_name(first), get_manifest_object_name(second)
+        )
+        self.assertNotEqual(
+            get_column_object_name(first, "area"),
+            get_column_object_name(second, "area"),
+        )
+        self.assertTrue(
+            get_column_object_name(first, "a/b").startswith("datasets/columns/1/")
+        )
+
+
+class ProcessUploadedGeojsonTests(TestCase):
+    def test_geojsonseq_is_fetched_once(self):
+        dataset = Dataset.objects.create(name="parcels")
+        linked_paths = []
+
+        def fetch_into(object_name, local_path, cached_path=None):
+            with open(local_path, "w") as f:
+                f.write("{}\n")
+            linked_paths.append(local_path)
+            return local_path
+
+        with (
+            mock.patch("lab.tasks.get_redis_client", return_value=FakeRedis()),
+            mock.patch("lab.tasks.ensure_geojsonseq", return_value="parcels.geojsons"),
+            mock.patch("lab.tasks.s3_service.get_object_etag", return_value="etag"),
+            mock.patch("lab.tasks.index_dataset_columns"),
+            mock.patch("lab.tasks.reuse_completed_build", return_value=False),
+            mock.patch("lab.tasks.complete_tileset_build"),
+            mock.patch(
+                "lab.tasks.run_tippecanoe_with_admission", return_value=True
+            ) as run_tippecanoe,
+            mock.patch("lab.tasks.artifact_cache") as artifact_cache,
+        ):
+            artifact_cache.fetch_into.side_effect = fetch_into
+            artifact_cache.scratch_dir.side_effect = tempfile.TemporaryDirectory
+            process_uploaded_geojson(dataset.id, dataset.name)
+
+        artifact_cache.fetch.assert_not_called()
+        self.assertEqual(len(linked_paths), 1)
+        self.assertEqual(run_tippecanoe.call_args.args[0], linked_paths[0])
+        self.assertFalse(os.path.exists(linked_paths[0]))
+
+
+class TileEndpointTests(TestCase):
+    header = {
+        "min_zoom": 2,
+        "max_zoom": 10,
+        "tile_type": TileType.MVT,
+        "tile_compression": Compression.GZIP,
+    }
+
+    def setUp(self):
+        dataset = Dataset.objects.create(name="parcels")
+        self.tileset = Tileset.objects.create(
+            dataset=dataset,
+            name="default",
+            status=TaskStatus.COMPLETED,
+            pmtiles_file="datasets/pmtiles/parcels_1.pmtiles",
+        )
+        patchers = {
+            "get_header_and_root": mock.patch(
+                "lab.views.get_header_and_root", return_value=(self.header, [])
+            ),
+            "get_tile": mock.patch(
+                "lab.views.get_tile", return_value=(b"tile", self.header)
+            ),
+        }
+        self.get_header_and_root = patchers["get_header_and_root"].start()
+        self.get_tile = patchers["get_tile"].start()
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+    def get(self, z, x, y):
+        return self.client.get(
+            f"/api/v1/datasets/{self.tileset.dataset_id}/tilesets/"
+            f"{self.tileset.id}/tiles/{z}/{x}/{y}.mvt"
+        )
+
+    def test_tile_is_served(self):
+        response = self.get(3, 1, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"tile")
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.get_tile.assert_called_once_with(
+            self.tileset.pmtiles_file.name,
+            self.tileset.updated_at.isoformat(),
+            3,
+            1,
+            2,
+        )
+
+    def test_missing_tile_is_no_content(self):
+        self.get_tile.return_value = (None, self.header)
+        self.assertEqual(self.get(3, 1, 2).status_code, 204)
+
+    def test_zoom_above_pmtiles_range_is_rejected_without_reads(self):
+        for z in (32, 10**6):
+            self.assertEqual(self.get(z, 0, 0).status_code, 400)
+        self.get_header_and_root.assert_not_called()
+
+    def test_zoom_outside_the_tileset_is_not_found_without_tile_reads(self):
+        self.assertEqual(self.get(1, 0, 0).status_code, 404)
+        self.assertEqual(self.get(11, 0, 0).status_code, 404)
+        self.get_tile.assert_not_called()
+
+    def test_coordinates_outside_the_zoom_are_rejected(self):
+        self.assertEqual(self.get(3, 8, 0).status_code, 400)
+        self.assertEqual(self.get(3, 0, 8).status_code, 400)
+        self.get_header_and_root.assert_not_called()
+
+    def test_storage_errors_are_reported(self):
+        self.get_header_and_root.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+        )
+        self.assertEqual(self.get(3, 1, 2).status_code, 500)
+
+    def test_unfinished_tileset_is_not_found(self):
+        self.tileset.status = TaskStatus.IN_PROGRESS
+        self.tileset.save()
+        self.assertEqual(self.get(3, 1, 2).status_code, 404)
+
+
+class BuildKeyTests(SimpleTestCase):
+    def test_key_covers_input_options_and_layer_name(self):
+        key = get_build_key("etag", ["-z", "14"], "parcels")
+        self.assertEqual(key, get_build_key("etag", ["-z", "14"], "parcels"))
+        self.assertNotEqual(key, get_build_key("other", ["-z", "14"], "parcels"))
+        self.assertNotEqual(key, get_build_key("etag", ["-z", "12"], "parcels"))
+        self.assertNotEqual(key, get_build_key("etag", ["-z", "14"], "roads"))
+
+
+@mock.patch("lab.tasks.convert_to_geojsonseq")
+@mock.patch("lab.tasks.upload_geojsonseq", return_value="uploaded")
+@mock.patch("lab.tasks.s3_service")
+class EnsureGeojsonseqTests(SimpleTestCase):
+    def setUp(self):
+        self.dataset = Dataset(id=7, name="parcels")
+        self.dataset.geojson_file.name = "datasets/geojson/1/parcels.geojson"
+        self.redis = FakeRedis()
+        self.redis.lock = mock.Mock(wraps=self.redis.lock)
+        patcher = mock.patch("lab.tasks.get_redis_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache = ArtifactCache(FakeS3())
+        self.cache.cache_dir = temp_dir.name
+        patcher = mock.patch("lab.tasks.artifact_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_existing_object_is_not_converted(self, s3_service, upload, convert):
+        s3_service.check_object_exists.return_value = True
+        self.assertEqual(
+            ensure_geojsonseq(self.dataset),
+            "datasets/geojsonseq/parcels_7.geojsons",
+        )
+        self.redis.lock.assert_not_called()
+        convert.assert_not_called()
+
+    def test_conversion_runs_under_the_object_lock(self, s3_service, upload, convert):
+        s3_service.check_object_exists.return_value = False
+        self.assertEqual(ensure_geojsonseq(self.dataset), "uploaded")
+        self.assertEqual(
+            self.redis.lock.call_args.args[0],
+            "datasets/geojsonseq/parcels_7.geojsons:lock",
+        )
+        source_path, local_path = convert.call_args.args
+        # Each conversion has its own scratch directory
+        self.assertEqual(os.path.dirname(source_path), os.path.dirname(local_path))
+        self.assertTrue(
+            source_path.startswith(os.path.join(self.cache.cache_dir, "work"))
+        )
+        self.assertFalse(os.path.exists(os.path.dirname(local_path)))
+
+    def test_object_converted_while_waiting_is_reused(
+        self, s3_service, upload, convert
+    ):
+        s3_service.check_object_exists.side_effect = [False, True]
+        self.assertEqual(
+            ensure_geojsonseq(self.dataset),
+            "datasets/geojsonseq/parcels_7.geojsons",
+        )
+        convert.assert_not_called()
+        upload.assert_not_called()
+
+
+# Stands in for ogr2ogr writing GeoJSONSeq to stdout, forever unless a
+# feature count is given
+FAKE_OGR2OGR = """\
+#!{python}
+import itertools
+import json
+import sys
+for i in itertools.islice(itertools.count(), {count}):
+    feature = {{
+        "type": "Feature",
+        "properties": {{"area": i * 1.5, "code": i}},
+        "geometry": {{"type": "Point", "coordinates": [139.0, 35.0]}},
+    }}
+    sys.stdout.write(json.dumps(feature) + "\\n")
+"""
+
+
+class StreamShapefileToTilesTests(TestCase):
+    def setUp(self):
+        dataset = Dataset.objects.create(name="parcels")
+        self.tileset = Tileset.objects.create(
+            dataset=dataset, name="default", status=TaskStatus.IN_PROGRESS
+        )
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.work_dir = temp_dir.name
+
+        # The schema declares code as text, so it is not a numeric field
+        self.shp_path = os.path.join(self.work_dir, "parcels.shp")
+        schema = {"geometry": "Point", "properties": {"area": "float", "code": "str"}}
+        with fiona.open(
+            self.shp_path, "w", driver="ESRI Shapefile", schema=schema
+        ) as dst:
+            dst.write(
+                {
+                    "geometry": {"type": "Point", "coordinates": (139.0, 35.0)},
+                    "properties": {"area": 1.0, "code": "a"},
+                }
+            )
+
+    def install(self, name, source):
+        path = os.path.join(self.work_dir, name)
+        with open(path, "w") as f:
+            f.write(source)
+        os.chmod(path, 0o755)
+
+    def stream(self, count, tippecanoe_exit_code):
+        self.install("ogr2ogr", FAKE_OGR2OGR.format(python=sys.executable, count=count))
+        self.install(
+            "tippecanoe",
+            FAKE_TIPPECANOE.format(
+                python=sys.executable, lines=[], exit_code=tippecanoe_exit_code
+            ),
+        )
+        path = f"{self.work_dir}{os.pathsep}{os.environ['PATH']}"
+        with (
+            mock.patch.dict(os.environ, {"PATH": path}),
+            mock.patch("lab.tasks.get_redis_client", return_value=FakeRedis()),
+            mock.patch("lab.tasks.publish_progress"),
+            mock.patch("lab.tasks.s3_service") as s3_service,
+        ):
+            s3_service.upload_fileobj.side_effect = lambda stream, key: stream.read()
+            try:
+                return s3_service, stream_shapefile_to_tiles(
+                    self.shp_path,
+                    os.path.join(self.work_dir, "parcels.geojsons"),
+                    "datasets/geojsonseq/parcels_1.geojsons",
+                    os.path.join(self.work_dir, "parcels.pmtiles"),
+                    "key",
+                    self.tileset,
+                )
+            except Exception as e:
+                return s3_service, e
+
+    def test_numeric_fields_come_from_the_schema(self):
+        s3_service, (columns, profile) = self.stream(count=3, tippecanoe_exit_code=0)
+        self.assertEqual(list(columns), ["area"])
+        self.assertEqual(columns["area"].tolist(), [0.0, 1.5, 3.0])
+        s3_service.internal_client.delete_object.assert_not_called()
+
+    def test_tippecanoe_failure_stops_the_stream(self):
+        # The converter never finishes unless it is stopped
+        s3_service, error = self.stream(count=None, tippecanoe_exit_code=1)
+        self.assertEqual(str(error), "Tippecanoe failed")
+        s3_service.internal_client.delete_object.assert_called_once_with(
+            Bucket=s3_service.bucket_name,
+            Key="datasets/geojsonseq/parcels_1.geojsons",
+        )
+
+
+class FakeAsyncRedis:
+    """Async stand-in for the hash and pub/sub commands of a progress stream."""
+
+    def __init__(self, hashes=None, messages=()):
+        self.hashes = hashes or {}
+        self.messages = list(messages)
+        self.subscribed = []
+        self.closed = False
+
+    async def hgetall(self, key):
+        return {encode(k): encode(v) for k, v in self.hashes.get(key, {}).items()}
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, channel):
+        self.subscribed.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        # None stands for a timeout without messages
+        message = self.messages.pop(0)
+        return None if message is None else {"data": json.dumps(message)}
+
+    async def unsubscribe(self):
+        pass
+
+    async def aclose(self):
+        self.closed = True
+
+
+class ProgressStreamTests(TestCase):
+    async def stream(self, url, redis):
+        with mock.patch("lab.progress.aioredis.Redis", return_value=redis):
+            response = await self.async_client.get(url)
+            if not response.streaming:
+                return response, None
+            chunks = [chunk async for chunk in response.streaming_content]
+        return response, b"".join(chunks).decode()
+
+    async def test_dataset_stream_forwards_updates_until_done(self):
+        dataset = await Dataset.objects.acreate(name="parcels")
+        redis = FakeAsyncRedis(
+            hashes={f"dataset:{dataset.id}": {"status": "in_progress", "progress": 40}},
+            messages=[None, {"status": "completed", "progress": 100}],
+        )
+        response, body = await self.stream(
+            f"/api/v1/datasets/{dataset.id}/progress/stream/", redis
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        fields = {"dataset_id": dataset.id, "dataset_name": "parcels"}
+        self.assertEqual(
+            body,
+            format_event({**fields, "status": "in_progress", "progress": 40})
+            + ": keep-alive\n\n"
+            + format_event({**fields, "status": "completed", "progress": 100}),
+        )
+        self.assertEqual(redis.subscribed, [f"progress:dataset:{dataset.id}"])
+        self.assertTrue(redis.closed)
+
+    async def test_finished_tileset_stream_ends_at_once(self):
+        dataset = await Dataset.objects.acreate(name="parcels")
+        tileset = await Tileset.objects.acreate(
+            dataset=dataset, name="default", status=TaskStatus.COMPLETED
+        )
+        redis = FakeAsyncRedis()
+        _, body = await self.stream(
+            f"/api/v1/datasets/{dataset.id}/tilesets/{tileset.id}/progress/stream/",
+            redis,
+        )
+        self.assertEqual(
+            body,
+            format_event(
+                {
+                    "tileset_id": tileset.id,
+                    "tileset_name": "default",
+                    "status": "completed",
+                    "progress": 0,
+                }
+            ),
+        )
+
+    async def test_unknown_dataset_is_not_found(self):
+        response, _ = await self.stream(
+            "/api/v1/datasets/0/progress/stream/", FakeAsyncRedis()
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AsgiApplicationTests(SimpleTestCase):
+    def load_application(self):
+        import server.asgi
+
+        self.addCleanup(importlib.reload, server.asgi)
+        return importlib.reload(server.asgi).application
+
+    @override_settings(DEBUG=True)
+    def test_static_files_are_served_in_debug(self):
+        self.assertIsInstance(self.load_application(), ASGIStaticFilesHandler)
+
+    @override_settings(DEBUG=False)
+    def test_static_files_are_left_to_the_server_otherwise(self):
+        application = self.load_application()
+        self.assertIsInstance(application, ASGIHandler)
+        self.assertNotIsInstance(application, ASGIStaticFilesHandler)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+@mock.patch("lab.views.create_dataset_tier_lists")
+class TierListViewTests(TestCase):
+    def setUp(self):
+        self.dataset = Dataset.objects.create(
+            name="parcels", numeric_fields=["area", "height"]
+        )
+        TierList.objects.create(
+            dataset=self.dataset,
+            field="area",
+            method=ClassificationMethod.QUANTILE,
+            breaks=[1.0, 2.0],
+        )
+        self.url = f"/api/v1/datasets/{self.dataset.id}/tiers/"
+
+    def test_stored_tier_lists_are_returned_and_missing_ones_queued(self, task):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(t["field"], t["method"]) for t in response.json()],
+            [("area", ClassificationMethod.QUANTILE)],
+        )
+        task.delay.assert_called_once_with(self.dataset.id)
+
+        # A computation already queued is not queued again
+        self.client.get(self.url)
+        task.delay.assert_called_once()
+
+    def test_nothing_is_queued_when_the_requested_ones_exist(self, task):
+        response = self.client.get(
+            self.url, {"field": "area", "method": ClassificationMethod.QUANTILE}
+        )
+        self.assertEqual(len(response.json()), 1)
+        task.delay.assert_not_called()
+
+    def test_nothing_is_queued_before_the_columns_are_stored(self, task):
+        self.dataset.numeric_fields = None
+        self.dataset.save()
+        self.client.get(self.url)
+        task.delay.assert_not_called()
+
+
+@mock.patch("lab.views.get_cached_classification", return_value=None)
+@mock.patch("lab.views.classify_dataset_field")
+class ClassifyEndpointTests(TestCase):
+    result = {
+        "field": "area",
+        "method": "quantile",
+        "breaks": [1.0, 2.0],
+        "counts": [3, 4],
+        "algorithm": "quantiles",
+        "sample_size": None,
+    }
+
+    def setUp(self):
+        self.dataset = Dataset.objects.create(name="parcels", numeric_fields=["area"])
+        self.url = f"/api/v1/datasets/{self.dataset.id}/classify/"
+
+    def classify(self):
+        return self.client.post(
+            self.url,
+            {"field": "area", "method": ClassificationMethod.QUANTILE, "k": 2},
+            content_type="application/json",
+        )
+
+    def test_cached_result_is_returned_without_a_task(self, task, cached):
+        cached.return_value = self.result
+        response = self.classify()
+        self.assertEqual(response.json(), self.result)
+        task.delay.assert_not_called()
+
+    @override_settings(CLASSIFICATION_TIMEOUT_SECONDS=5)
+    def test_classification_runs_on_a_worker(self, task, cached):
+        task.delay.return_value.get.return_value = self.result
+        response = self.classify()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.result)
+        task.delay.assert_called_once_with(
+            self.dataset.id, "area", ClassificationMethod.QUANTILE, 2, None
+        )
+        task.delay.return_value.get.assert_called_once_with(timeout=5)
+
+    @override_settings(CLASSIFICATION_TIMEOUT_SECONDS=5)
+    def test_slow_classification_asks_for_a_retry(self, task, cached):
+        task.delay.return_value.get.side_effect = CeleryTimeoutError()
+        response = self.classify()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+
+    def test_failed_classification_is_reported(self, task, cached):
+        task.delay.return_value.get.side_effect = ValueError("boom")
+        response = self.classify()
+        self.assertEqual(response.status_code, 500)
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch("lab.utils.s3_service")
+class PresignedUrlCacheTests(TestCase):
+    def setUp(self):
+        self.dataset = Dataset.objects.create(name="parcels")
+
+    def create_tileset(self, name, status=TaskStatus.COMPLETED):
+        tileset = Tileset.objects.create(dataset=self.dataset, name=name, status=status)
+        tileset.pmtiles_file.name = f"datasets/pmtiles/{name}.pmtiles"
+        tileset.save()
+        return tileset
+
+    def test_urls_are_signed_once(self, s3_service):
+        s3_service.check_object_exists.return_value = True
+        s3_service.generate_presigned_url.side_effect = lambda key, _: f"http://{key}"
+        first = get_cached_presigned_urls(["a.pmtiles", "b.pmtiles"])
+        second = get_cached_presigned_urls(["a.pmtiles", "b.pmtiles"])
+        self.assertEqual(first["a.pmtiles"], ("http://a.pmtiles", 3600))
+        self.assertEqual(second["a.pmtiles"][0], "http://a.pmtiles")
+        self.assertLessEqual(second["a.pmtiles"][1], 3600)
+        self.assertEqual(s3_service.generate_presigned_url.call_count, 2)
+        self.assertEqual(s3_service.check_object_exists.call_count, 2)
+
+    def test_missing_objects_are_left_out(self, s3_service):
+        s3_service.check_object_exists.return_value = False
+        self.assertEqual(get_cached_presigned_urls(["a.pmtiles"]), {})
+        get_cached_presigned_urls(["a.pmtiles"])
+        # Nothing was cached for the missing object
+        self.assertEqual(s3_service.check_object_exists.call_count, 2)
+
+    def test_deleting_a_tileset_drops_its_url(self, s3_service):
+        s3_service.check_object_exists.return_value = True
+        s3_service.generate_presigned_url.return_value = "http://old"
+        tileset = self.create_tileset("default")
+        get_cached_presigned_urls([tileset.pmtiles_file.name])
+        tileset.delete()
+
+        s3_service.generate_presigned_url.return_value = "http://new"
+        urls = get_cached_presigned_urls(["datasets/pmtiles/default.pmtiles"])
+        self.assertEqual(urls["datasets/pmtiles/default.pmtiles"][0], "http://new")
+
+    def test_batch_endpoint_lists_completed_tilesets(self, s3_service):
+        s3_service.check_object_exists.return_value = True
+        s3_service.generate_presigned_url.side_effect = lambda key, _: f"http://{key}"
+        completed = self.create_tileset("completed")
+        self.create_tileset("building", status=TaskStatus.IN_PROGRESS)
+        response = self.client.get(
+            f"/api/v1/datasets/{self.dataset.id}/tilesets/presigned_urls/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "tileset_id": completed.id,
+                    "tileset_name": "completed",
+                    "presigned_url": "http://datasets/pmtiles/completed.pmtiles",
+                    "expires_in": 3600,
+                }
+            ],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AttributeStatsTests(TestCase):
+    def setUp(self):
+        self.values = np.array([1.0, 2.0, 3.0, 4.0])
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.column_path = os.path.join(temp_dir.name, "area.npy")
+        np.save(self.column_path, self.values)
+
+        self.dataset = Dataset.objects.create(
+            name="parcels",
+            feature_count=5,
+            attribute_stats={"area": column_statistics(self.values, 5)},
+        )
+        self.url = f"/api/v1/datasets/{self.dataset.id}/stats/"
+        patcher = mock.patch(
+            "lab.column_store.fetch_column_paths",
+            return_value={"area": self.column_path},
+        )
+        self.fetch_column_paths = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_histograms_come_from_ingest(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        area = response.json()["area"]
+        self.assertEqual(area["count"], 4)
+        self.assertEqual(area["null_count"], 1)
+        self.assertEqual(len(area["histogram"]["counts"]), 20)
+        self.fetch_column_paths.assert_not_called()
+
+    def test_other_bins_are_computed_once(self):
+        for _ in range(2):
+            response = self.client.get(self.url, {"bins": 2})
+            self.assertEqual(
+                response.json()["area"]["histogram"],
+                {"edges": [1.0, 2.5, 4.0], "counts": [2, 2]},
+            )
+        self.fetch_column_paths.assert_called_once()
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {"field": "x"}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {"bins": 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"bins": "a"}).status_code, 400)
+
+        self.dataset.attribute_stats = None
+        self.dataset.save()
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class DatasetProfilerTests(SimpleTestCase):
+    def test_features_are_profiled(self):
+        profiler = DatasetProfiler()
+        profiler.add({"type": "Point", "coordinates": [1.0, 2.0]}, {"name": "ab"}, 10)
+        profiler.add(
+            {
+                "type": "Polygon",
+                "coordinates": [[[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 0.0]]],
+            },
+            {"name": "abcd", "area": 1.5},
+            30,
+        )
+        profile = profiler.result()
+        self.assertEqual(profile["feature_count"], 2)
+        self.assertEqual(profile["input_bytes"], 40)
+        self.assertEqual(profile["geometry_types"], {"Point": 1, "Polygon": 1})
+        self.assertEqual(profile["bounds"], [0.0, 0.0, 4.0, 4.0])
+        self.assertEqual(profile["features_per_square_degree"], 2 / 16)
+        self.assertEqual(profile["vertices"]["total"], 5)
+        self.assertEqual(profile["vertices"]["max"], 4)
+        self.assertEqual(profile["attribute_bytes"], {"name": 3.0, "area": 4.0})
+        self.assertEqual(profile["mean_attribute_bytes"], 7.0)
+
+    def test_empty_dataset(self):
+        profile = DatasetProfiler().result()
+        self.assertEqual(profile["feature_count"], 0)
+        self.assertIsNone(profile["bounds"])
+        self.assertIsNone(profile["vertices"])
+
+
+class ChooseTippecanoeOptionsTests(SimpleTestCase):
+    def profile(self, geometry_type, input_bytes=1024**2):
+        return {
+            "feature_count": 10000,
+            "input_bytes": input_bytes,
+            "geometry_types": {geometry_type: 10000},
+            "bounds": [139.0, 35.0, 140.0, 36.0],
+            "vertices": {"total": 50000, "mean": 5.0},
+            "mean_attribute_bytes": 40.0,
+        }
+
+    def choose(self, profile, budget=1800):
+        return choose_tippecanoe_options(profile, 500 * 1024, budget, 1024**2)
+
+    def test_polygons_are_coalesced(self):
+        options, decisions = self.choose(self.profile("MultiPolygon"))
+        self.assertIn("--coalesce-densest-as-needed", options)
+        self.assertEqual(decisions["geometry_type"], "Polygon")
+
+    def test_points_are_dropped(self):
+        options, _ = self.choose(self.profile("Point"))
+        self.assertIn("--drop-densest-as-needed", options)
+        self.assertNotIn("--coalesce-densest-as-needed", options)
+
+    def test_maximum_zoom_resolves_the_vertex_spacing(self):
+        options, decisions = self.choose(self.profile("Point"))
+        # 50000 vertices over a square degree are about 0.0045 degrees apart
+        self.assertEqual(decisions["detail_zoom"], 9)
+        self.assertEqual(options[:2], ["--maximum-zoom", "9"])
+        self.assertEqual(options[2:4], ["--maximum-tile-bytes", str(500 * 1024)])
+
+    def test_tight_budget_lowers_the_maximum_zoom(self):
+        options, decisions = self.choose(
+            self.profile("Point", input_bytes=1024**3), budget=60
+        )
+        self.assertEqual(decisions["maximum_zoom"], 4)
+        self.assertLessEqual(decisions["maximum_zoom"], decisions["detail_zoom"])
+        self.assertNotIn("--extend-zooms-if-still-dropping", options)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .classification import classify_column, classify, count_classes
+from .column_store import fetch_column_paths, open_column
+from .constants import ClassificationMethod
+from .models import TierList
+
+# Tier lists are kept for these methods, with the standard class count
+TIER_LIST_METHODS = [
+    ClassificationMethod.QUANTILE,
+    ClassificationMethod.NATURAL_BREAKS,
+    ClassificationMethod.PERCENTILE,
+]
+
+BULK_CREATE_BATCH_SIZE = 500
+
+# How long a queued computation of a dataset's tier lists keeps requests
+# from queueing another
+TIER_LISTS_QUEUED_SECONDS = 600
+
+_classification_pool = None
+
+
+def get_classification_pool():
+    """
+    Return the process pool tier lists are computed in, started on first use.
+    Its workers are started from a fork server so they do not inherit the
+    threads and connections of the web or worker process.
+    """
+    global _classification_pool
+    if _classification_pool is None:
+        _classification_pool = ProcessPoolExecutor(
+            max_workers=settings.CLASSIFICATION_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _classification_pool
+
+
+def classify_columns(column_paths, missing):
+    """
+    Classify every (field, method) in missing, one pool task each, given the
+    local column file of each field. Returns a dict of (field, method) to the
+    result of compute_breaks.
+    """
+    global _classification_pool
+    sample_size = settings.NATURAL_BREAKS_SAMPLE_SIZE
+    results = {}
+
+    # A single tier list is not worth the round trip through the pool
+    if len(missing) == 1:
+        field, method = missing[0]
+        try:
+            results[missing[0]] = classify_column(
+                column_paths[field], method, sample_size
+            )
+        except Exception as e:
+            print(f"Error creating {method} tier list for field {field}: {e}")
+        return results
+
+    pool = get_classification_pool()
+    futures = {
+        (field, method): pool.submit(
+            classify_column, column_paths[field], method, sample_size
+        )
+        for field, method in missing
+    }
+    for (field, method), future in futures.items():
+        try:
+            results[field, method] = future.result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next request
+            _classification_pool = None
+            raise
+        except Exception as e:
+            print(f"Error creating {method} tier list for field {field}: {e}")
+    return results
+
+
+def get_tier_lists_queued_key(dataset):
+    return f"tier-lists-queued:{dataset.id}"
+
+
+def get_missing_tier_lists(dataset, fields=None, methods=None):
+    """
+    Return the (field, method) pairs of the dataset's tier lists that do not
+    exist yet, limited to the given fields and methods. None are missing until
+    the dataset's columns are stored.
+    """
+    if dataset.numeric_fields is None:
+        return []
+
+    fields = [f for f in dataset.numeric_fields if fields is None or f in fields]
+    methods = [m.value for m in TIER_LIST_METHODS if methods is None or m in methods]
+
+    existing = set(
+        TierList.objects.filter(
+            dataset=dataset, field__in=fields, method__in=methods
+        ).values_list("field", "method")
+    )
+    return [
+        (field, method)
+        for field in fields
+        for method in methods
+        if (field, method) not in existing
+    ]
+
+
+def create_tier_lists(dataset):
+    """Compute and persist the tier lists of the dataset that do not exist yet."""
+    missing = get_missing_tier_lists(dataset)
+    if not missing:
+        return
+
+    column_paths = fetch_column_paths(dataset, {field for field, _ in missing})
+    results = classify_columns(column_paths, missing)
+    tier_lists = [
+        TierList(
+            dataset=dataset,
+            field=field,
+            method=method,
+            breaks=breaks,
+            algorithm=algorithm,
+            sample_size=sample_size,
+        )
+        for (field, method), (breaks, algorithm, sample_size) in results.items()
+    ]
+
+    # Concurrent requests may have computed the same tier lists meanwhile
+    with transaction.atomic():
+        TierList.objects.bulk_create(
+            tier_lists, batch_size=BULK_CREATE_BATCH_SIZE, ignore_conflicts=True
+        )
+    print(f"Created {len(tier_lists)} tier lists for dataset {dataset.id}")
+
+
+def get_classification_cache_key(dataset, field, method, k, percentiles):
+    # Column stores are rewritten with a new updated_at, which retires the key
+    params = json.dumps([dataset.updated_at.isoformat(), field, method, k, percentiles])
+    digest = hashlib.sha256(params.encode()).hexdigest()
+    return f"classification:{dataset.id}:{digest}"
+
+
+def get_cached_classification(dataset, field, method, k, percentiles=None):
+    """Return the memoized result of classify_field, or None."""
+    return cache.get(
+        get_classification_cache_key(dataset, field, method, k, percentiles)
+    )
+
+
+def classify_field(dataset, field, method, k, percentiles=None):
+    """
+    Classify a numeric field of the dataset with any method and class count,
+    memoized in the cache by dataset, field, method and parameters.
+    """
+    cache_key = get_classification_cache_key(dataset, field, method, k, percentiles)
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    path = fetch_column_paths(dataset, [field])[field]
+    values = open_column(path)
+    breaks, algorithm, sample_size = classify(
+        values, method, k, percentiles, settings.NATURAL_BREAKS_SAMPLE_SIZE
+    )
+    result = {
+        "field": field,
+        "method": method,
+        "breaks": breaks,
+        "counts": count_classes(values, breaks),
+        "algorithm": algorithm,
+        "sample_size": sample_size,
+    }
+    cache.set(cache_key, result, settings.CLASSIFICATION_CACHE_SECONDS)
+    return result
@@ -0,0 +1,229 @@
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from pmtiles.tile import (
+    Compression,
+    TileType,
+    deserialize_directory,
+    deserialize_header,
+    find_tile,
+    tileid_to_zxy,
+    zxy_to_tileid,
+)
+
+from .utils import s3_service
+
+# The PMTiles v3 spec guarantees the header and root directory fit in the
+# first 16 KiB of the archive, so a single read primes both.
+ROOT_FETCH_LENGTH = 16384
+MAX_DIRECTORY_DEPTH = 4
+
+# Deepest zoom level whose tile ids PMTiles can address
+MAX_TILE_ZOOM = 31
+
+# Tile ids are numbered zoom by zoom, each zoom starting after the 4**z
+# tiles of the ones before
+ZOOM_FIRST_TILE_IDS = [(4**z - 1) // 3 for z in range(33)]
+
+# Oversized tiles listed in a build's tile analysis, largest first
+MAX_REPORTED_OVERSIZED_TILES = 100
+
+TILE_CONTENT_TYPES = {
+    TileType.MVT: "application/vnd.mapbox-vector-tile",
+    TileType.PNG: "image/png",
+    TileType.JPEG: "image/jpeg",
+    TileType.WEBP: "image/webp",
+    TileType.AVIF: "image/avif",
+}
+
+CONTENT_ENCODINGS = {
+    Compression.GZIP: "gzip",
+    Compression.BROTLI: "br",
+    Compression.ZSTD: "zstd",
+}
+
+
+class TileCache:
+    """Thread-safe LRU cache of tile bytes bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+tile_cache = TileCache(max_bytes=64 * 1024 * 1024)
+
+
+def read_object_range(object_key, offset, length):
+    response = s3_service.internal_client.get_object(
+        Bucket=s3_service.bucket_name,
+        Key=object_key,
+        Range=f"bytes={offset}-{offset + length - 1}",
+    )
+    return response["Body"].read()
+
+
+# Cached entries are keyed by a version (e.g. the tileset's updated_at) as
+# well as the object key, so an archive rewritten under the same key is not
+# served from stale directories.
+@lru_cache(maxsize=256)
+def get_header_and_root(object_key, version):
+    data = read_object_range(object_key, 0, ROOT_FETCH_LENGTH)
+    header = deserialize_header(data[:127])
+    root_end = header["root_offset"] + header["root_length"]
+    if root_end <= len(data):
+        root = deserialize_directory(data[header["root_offset"] : root_end])
+    else:
+        root = deserialize_directory(
+            read_object_range(object_key, header["root_offset"], header["root_length"])
+        )
+    return header, root
+
+
+@lru_cache(maxsize=4096)
+def get_leaf_directory(object_key, version, offset, length):
+    return deserialize_directory(read_object_range(object_key, offset, length))
+
+
+def get_tile(object_key, version, z, x, y):
+    """
+    Return (tile bytes or None, header) for the given tile. Header and
+    directories are served from memory, so an uncached tile costs a single
+    ranged read of its data and a cached one costs none.
+    """
+    header, root = get_header_and_root(object_key, version)
+
+    cache_key = (object_key, version, z, x, y)
+    data = tile_cache.get(cache_key)
+    if data is not None:
+        return data, header
+
+    tile_id = zxy_to_tileid(z, x, y)
+    directory = root
+    for _ in range(MAX_DIRECTORY_DEPTH):
+        entry = find_tile(directory, tile_id)
+        if entry is None:
+            return None, header
+        if entry.run_length > 0:
+            data = read_object_range(
+                object_key, header["tile_data_offset"] + entry.offset, entry.length
+            )
+            tile_cache.set(cache_key, data)
+            return data, header
+        directory = get_leaf_directory(
+            object_key,
+            version,
+            header["leaf_directory_offset"] + entry.offset,
+            entry.length,
+        )
+
+    return None, header
+
+
+def iter_tile_entries(get_bytes, header):
+    """Yield the tile entries of the root and every leaf directory."""
+    directories = [(header["root_offset"], header["root_length"])]
+    while directories:
+        offset, length = directories.pop()
+        for entry in deserialize_directory(get_bytes(offset, length)):
+            if entry.run_length > 0:
+                yield entry
+            else:
+                directories.append(
+                    (header["leaf_directory_offset"] + entry.offset, entry.length)
+                )
+
+
+def analyze_tiles(get_bytes, header, budget_bytes):
+    """
+    Per zoom level tile count, bytes, p50/p95/max tile size and dedup ratio
+    of an archive, read from its directories without touching tile data, and
+    the largest tiles over budget_bytes. A run of identical tiles counts as
+    that many tiles. Returns (tile stats by zoom, oversized tiles).
+    """
+    zooms, tile_ids, offsets, lengths, counts = (array("q") for _ in range(5))
+    for entry in iter_tile_entries(get_bytes, header):
+        tile_id, remaining = entry.tile_id, entry.run_length
+        # A run can cross into the next zoom level
+        while remaining:
+            z = bisect.bisect_right(ZOOM_FIRST_TILE_IDS, tile_id) - 1
+            count = min(remaining, ZOOM_FIRST_TILE_IDS[z + 1] - tile_id)
+            zooms.append(z)
+            tile_ids.append(tile_id)
+            offsets.append(entry.offset)
+            lengths.append(entry.length)
+            counts.append(count)
+            tile_id += count
+            remaining -= count
+
+    zooms, tile_ids, offsets, lengths, counts = (
+        np.frombuffer(a, dtype=np.int64)
+        for a in (zooms, tile_ids, offsets, lengths, counts)
+    )
+
+    tile_stats = {}
+    for z in np.unique(zooms).tolist():
+        in_zoom = zooms == z
+        order = np.argsort(lengths[in_zoom], kind="stable")
+        zoom_lengths = lengths[in_zoom][order]
+        zoom_counts = counts[in_zoom][order]
+        cumulative = np.cumsum(zoom_counts)
+        tiles = int(cumulative[-1])
+        # Percentiles weight each entry by the tiles its run covers
+        p50, p95 = zoom_lengths[
+            np.searchsorted(cumulative, [0.5 * tiles, 0.95 * tiles])
+        ].tolist()
+        # Runs and tiles sharing contents point at the same stored data
+        unique_tiles = np.unique(offsets[in_zoom]).size
+        tile_stats[str(z)] = {
+            "tiles": tiles,
+            "bytes": int((zoom_lengths * zoom_counts).sum()),
+            "p50_bytes": p50,
+            "p95_bytes": p95,
+            "max_bytes": int(zoom_lengths[-1]),
+            "unique_tiles": unique_tiles,
+            "dedup_ratio": tiles / unique_tiles,
+            "oversized_tiles": int(zoom_counts[zoom_lengths > budget_bytes].sum()),
+        }
+
+    oversized = np.flatnonzero(lengths > budget_bytes)
+    largest = oversized[np.argsort(-lengths[oversized], kind="stable")]
+    oversized_tiles = {
+        "budget_bytes": budget_bytes,
+        "count": int(counts[oversized].sum()),
+        "largest": [
+            dict(
+                zip(("z", "x", "y"), tileid_to_zxy(int(tile_ids[i]))),
+                bytes=int(lengths[i]),
+                run_length=int(counts[i]),
+            )
+            for i in largest[:MAX_REPORTED_OVERSIZED_TILES]
+        ],
+    }
+    return tile_stats, oversized_tiles
@@ -1,18 +1,46 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DatasetViewSet, TilesetViewSet, TierListViewSet
+from .views import (
+    DatasetViewSet,
+    ProgressViewSet,
+    TilesetViewSet,
+    TierListViewSet,
+    SweepViewSet,
+    UploadSessionViewSet,
+    StageTimingViewSet,
+    dataset_progress_stream,
+    tileset_progress_stream,
+)
 
 router = DefaultRouter()
 router.register(r"datasets", DatasetViewSet)
+router.register(r"uploads", UploadSessionViewSet)
+router.register(r"stage_timings", StageTimingViewSet)
 
 # Manual nested routing for tilesets under datasets
 urlpatterns = [
     path("", include(router.urls)),
+    path(
+        "progress/",
+        ProgressViewSet.as_view({"get": "list"}),
+        name="progress-list",
+    ),
+    # Server-Sent Events progress streams, served by the ASGI application
+    path(
+        "datasets/<int:pk>/progress/stream/",
+        dataset_progress_stream,
+        name="dataset-progress-stream",
+    ),
     path(
         "datasets/<int:dataset_id>/tilesets/",
         TilesetViewSet.as_view({"get": "list", "post": "create"}),
         name="dataset-tilesets-list",
     ),
+    path(
+        "datasets/<int:dataset_id>/tilesets/presigned_urls/",
+        TilesetViewSet.as_view({"get": "presigned_urls"}),
+        name="dataset-tilesets-presigned-urls",
+    ),
     path(
         "datasets/<int:dataset_id>/tilesets/<int:pk>/",
         TilesetViewSet.as_view({"get": "retrieve", "delete": "destroy"}),
@@ -28,6 +56,31 @@ urlpatterns = [
         TilesetViewSet.as_view({"get": "progress"}),
         name="dataset-tilesets-progress",
     ),
+    path(
+        "datasets/<int:dataset_id>/tilesets/<int:pk>/progress/stream/",
+        tileset_progress_stream,
+        name="dataset-tilesets-progress-stream",
+    ),
+    path(
+        "datasets/<int:dataset_id>/tilesets/<int:pk>/tiles/<int:z>/<int:x>/<int:y>.mvt",
+        TilesetViewSet.as_view({"get": "tile"}),
+        name="dataset-tilesets-tile",
+    ),
+    path(
+        "datasets/<int:dataset_id>/sweeps/",
+        SweepViewSet.as_view({"get": "list", "post": "create"}),
+        name="dataset-sweeps-list",
+    ),
+    path(
+        "datasets/<int:dataset_id>/sweeps/<int:pk>/",
+        SweepViewSet.as_view({"get": "retrieve"}),
+        name="dataset-sweeps-detail",
+    ),
+    path(
+        "datasets/<int:dataset_id>/sweeps/<int:pk>/report/",
+        SweepViewSet.as_view({"get": "report"}),
+        name="dataset-sweeps-report",
+    ),
     path(
         "datasets/<int:dataset_id>/tiers/",
         TierListViewSet.as_view({"get": "list"}),
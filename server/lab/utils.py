@@ -1,6 +1,31 @@
+import errno
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+import redis
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from environ import Env
 from botocore.exceptions import ClientError
+from django.core.cache import cache
+from .metrics import InstrumentedConnection, S3TransferTracker
+
+
+# S3 multipart limits: at most 10,000 parts, each at least 5 MiB except the last
+MULTIPART_PART_SIZE = 64 * 1024 * 1024
+MAX_MULTIPART_PARTS = 10000
+
+# Times an entry evicted between fetching and linking it is fetched again
+PIN_ATTEMPTS = 3
+
+
+def get_multipart_part_size(size):
+    return max(MULTIPART_PART_SIZE, math.ceil(size / MAX_MULTIPART_PARTS))
 
 
 class S3Service:
@@ -19,6 +44,23 @@ class S3Service:
             "MINIO_EXTERNAL_ENDPOINT", default="localhost:9000"
         )
 
+        # Large objects are moved as many concurrent ranged parts; the pool
+        # must hold enough connections for every part of a few transfers
+        part_size = self.env.int("S3_TRANSFER_PART_SIZE_MB", default=64) * 1024 * 1024
+        self.transfer_concurrency = self.env.int("S3_TRANSFER_CONCURRENCY", default=16)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=self.transfer_concurrency,
+            use_threads=True,
+        )
+        self.client_config = Config(
+            max_pool_connections=self.env.int(
+                "S3_MAX_POOL_CONNECTIONS", default=4 * self.transfer_concurrency
+            ),
+            retries={"max_attempts": 5, "mode": "adaptive"},
+        )
+
         self._internal_client = None
         self._external_client = None
 
@@ -31,6 +73,7 @@ class S3Service:
                 endpoint_url=self.internal_endpoint,
                 aws_access_key_id=self.access_key,
                 aws_secret_access_key=self.secret_key,
+                config=self.client_config,
             )
         return self._internal_client
 
@@ -51,6 +94,53 @@ class S3Service:
         """Backward compatibility - returns internal client"""
         return self.internal_client
 
+    def download_file(self, object_key, local_path, extra_args=None):
+        """Download an object with parallel ranged GETs"""
+        with S3TransferTracker("download") as tracker:
+            self.internal_client.download_file(
+                self.bucket_name,
+                object_key,
+                local_path,
+                ExtraArgs=extra_args,
+                Callback=tracker,
+                Config=self.transfer_config,
+            )
+
+    def upload_file(self, local_path, object_key):
+        """Upload a file, as a parallel multipart upload when it is large"""
+        with S3TransferTracker("upload") as tracker:
+            self.internal_client.upload_file(
+                local_path,
+                self.bucket_name,
+                object_key,
+                Callback=tracker,
+                Config=self.transfer_config,
+            )
+
+    def upload_fileobj(self, fileobj, object_key):
+        """Upload a readable stream, such as a pipe, as a multipart upload"""
+        with S3TransferTracker("upload") as tracker:
+            self.internal_client.upload_fileobj(
+                fileobj,
+                self.bucket_name,
+                object_key,
+                Callback=tracker,
+                Config=self.transfer_config,
+            )
+
+    def download_files(self, downloads):
+        """
+        Download several objects at once. downloads maps object keys to local
+        paths.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(downloads))) as executor:
+            futures = [
+                executor.submit(self.download_file, object_key, local_path)
+                for object_key, local_path in downloads.items()
+            ]
+            for future in futures:
+                future.result()
+
     def generate_presigned_url(self, object_key, expires_in=3600):
         """Generate presigned URL using external endpoint for client access"""
         try:
@@ -63,6 +153,70 @@ class S3Service:
         except ClientError as e:
             raise ClientError(f"Failed to generate presigned URL: {str(e)}")
 
+    def get_object_etag(self, object_key):
+        """Return the object's ETag without surrounding quotes"""
+        response = self.internal_client.head_object(
+            Bucket=self.bucket_name, Key=object_key
+        )
+        return response["ETag"].strip('"')
+
+    def get_object_size(self, object_key):
+        """Return the object's size in bytes"""
+        response = self.internal_client.head_object(
+            Bucket=self.bucket_name, Key=object_key
+        )
+        return response["ContentLength"]
+
+    def create_multipart_upload(self, object_key):
+        """Start a multipart upload and return its upload id"""
+        response = self.internal_client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=object_key
+        )
+        return response["UploadId"]
+
+    def generate_presigned_part_url(
+        self, object_key, upload_id, part_number, expires_in=3600
+    ):
+        """Generate a presigned URL for uploading one part from the client"""
+        return self.external_client.generate_presigned_url(
+            "upload_part",
+            Params={
+                "Bucket": self.bucket_name,
+                "Key": object_key,
+                "UploadId": upload_id,
+                "PartNumber": part_number,
+            },
+            ExpiresIn=expires_in,
+        )
+
+    def list_uploaded_parts(self, object_key, upload_id):
+        """Return the parts uploaded so far as dicts with PartNumber, ETag and Size"""
+        paginator = self.internal_client.get_paginator("list_parts")
+        parts = []
+        for page in paginator.paginate(
+            Bucket=self.bucket_name, Key=object_key, UploadId=upload_id
+        ):
+            parts.extend(page.get("Parts", []))
+        return parts
+
+    def complete_multipart_upload(self, object_key, upload_id, parts):
+        self.internal_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part["PartNumber"], "ETag": part["ETag"]}
+                    for part in parts
+                ]
+            },
+        )
+
+    def abort_multipart_upload(self, object_key, upload_id):
+        self.internal_client.abort_multipart_upload(
+            Bucket=self.bucket_name, Key=object_key, UploadId=upload_id
+        )
+
     def check_object_exists(self, object_key):
         """Check if object exists using internal endpoint"""
         try:
@@ -72,4 +226,214 @@ class S3Service:
             return False
 
 
+# Shared by every Redis client in the process so requests and tasks reuse
+# connections instead of opening a new one each time
+redis_pool = redis.ConnectionPool(
+    host="redis", port=6379, db=0, connection_class=InstrumentedConnection
+)
+
+
+def get_redis_client():
+    return redis.Redis(connection_pool=redis_pool)
+
+
+class ArtifactCache:
+    """
+    Disk-backed read-through cache of MinIO objects shared by the tasks of a
+    worker. Entries are validated against the object's ETag and the least
+    recently used ones are evicted once the cache exceeds its size limit.
+    Entries a task has hard-linked into its own paths are in use and never
+    evicted; tasks keep such paths in scratch directories on the cache's
+    filesystem, where links and moves into the cache need no copy.
+    """
+
+    def __init__(self, s3):
+        self.env = Env()
+        self.env.read_env()
+
+        self.s3 = s3
+        self.cache_dir = self.env.str(
+            "ARTIFACT_CACHE_DIR", default="/tmp/vector-tile-lab-cache"
+        )
+        self.max_bytes = (
+            self.env.int("ARTIFACT_CACHE_MAX_SIZE_MB", default=10240) * 1024 * 1024
+        )
+
+    def scratch_dir(self):
+        """A temporary directory on the same filesystem as the cache."""
+        work_dir = os.path.join(self.cache_dir, "work")
+        os.makedirs(work_dir, exist_ok=True)
+        return tempfile.TemporaryDirectory(dir=work_dir)
+
+    def _entry_path(self, object_name, etag):
+        digest = hashlib.sha256(f"{object_name}:{etag}".encode()).hexdigest()
+        # Keep the extension since tools like ogr2ogr and tippecanoe rely on it
+        _, ext = os.path.splitext(object_name)
+        return os.path.join(self.cache_dir, f"{digest}{ext}")
+
+    def fetch(self, object_name):
+        """Return a local path to the object, downloading it only on a miss"""
+        head = self.s3.internal_client.head_object(
+            Bucket=self.s3.bucket_name, Key=object_name
+        )
+        path = self._entry_path(object_name, head["ETag"].strip('"'))
+
+        if os.path.exists(path):
+            # Bump mtime so eviction treats the entry as recently used
+            os.utime(path)
+            print(f"Using cached copy of {object_name}")
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._evict(head["ContentLength"])
+
+        fd, partial_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        os.close(fd)
+        try:
+            # IfMatch guarantees the bytes belong to the ETag in the entry name
+            self.s3.download_file(
+                object_name, partial_path, extra_args={"IfMatch": head["ETag"]}
+            )
+            os.replace(partial_path, path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        print(f"Downloaded {object_name} into the artifact cache")
+        return path
+
+    def fetch_many(self, object_names):
+        """
+        Fetch several objects concurrently. Returns a dict of object name to
+        local path, or to the exception raised while fetching it.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(object_names))) as executor:
+            futures = {
+                object_name: executor.submit(self.fetch, object_name)
+                for object_name in object_names
+            }
+            for object_name, future in futures.items():
+                try:
+                    results[object_name] = future.result()
+                except Exception as e:
+                    results[object_name] = e
+        return results
+
+    def fetch_into(self, object_name, local_path, cached_path=None):
+        """
+        Hard-link the cached object to local_path, which pins the entry until
+        local_path is removed. local_path should be in a scratch_dir; on
+        another filesystem the object is copied instead. Returns local_path.
+        """
+        if os.path.lexists(local_path):
+            os.remove(local_path)
+        for _ in range(PIN_ATTEMPTS):
+            if cached_path is None:
+                cached_path = self.fetch(object_name)
+            try:
+                os.link(cached_path, local_path)
+                return local_path
+            except FileNotFoundError:
+                # Evicted between the fetch and the link
+                cached_path = None
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copyfile(cached_path, local_path)
+                return local_path
+        raise FileNotFoundError(f"{object_name} kept being evicted from the cache")
+
+    def put(self, object_name, local_path):
+        """Move a file that was just uploaded as object_name into the cache"""
+        head = self.s3.internal_client.head_object(
+            Bucket=self.s3.bucket_name, Key=object_name
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._evict(head["ContentLength"])
+
+        path = self._entry_path(object_name, head["ETag"].strip('"'))
+        shutil.move(local_path, path)
+        return path
+
+    def _evict(self, incoming_bytes):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            # Skip partial downloads and the scratch directories
+            if entry.name.endswith(".part") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, stat.st_nlink, entry.path))
+
+        total_bytes = sum(size for _, size, _, _ in entries)
+        for _, size, links, path in sorted(entries):
+            if total_bytes + incoming_bytes <= self.max_bytes:
+                break
+            # Linked into a task's working files, so still in use
+            if links > 1:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
 s3_service = S3Service()
+
+artifact_cache = ArtifactCache(s3_service)
+
+
+# Completed PMTiles objects never change, so existence checks and signed URLs
+# are cached until shortly before the URLs expire
+PRESIGNED_URL_EXPIRES_IN = 3600
+PRESIGNED_URL_CACHE_MARGIN = 300
+
+
+def get_presigned_url_cache_key(object_key):
+    return f"presigned_url:{object_key}"
+
+
+def get_cached_presigned_urls(object_keys):
+    """
+    Return a dict of object key to (presigned URL, seconds until it expires)
+    for the objects that exist. Cached entries cost no storage round trip;
+    the rest are checked, signed and cached in one batch.
+    """
+    cache_keys = {get_presigned_url_cache_key(key): key for key in object_keys}
+    now = time.time()
+
+    urls = {
+        cache_keys[cache_key]: (entry["url"], int(entry["expires_at"] - now))
+        for cache_key, entry in cache.get_many(list(cache_keys)).items()
+    }
+
+    new_entries = {}
+    for object_key in object_keys:
+        if object_key in urls or not s3_service.check_object_exists(object_key):
+            continue
+        url = s3_service.generate_presigned_url(object_key, PRESIGNED_URL_EXPIRES_IN)
+        new_entries[get_presigned_url_cache_key(object_key)] = {
+            "url": url,
+            "expires_at": now + PRESIGNED_URL_EXPIRES_IN,
+        }
+        urls[object_key] = (url, PRESIGNED_URL_EXPIRES_IN)
+
+    if new_entries:
+        cache.set_many(
+            new_entries, timeout=PRESIGNED_URL_EXPIRES_IN - PRESIGNED_URL_CACHE_MARGIN
+        )
+    return urls
+
+
+def get_cached_presigned_url(object_key):
+    """Return (presigned URL, seconds until it expires), or None if missing"""
+    return get_cached_presigned_urls([object_key]).get(object_key)
+
+
+def invalidate_presigned_url(object_key):
+    cache.delete(get_presigned_url_cache_key(object_key))
@@ -1,24 +1,83 @@
+import os
 import shlex
+from django.conf import settings
+from django.core.cache import cache
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from django.db import transaction
+from django.db.models import Avg, Count, Max, OuterRef, Subquery
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, mixins
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Dataset, Tileset, TierList
-from .serializers import DatasetSerializer, TilesetSerializer, TierListSerializer
-from .filters import TilesetFilter
-from drf_spectacular.utils import extend_schema
+from .models import Dataset, Tileset, TierList, UploadSession, StageTiming, Sweep
+from .serializers import (
+    DatasetSerializer,
+    TilesetSerializer,
+    TierListSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
+    StageTimingSerializer,
+    ClassifyRequestSerializer,
+    SweepSerializer,
+    SweepCreateSerializer,
+)
+from .filters import TilesetFilter, StageTimingFilter
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from .tasks import (
     process_uploaded_geojson,
     process_uploaded_shapefile,
+    stream_uploaded_shapefile,
     generate_tileset_with_options,
+    classify_dataset_field,
+    create_dataset_tier_lists,
+    run_sweep,
+)
+from .constants import TaskStatus, UploadStatus, SERVER_MANAGED_OPTIONS
+from .utils import (
+    s3_service,
+    get_redis_client,
+    get_multipart_part_size,
+    get_cached_presigned_url,
+    get_cached_presigned_urls,
+)
+from .tiles import (
+    get_header_and_root,
+    get_tile,
+    MAX_TILE_ZOOM,
+    TILE_CONTENT_TYPES,
+    CONTENT_ENCODINGS,
+)
+from .progress import stream_progress, decode_progress, read_progress_batch
+from .metrics import render_metrics
+from .tiers import (
+    get_missing_tier_lists,
+    get_tier_lists_queued_key,
+    get_cached_classification,
+    TIER_LIST_METHODS,
+    TIER_LISTS_QUEUED_SECONDS,
 )
-import redis
-from .constants import TaskStatus
-from .utils import s3_service
+from .columns import DEFAULT_HISTOGRAM_BINS
+from .column_store import get_attribute_stats
+from .sweeps import build_sweep_report
 from botocore.exceptions import ClientError
 
 
+def start_dataset_processing(dataset):
+    if dataset.shp_file and settings.SHAPEFILE_STREAMING:
+        stream_uploaded_shapefile.delay(dataset.id, dataset.name)
+    elif dataset.shp_file:
+        process_uploaded_shapefile.delay(dataset.id, dataset.name)
+    else:
+        process_uploaded_geojson.delay(dataset.id, dataset.name)
+
+
+# Upper bound of the histogram bins of the attribute statistics endpoint
+MAX_HISTOGRAM_BINS = 1000
+
+
 class DatasetViewSet(
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -57,12 +116,7 @@ class DatasetViewSet(
 
     def perform_create(self, serializer):
         instance = serializer.save()
-
-        if instance.shp_file:
-            process_uploaded_shapefile.delay(instance.id, instance.name)
-        else:
-            process_uploaded_geojson.delay(instance.id, instance.name)
-
+        start_dataset_processing(instance)
         return instance
 
     def destroy(self, request, *args, **kwargs):
@@ -93,7 +147,7 @@ class DatasetViewSet(
         dataset = self.get_object()
 
         try:
-            redis_client = redis.Redis(host="redis", port=6379, db=0)
+            redis_client = get_redis_client()
             progress_key = f"dataset:{dataset.id}"
             progress_obj = redis_client.hgetall(progress_key)
 
@@ -101,9 +155,9 @@ class DatasetViewSet(
                 progress_percent = 0
                 progress_status = TaskStatus.IN_PROGRESS
             else:
-                data = {k.decode(): v.decode() for k, v in progress_obj.items()}
-                progress_percent = int(data.get("progress", 0))
-                progress_status = data.get("status", TaskStatus.IN_PROGRESS)
+                event = decode_progress(progress_obj, TaskStatus.IN_PROGRESS)
+                progress_percent = event["progress"]
+                progress_status = event["status"]
 
             return Response(
                 {
@@ -120,6 +174,163 @@ class DatasetViewSet(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @extend_schema(
+        request=ClassifyRequestSerializer,
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "field": {"type": "string"},
+                    "method": {"type": "string"},
+                    "breaks": {"type": "array", "items": {"type": "number"}},
+                    "counts": {"type": "array", "items": {"type": "integer"}},
+                    "algorithm": {"type": "string"},
+                    "sample_size": {"type": "integer", "nullable": True},
+                },
+                "required": ["field", "method", "breaks", "counts", "algorithm"],
+            },
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+            503: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Classify a numeric field",
+        description=(
+            "Compute the class breaks of a numeric field with any classification "
+            "method and class count, along with the number of features in each "
+            "class. Results are cached. Classifications that take longer than "
+            "the server waits keep running and are returned on retry."
+        ),
+    )
+    @action(detail=True, methods=["post"])
+    def classify(self, request, pk=None):
+        """Classify a numeric field of the dataset."""
+        dataset = self.get_object()
+        serializer = ClassifyRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        if dataset.numeric_fields is None:
+            return Response(
+                {"error": "The dataset's columns are not indexed yet"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if params["field"] not in dataset.numeric_fields:
+            return Response(
+                {"error": f"Field {params['field']} is not a classifiable field"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        args = (params["field"], params["method"], params["k"])
+        result = get_cached_classification(dataset, *args, params.get("percentiles"))
+        if result is not None:
+            return Response(result)
+
+        # Classification runs on a worker, so the request only waits for it
+        try:
+            result = classify_dataset_field.delay(
+                dataset.id, *args, params.get("percentiles")
+            ).get(timeout=settings.CLASSIFICATION_TIMEOUT_SECONDS)
+        except CeleryTimeoutError:
+            response = Response(
+                {"error": "Classification is still running, retry later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response["Retry-After"] = settings.CLASSIFICATION_TIMEOUT_SECONDS
+            return response
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to classify field: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return Response(result)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "field",
+                str,
+                many=True,
+                description="Only return statistics of these fields",
+            ),
+            OpenApiParameter(
+                "bins",
+                int,
+                description=f"Number of histogram bins, {DEFAULT_HISTOGRAM_BINS} by default",
+            ),
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "additionalProperties": {
+                    "type": "object",
+                    "properties": {
+                        "count": {"type": "integer"},
+                        "null_count": {"type": "integer", "nullable": True},
+                        "min": {"type": "number"},
+                        "max": {"type": "number"},
+                        "mean": {"type": "number"},
+                        "std": {"type": "number"},
+                        "distinct": {"type": "integer"},
+                        "histogram": {
+                            "type": "object",
+                            "properties": {
+                                "edges": {"type": "array", "items": {"type": "number"}},
+                                "counts": {
+                                    "type": "array",
+                                    "items": {"type": "integer"},
+                                },
+                            },
+                        },
+                    },
+                },
+            },
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Get attribute statistics",
+        description=(
+            "Summary statistics, null counts, distinct values and a histogram "
+            "of each numeric field, keyed by field."
+        ),
+    )
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """Get the statistics of the dataset's numeric fields."""
+        dataset = self.get_object()
+        if dataset.attribute_stats is None:
+            return Response(
+                {"error": "The dataset's columns are not indexed yet"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fields = request.query_params.getlist("field") or list(dataset.attribute_stats)
+        unknown = [field for field in fields if field not in dataset.attribute_stats]
+        if unknown:
+            return Response(
+                {"error": f"Fields are not numeric fields: {unknown}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        try:
+            bins = int(request.query_params.get("bins", DEFAULT_HISTOGRAM_BINS))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= MAX_HISTOGRAM_BINS:
+            return Response(
+                {"error": f"bins must be an integer from 1 to {MAX_HISTOGRAM_BINS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            return Response(get_attribute_stats(dataset, fields, bins))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to compute attribute statistics: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
 
 class TilesetViewSet(
     mixins.ListModelMixin,
@@ -172,6 +383,21 @@ class TilesetViewSet(
                         "type": "string",
                         "description": "Raw tippecanoe options string (e.g., '--maximum-zoom 14 --drop-densest-as-needed').",
                     },
+                    "auto": {
+                        "type": "boolean",
+                        "description": "Pick the options from the dataset's profile to meet the tile size and build time targets",
+                        "default": False,
+                    },
+                    "target_tile_bytes": {
+                        "type": "integer",
+                        "description": "Auto mode tile size target in bytes",
+                        "minimum": 1,
+                    },
+                    "build_seconds_budget": {
+                        "type": "integer",
+                        "description": "Auto mode build time budget in seconds",
+                        "minimum": 1,
+                    },
                 },
                 "required": ["name"],
             }
@@ -209,15 +435,6 @@ class TilesetViewSet(
             )
 
         if raw_options:
-            # Blacklist certain options which users should not control
-            blacklisted_options = [
-                "-o",
-                "--output",
-                "-f",
-                "--force",
-                "-e",
-                "--output-to-directory",
-            ]
             try:
                 parsed_options = shlex.split(raw_options)
             except ValueError as e:
@@ -227,7 +444,7 @@ class TilesetViewSet(
                 )
 
             for opt in parsed_options:
-                if opt in blacklisted_options:
+                if opt in SERVER_MANAGED_OPTIONS:
                     return Response(
                         {
                             "error": f"Option '{opt}' is not allowed. Input/output paths are managed by the server."
@@ -248,6 +465,36 @@ class TilesetViewSet(
                 name,
                 raw_options=raw_options,
             )
+        elif request.data.get("auto"):
+            targets = {}
+            for param in ("target_tile_bytes", "build_seconds_budget"):
+                value = request.data.get(param)
+                if value is None:
+                    continue
+                try:
+                    targets[param] = int(value)
+                except (TypeError, ValueError):
+                    targets[param] = 0
+                if targets[param] <= 0:
+                    return Response(
+                        {"error": f"{param} must be a positive integer"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+            tileset = Tileset.objects.create(
+                dataset=dataset,
+                name=name,
+                status=TaskStatus.IN_PROGRESS,
+                metadata={},
+            )
+
+            generate_tileset_with_options.delay(
+                dataset.name,
+                tileset.id,
+                name,
+                auto=True,
+                **targets,
+            )
         else:
             maximum_zoom = request.data.get("maximum_zoom", "g")
             drop_densest_as_needed = request.data.get("drop_densest_as_needed", True)
@@ -315,7 +562,7 @@ class TilesetViewSet(
         tileset = self.get_object()
 
         try:
-            redis_client = redis.Redis(host="redis", port=6379, db=0)
+            redis_client = get_redis_client()
             progress_key = f"tileset:{tileset.id}"
             progress_obj = redis_client.hgetall(progress_key)
 
@@ -323,9 +570,9 @@ class TilesetViewSet(
                 progress_percent = 0
                 progress_status = tileset.status
             else:
-                data = {k.decode(): v.decode() for k, v in progress_obj.items()}
-                progress_percent = int(data.get("progress", 0))
-                progress_status = data.get("status", tileset.status)
+                event = decode_progress(progress_obj, tileset.status)
+                progress_percent = event["progress"]
+                progress_status = event["status"]
 
             return Response(
                 {
@@ -377,16 +624,14 @@ class TilesetViewSet(
             # Extract the object key from the file path
             object_key = tileset.pmtiles_file.name
 
-            # Check if the file exists in S3
-            if not s3_service.check_object_exists(object_key):
+            # Check existence and sign, or reuse the cached result
+            cached = get_cached_presigned_url(object_key)
+            if cached is None:
                 return Response(
                     {"error": "PMTiles file not found in storage"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-
-            # Generate presigned URL
-            expires_in = 3600
-            presigned_url = s3_service.generate_presigned_url(object_key, expires_in)
+            presigned_url, expires_in = cached
 
             return Response(
                 {
@@ -407,6 +652,272 @@ class TilesetViewSet(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @extend_schema(
+        responses={
+            200: {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "tileset_id": {"type": "integer"},
+                        "tileset_name": {"type": "string"},
+                        "presigned_url": {"type": "string", "format": "uri"},
+                        "expires_in": {
+                            "type": "integer",
+                            "description": "URL expiration time in seconds",
+                        },
+                    },
+                    "required": [
+                        "tileset_id",
+                        "tileset_name",
+                        "presigned_url",
+                        "expires_in",
+                    ],
+                },
+            },
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Get presigned URLs for every completed tileset",
+        description="Return presigned URLs for the PMTiles files of all completed tilesets of a dataset in one response.",
+    )
+    @action(detail=False, methods=["get"])
+    def presigned_urls(self, request, dataset_id=None):
+        """Generate presigned URLs for all completed tilesets of the dataset."""
+        tilesets = (
+            self.get_queryset()
+            .filter(status=TaskStatus.COMPLETED)
+            .exclude(pmtiles_file="")
+            .order_by("id")
+        )
+
+        try:
+            urls = get_cached_presigned_urls(
+                list({tileset.pmtiles_file.name for tileset in tilesets})
+            )
+        except ClientError as e:
+            return Response(
+                {"error": f"Failed to generate presigned URLs: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(
+            [
+                {
+                    "tileset_id": tileset.id,
+                    "tileset_name": tileset.name,
+                    "presigned_url": urls[tileset.pmtiles_file.name][0],
+                    "expires_in": urls[tileset.pmtiles_file.name][1],
+                }
+                for tileset in tilesets
+                if tileset.pmtiles_file.name in urls
+            ]
+        )
+
+    @extend_schema(
+        operation_id="retrieveDatasetsTilesetsTile",
+        responses={
+            (200, "application/vnd.mapbox-vector-tile"): OpenApiTypes.BINARY,
+            204: None,
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Get a single tile from the tileset",
+        description="Serve one tile from the tileset's PMTiles archive using ranged reads against MinIO/S3 storage.",
+    )
+    @action(detail=True, methods=["get"])
+    def tile(self, request, pk=None, dataset_id=None, z=None, x=None, y=None):
+        """Serve a single tile of the tileset's PMTiles archive."""
+        tileset = self.get_object()
+
+        if not tileset.pmtiles_file or tileset.status != TaskStatus.COMPLETED:
+            return Response(
+                {"error": "Tileset is not completed or PMTiles file is not available"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if z > MAX_TILE_ZOOM:
+            return Response(
+                {"error": f"Zoom level {z} is above {MAX_TILE_ZOOM}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if x >= 2**z or y >= 2**z:
+            return Response(
+                {"error": f"Tile {z}/{x}/{y} is out of range"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        object_key = tileset.pmtiles_file.name
+        version = tileset.updated_at.isoformat()
+        try:
+            # The header is cached, so the zoom range costs no read
+            header, _ = get_header_and_root(object_key, version)
+            if z < header["min_zoom"] or z > header["max_zoom"]:
+                return Response(
+                    {"error": f"Zoom level {z} is outside of the tileset's zoom range"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            tile_data, header = get_tile(object_key, version, z, x, y)
+        except ClientError as e:
+            return Response(
+                {"error": f"Failed to read PMTiles file: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        if tile_data is None:
+            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+        response = HttpResponse(
+            tile_data,
+            content_type=TILE_CONTENT_TYPES.get(
+                header["tile_type"], "application/octet-stream"
+            ),
+        )
+        content_encoding = CONTENT_ENCODINGS.get(header["tile_compression"])
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+        # Completed tilesets are never rewritten, so tiles can be cached
+        response["Cache-Control"] = "public, max-age=86400"
+        return response
+
+
+SWEEP_REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sweep_id": {"type": "integer"},
+        "status": {"type": "string", "enum": [s.value for s in TaskStatus]},
+        "max_tile_bytes": {"type": "integer"},
+        "recommended_tileset_id": {"type": "integer", "nullable": True},
+        "builds": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "tileset_id": {"type": "integer"},
+                    "name": {"type": "string"},
+                    "options": {"type": "string"},
+                    "status": {
+                        "type": "string",
+                        "enum": [s.value for s in TaskStatus],
+                    },
+                    "reused": {"type": "boolean"},
+                    "build_seconds": {"type": "number", "nullable": True},
+                    "cpu_seconds": {"type": "number", "nullable": True},
+                    "peak_rss_bytes": {"type": "integer", "nullable": True},
+                    "pmtiles_bytes": {"type": "integer", "nullable": True},
+                    "max_zoom": {"type": "integer", "nullable": True},
+                    "max_tile_bytes": {"type": "integer", "nullable": True},
+                    "within_budget": {"type": "boolean"},
+                    "oversized_tiles": {"type": "integer", "nullable": True},
+                    "retries": {"type": "integer", "nullable": True},
+                    "dropping_tiles": {"type": "integer", "nullable": True},
+                    "min_kept_percent": {"type": "number", "nullable": True},
+                    "tile_stats": {
+                        "type": "object",
+                        "nullable": True,
+                        "additionalProperties": {
+                            "type": "object",
+                            "properties": {
+                                "tiles": {"type": "integer"},
+                                "bytes": {"type": "integer"},
+                                "p50_bytes": {"type": "integer"},
+                                "p95_bytes": {"type": "integer"},
+                                "max_bytes": {"type": "integer"},
+                                "unique_tiles": {"type": "integer"},
+                                "dedup_ratio": {"type": "number"},
+                                "oversized_tiles": {"type": "integer"},
+                            },
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+class SweepViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Option sweeps: one tileset build per tippecanoe option set of a dataset,
+    run in parallel and compared in a report.
+    """
+
+    queryset = Sweep.objects.all()
+    serializer_class = SweepSerializer
+
+    def get_queryset(self):
+        return Sweep.objects.filter(dataset_id=self.kwargs.get("dataset_id"))
+
+    @extend_schema(
+        request=SweepCreateSerializer,
+        responses={
+            201: SweepSerializer,
+            404: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Start an option sweep",
+        description=(
+            "Build one tileset of the dataset per option set, given as raw "
+            "option strings and/or a grid of option values expanded to every "
+            "combination. The builds run in parallel from a single download "
+            "of the input."
+        ),
+    )
+    def create(self, request, *args, **kwargs):
+        try:
+            dataset = Dataset.objects.get(id=self.kwargs.get("dataset_id"))
+        except Dataset.DoesNotExist:
+            return Response(
+                {"error": "Dataset not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        request_serializer = SweepCreateSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        data = request_serializer.validated_data
+
+        with transaction.atomic():
+            sweep = Sweep.objects.create(
+                dataset=dataset,
+                name=data["name"],
+                max_tile_bytes=data.get("max_tile_bytes", settings.TILE_BYTES_BUDGET),
+            )
+            Tileset.objects.bulk_create(
+                Tileset(
+                    dataset=dataset,
+                    sweep=sweep,
+                    name=f"{data['name']}-{i}",
+                    status=TaskStatus.IN_PROGRESS,
+                    metadata={},
+                    options=options,
+                )
+                for i, options in enumerate(data["options"], start=1)
+            )
+
+        run_sweep.delay(sweep.id)
+
+        serializer = self.get_serializer(sweep)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        responses={200: SWEEP_REPORT_SCHEMA},
+        summary="Compare the builds of a sweep",
+        description=(
+            "Tiling time, CPU time, peak memory, PMTiles size, tile sizes per "
+            "zoom and tippecanoe's retries and feature drops of every build "
+            "of the sweep, fastest first, with the fastest completed build "
+            "whose largest tile is within max_tile_bytes recommended."
+        ),
+    )
+    @action(detail=True, methods=["get"])
+    def report(self, request, pk=None, dataset_id=None):
+        """Compare the builds of the sweep."""
+        sweep = self.get_object()
+        return Response(build_sweep_report(sweep))
+
 
 class TierListViewSet(
     mixins.ListModelMixin,
@@ -424,23 +935,645 @@ class TierListViewSet(
         return TierList.objects.all()
 
     @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "field",
+                str,
+                many=True,
+                description="Only return tier lists of these fields",
+            ),
+            OpenApiParameter(
+                "method",
+                str,
+                many=True,
+                enum=[method.value for method in TIER_LIST_METHODS],
+                description="Only return tier lists of these methods",
+            ),
+        ],
         responses={
             200: TierListSerializer(many=True),
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
             404: {"type": "object", "properties": {"error": {"type": "string"}}},
         },
         summary="List tier lists for dataset",
-        description="Retrieve all tier lists associated with a specific dataset.",
+        description=(
+            "Retrieve the tier lists of a dataset. Tier lists are computed in the "
+            "background once the dataset's columns are stored; requesting ones "
+            "that are missing queues their computation."
+        ),
     )
     def list(self, request, *args, **kwargs):
         """List all tier lists for a specific dataset."""
         # Verify that the dataset exists
         dataset_id = self.kwargs.get("dataset_id")
         try:
-            Dataset.objects.get(id=dataset_id)
+            dataset = Dataset.objects.get(id=dataset_id)
         except Dataset.DoesNotExist:
             return Response(
                 {"error": "Dataset not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        return super().list(request, *args, **kwargs)
+        fields = request.query_params.getlist("field") or None
+        methods = request.query_params.getlist("method") or None
+        valid_methods = {method.value for method in TIER_LIST_METHODS}
+        if methods and not set(methods) <= valid_methods:
+            return Response(
+                {"error": f"method must be one of {sorted(valid_methods)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Tier lists are only computed by the workers, so the ones still
+        # missing are queued and what is stored so far is returned
+        if get_missing_tier_lists(dataset, fields, methods) and cache.add(
+            get_tier_lists_queued_key(dataset), True, TIER_LISTS_QUEUED_SECONDS
+        ):
+            create_dataset_tier_lists.delay(dataset.id)
+
+        queryset = self.get_queryset()
+        if fields:
+            queryset = queryset.filter(field__in=fields)
+        if methods:
+            queryset = queryset.filter(method__in=methods)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+# Same prefixes as the upload_to of the Dataset file fields
+UPLOAD_PREFIXES = {
+    "geojson_file": "datasets/geojson/",
+    "shp_file": "datasets/shapefile/",
+    "shx_file": "datasets/shapefile/",
+    "dbf_file": "datasets/shapefile/",
+    "prj_file": "datasets/shapefile/",
+    "cpg_file": "datasets/shapefile/",
+}
+
+UPLOAD_URL_EXPIRES_IN = 3600
+
+UPLOAD_SESSION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "name": {"type": "string"},
+        "status": {"type": "string", "enum": [s.value for s in UploadStatus]},
+        "dataset": {"type": "integer", "nullable": True},
+        "files": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "properties": {
+                    "filename": {"type": "string"},
+                    "object_name": {"type": "string"},
+                    "upload_id": {"type": "string"},
+                    "size": {"type": "integer"},
+                    "part_size": {"type": "integer"},
+                    "part_count": {"type": "integer"},
+                    "completed": {"type": "boolean"},
+                    "uploaded_parts": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                    },
+                    "parts": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "part_number": {"type": "integer"},
+                                "url": {"type": "string", "format": "uri"},
+                            },
+                            "required": ["part_number", "url"],
+                        },
+                    },
+                },
+            },
+        },
+        "expires_in": {
+            "type": "integer",
+            "description": "Part URL expiration time in seconds",
+        },
+        "created_at": {"type": "string", "format": "date-time"},
+        "updated_at": {"type": "string", "format": "date-time"},
+    },
+    "required": ["id", "name", "status", "files"],
+}
+
+
+class UploadSessionViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads that go straight from the client to MinIO: the session
+    hands out presigned part URLs, and completing it assembles the objects
+    and creates the dataset. Payload bytes never pass through Django.
+    """
+
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+
+    def get_session_data(self, session):
+        """
+        Serialize the session with the parts uploaded so far and fresh
+        presigned URLs for the parts that are still missing.
+        """
+        data = self.get_serializer(session).data
+        if session.status != UploadStatus.PENDING.value:
+            return data
+
+        for upload in data["files"].values():
+            if upload.get("completed"):
+                upload["uploaded_parts"] = list(range(1, upload["part_count"] + 1))
+                upload["parts"] = []
+                continue
+            uploaded_parts = {
+                part["PartNumber"]
+                for part in s3_service.list_uploaded_parts(
+                    upload["object_name"], upload["upload_id"]
+                )
+            }
+            upload["uploaded_parts"] = sorted(uploaded_parts)
+            upload["parts"] = [
+                {
+                    "part_number": part_number,
+                    "url": s3_service.generate_presigned_part_url(
+                        upload["object_name"],
+                        upload["upload_id"],
+                        part_number,
+                        UPLOAD_URL_EXPIRES_IN,
+                    ),
+                }
+                for part_number in range(1, upload["part_count"] + 1)
+                if part_number not in uploaded_parts
+            ]
+        data["expires_in"] = UPLOAD_URL_EXPIRES_IN
+        return data
+
+    def list_completed_parts(self, upload):
+        """
+        Return the parts of a fully uploaded file, or None while parts are
+        missing. A multipart upload that no longer exists because an earlier
+        attempt assembled it gives an empty list, once the object it left
+        has the expected size.
+        """
+        try:
+            parts = s3_service.list_uploaded_parts(
+                upload["object_name"], upload["upload_id"]
+            )
+        except ClientError as e:
+            if not self.is_assembled(e, upload):
+                raise
+            return []
+        if (
+            len(parts) != upload["part_count"]
+            or sum(part["Size"] for part in parts) != upload["size"]
+        ):
+            return None
+        return parts
+
+    def is_assembled(self, error, upload):
+        """Whether error is due to the upload having been completed already"""
+        if error.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            return False
+        try:
+            return s3_service.get_object_size(upload["object_name"]) == upload["size"]
+        except ClientError:
+            return False
+
+    @extend_schema(
+        request=UploadSessionCreateSerializer,
+        responses={
+            201: UPLOAD_SESSION_SCHEMA,
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Start a direct upload",
+        description="Start multipart uploads to MinIO/S3 storage for a dataset's files and return presigned URLs for every part.",
+    )
+    def create(self, request, *args, **kwargs):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # The session id keys its objects, so sessions uploading files of
+        # the same name do not overwrite each other
+        session = UploadSession.objects.create(name=serializer.validated_data["name"])
+        files = {}
+        try:
+            for field_name, prefix in UPLOAD_PREFIXES.items():
+                file_info = serializer.validated_data.get(field_name)
+                if not file_info:
+                    continue
+
+                filename = os.path.basename(file_info["filename"])
+                object_name = f"{prefix}{session.id}/{filename}"
+                part_size = get_multipart_part_size(file_info["size"])
+                files[field_name] = {
+                    "filename": file_info["filename"],
+                    "object_name": object_name,
+                    "upload_id": s3_service.create_multipart_upload(object_name),
+                    "size": file_info["size"],
+                    "part_size": part_size,
+                    "part_count": -(-file_info["size"] // part_size),
+                }
+        except ClientError as e:
+            for upload in files.values():
+                s3_service.abort_multipart_upload(
+                    upload["object_name"], upload["upload_id"]
+                )
+            session.delete()
+            return Response(
+                {"error": f"Failed to start upload: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        session.files = files
+        session.save(update_fields=["files", "updated_at"])
+        return Response(self.get_session_data(session), status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        responses={
+            200: UPLOAD_SESSION_SCHEMA,
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Get a direct upload",
+        description="List the parts uploaded so far with presigned URLs for the missing ones, to resume an interrupted upload.",
+    )
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            return Response(self.get_session_data(session))
+        except ClientError as e:
+            return Response(
+                {"error": f"Failed to list uploaded parts: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @extend_schema(
+        request=None,
+        responses={
+            201: DatasetSerializer,
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            409: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Complete a direct upload",
+        description="Assemble the uploaded parts, create the dataset and start processing it.",
+    )
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        session = UploadSession.objects.filter(pk=pk).first()
+        if session is None:
+            return Response(
+                {"error": "Upload session not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if session.status != UploadStatus.PENDING.value:
+            return Response(
+                {"error": f"Upload session is {session.status}"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # The uploads are assembled outside of any transaction, recording each
+        # one that succeeds so a retry after a partial failure resumes from it
+        try:
+            uploaded = {}
+            for field_name, upload in session.files.items():
+                if upload.get("completed"):
+                    continue
+                parts = self.list_completed_parts(upload)
+                if parts is None:
+                    return Response(
+                        {"error": f"Upload of '{field_name}' is incomplete"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                uploaded[field_name] = parts
+
+            for field_name, parts in uploaded.items():
+                upload = session.files[field_name]
+                if parts:
+                    try:
+                        s3_service.complete_multipart_upload(
+                            upload["object_name"], upload["upload_id"], parts
+                        )
+                    except ClientError as e:
+                        if not self.is_assembled(e, upload):
+                            raise
+                upload["completed"] = True
+                session.save(update_fields=["files", "updated_at"])
+        except ClientError as e:
+            return Response(
+                {"error": f"Failed to complete upload: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        # Only the status transition is locked, so concurrent requests create
+        # a single dataset
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status != UploadStatus.PENDING.value:
+                return Response(
+                    {"error": f"Upload session is {session.status}"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            dataset = Dataset(name=session.name)
+            for field_name, upload in session.files.items():
+                getattr(dataset, field_name).name = upload["object_name"]
+            dataset.save()
+
+            session.dataset = dataset
+            session.status = UploadStatus.COMPLETED
+            session.save()
+
+            transaction.on_commit(lambda: start_dataset_processing(dataset))
+
+        return Response(DatasetSerializer(dataset).data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        responses={
+            204: None,
+            409: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Abort a direct upload",
+        description="Abort the multipart uploads of a pending session and discard their parts.",
+    )
+    def destroy(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.status != UploadStatus.PENDING.value:
+            return Response(
+                {"error": f"Upload session is {session.status}"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        for upload in session.files.values():
+            try:
+                s3_service.abort_multipart_upload(
+                    upload["object_name"], upload["upload_id"]
+                )
+            except ClientError as e:
+                print(f"Failed to abort upload of {upload['object_name']}: {e}")
+
+        session.status = UploadStatus.ABORTED
+        session.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class StageTimingViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Wall time, CPU time, peak RSS and bytes moved of every recorded build
+    stage, filterable by dataset, tileset, task, stage and time range.
+    """
+
+    queryset = StageTiming.objects.order_by("-created_at")
+    serializer_class = StageTimingSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = StageTimingFilter
+
+    @extend_schema(
+        responses={
+            200: {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "task": {"type": "string"},
+                        "stage": {"type": "string"},
+                        "count": {"type": "integer"},
+                        "avg_wall_seconds": {"type": "number"},
+                        "max_wall_seconds": {"type": "number"},
+                        "avg_cpu_seconds": {"type": "number"},
+                        "max_peak_rss_bytes": {"type": "integer"},
+                        "avg_bytes_moved": {"type": "number", "nullable": True},
+                    },
+                },
+            }
+        },
+        summary="Summarize stage timings",
+        description="Aggregate the filtered stage timings per task and stage, e.g. over a time range to compare against an earlier one.",
+    )
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """Aggregate the filtered stage timings per task and stage."""
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = (
+            queryset.order_by()
+            .values("task", "stage")
+            .annotate(
+                count=Count("id"),
+                avg_wall_seconds=Avg("wall_seconds"),
+                max_wall_seconds=Max("wall_seconds"),
+                avg_cpu_seconds=Avg("cpu_seconds"),
+                max_peak_rss_bytes=Max("peak_rss_bytes"),
+                avg_bytes_moved=Avg("bytes_moved"),
+            )
+            .order_by("task", "stage")
+        )
+        return Response(list(rows))
+
+
+class ProgressViewSet(viewsets.ViewSet):
+    max_ids = 500
+
+    def _parse_ids(self, request, param):
+        value = request.query_params.get(param, "")
+        ids = [int(v) for v in value.split(",") if v.strip()]
+        return list(dict.fromkeys(ids))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "dataset_ids",
+                str,
+                description="Comma-separated dataset IDs",
+            ),
+            OpenApiParameter(
+                "tileset_ids",
+                str,
+                description="Comma-separated tileset IDs",
+            ),
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "datasets": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "dataset_id": {"type": "integer"},
+                                "progress": {
+                                    "type": "integer",
+                                    "minimum": 0,
+                                    "maximum": 100,
+                                },
+                                "status": {
+                                    "type": "string",
+                                    "enum": [s.value for s in TaskStatus],
+                                },
+                                "stage": {"type": "string"},
+                            },
+                            "required": ["dataset_id", "progress", "status"],
+                        },
+                    },
+                    "tilesets": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "tileset_id": {"type": "integer"},
+                                "progress": {
+                                    "type": "integer",
+                                    "minimum": 0,
+                                    "maximum": 100,
+                                },
+                                "status": {
+                                    "type": "string",
+                                    "enum": [s.value for s in TaskStatus],
+                                },
+                                "stage": {"type": "string"},
+                            },
+                            "required": ["tileset_id", "progress", "status"],
+                        },
+                    },
+                },
+                "required": ["datasets", "tilesets"],
+            },
+            400: {"type": "object", "properties": {"error": {"type": "string"}}},
+            500: {"type": "object", "properties": {"error": {"type": "string"}}},
+        },
+        summary="Get progress for many datasets and tilesets",
+        description="Retrieves the processing progress of many datasets and tilesets at once with a single pipelined Redis read, falling back to the stored tileset status for IDs without progress in Redis.",
+    )
+    def list(self, request):
+        """Get the current progress for many datasets and tilesets at once."""
+        try:
+            dataset_ids = self._parse_ids(request, "dataset_ids")
+            tileset_ids = self._parse_ids(request, "tileset_ids")
+        except ValueError:
+            return Response(
+                {"error": "IDs must be comma-separated integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(dataset_ids) + len(tileset_ids) > self.max_ids:
+            return Response(
+                {"error": f"At most {self.max_ids} IDs can be requested at once"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            dataset_keys = {f"dataset:{pk}": pk for pk in dataset_ids}
+            tileset_keys = {f"tileset:{pk}": pk for pk in tileset_ids}
+            progress_objs = read_progress_batch(
+                get_redis_client(), [*dataset_keys, *tileset_keys]
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to retrieve progress: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        datasets = {}
+        for key, pk in dataset_keys.items():
+            if key in progress_objs:
+                datasets[pk] = decode_progress(
+                    progress_objs[key], TaskStatus.IN_PROGRESS
+                )
+
+        # Datasets without progress in Redis report the status of their
+        # default tileset
+        missing_dataset_ids = [pk for pk in dataset_ids if pk not in datasets]
+        if missing_dataset_ids:
+            default_status = (
+                Tileset.objects.filter(dataset=OuterRef("pk"), name="default")
+                .order_by("-id")
+                .values("status")[:1]
+            )
+            for pk, tileset_status in (
+                Dataset.objects.filter(id__in=missing_dataset_ids)
+                .annotate(default_status=Subquery(default_status))
+                .values_list("id", "default_status")
+            ):
+                datasets[pk] = {
+                    "status": tileset_status or TaskStatus.IN_PROGRESS,
+                    "progress": 100 if tileset_status == TaskStatus.COMPLETED else 0,
+                }
+
+        tilesets = {}
+        for key, pk in tileset_keys.items():
+            if key in progress_objs:
+                tilesets[pk] = decode_progress(
+                    progress_objs[key], TaskStatus.IN_PROGRESS
+                )
+
+        # Tilesets without progress in Redis report their stored status
+        missing_tileset_ids = [pk for pk in tileset_ids if pk not in tilesets]
+        if missing_tileset_ids:
+            for pk, tileset_status in Tileset.objects.filter(
+                id__in=missing_tileset_ids
+            ).values_list("id", "status"):
+                tilesets[pk] = {
+                    "status": tileset_status,
+                    "progress": 100 if tileset_status == TaskStatus.COMPLETED else 0,
+                }
+
+        return Response(
+            {
+                "datasets": [
+                    {"dataset_id": pk, **datasets[pk]}
+                    for pk in dataset_ids
+                    if pk in datasets
+                ],
+                "tilesets": [
+                    {"tileset_id": pk, **tilesets[pk]}
+                    for pk in tileset_ids
+                    if pk in tilesets
+                ],
+            }
+        )
+
+
+def progress_stream_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def dataset_progress_stream(request, pk):
+    """Stream processing progress events for a dataset as Server-Sent Events."""
+    dataset = await Dataset.objects.filter(id=pk).afirst()
+    if dataset is None:
+        return JsonResponse(
+            {"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    return progress_stream_response(
+        stream_progress(
+            f"dataset:{dataset.id}",
+            TaskStatus.IN_PROGRESS,
+            {"dataset_id": dataset.id, "dataset_name": dataset.name},
+        )
+    )
+
+
+async def tileset_progress_stream(request, dataset_id, pk):
+    """Stream generation progress events for a tileset as Server-Sent Events."""
+    tileset = await Tileset.objects.filter(id=pk, dataset_id=dataset_id).afirst()
+    if tileset is None:
+        return JsonResponse(
+            {"error": "Tileset not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    return progress_stream_response(
+        stream_progress(
+            f"tileset:{tileset.id}",
+            tileset.status,
+            {"tileset_id": tileset.id, "tileset_name": tileset.name},
+        )
+    )
+
+
+def metrics(request):
+    """Expose the API's Prometheus metrics."""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
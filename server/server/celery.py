@@ -1,8 +1,42 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
 
 app = Celery("server")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def configure_queue_worker(sender, **kwargs):
+    """
+    Apply WORKER_QUEUE_SETTINGS to a worker that consumes a single queue.
+    Runs before the pool and consumer are created, so both pick up the values.
+    """
+    from django.conf import settings
+
+    queues = list(sender.app.amqp.queues.consume_from)
+    if len(queues) != 1:
+        return
+
+    queue_settings = settings.WORKER_QUEUE_SETTINGS.get(queues[0])
+    if queue_settings is None:
+        return
+
+    sender.concurrency = queue_settings["concurrency"]
+    sender.prefetch_multiplier = queue_settings["prefetch_multiplier"]
+    print(
+        f"Worker for queue '{queues[0]}': concurrency={sender.concurrency}, "
+        f"prefetch_multiplier={sender.prefetch_multiplier}"
+    )
+
+
+@worker_init.connect
+def start_metrics_server(sender, **kwargs):
+    """Serve the metrics of the worker and its pool processes."""
+    from django.conf import settings
+    from lab.metrics import start_worker_metrics_server
+
+    start_worker_metrics_server(settings.WORKER_METRICS_PORT)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 from environ import Env
@@ -53,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "lab.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -203,3 +205,79 @@ CELERY_RESULT_BACKEND = env.str("CELERY_RESULT_BACKEND", default="redis://redis:
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+
+# Cache shared by the web processes, e.g. for presigned URLs
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env.str("CACHE_URL", default="redis://redis:6379/1"),
+    }
+}
+
+# Task routing: tippecanoe builds are long and CPU/memory heavy, so they get a
+# queue of their own and never hold up conversions and other short jobs
+CELERY_TASK_DEFAULT_QUEUE = "io"
+CELERY_TASK_ROUTES = {
+    "lab.tasks.generate_tileset_with_options": {"queue": "tippecanoe"},
+    "lab.tasks.process_uploaded_geojson": {"queue": "tippecanoe"},
+    "lab.tasks.process_uploaded_shapefile": {"queue": "io"},
+    "lab.tasks.stream_uploaded_shapefile": {"queue": "tippecanoe"},
+}
+
+# Convert, tile and classify uploaded shapefiles in one streaming pass instead
+# of staging an intermediate GeoJSON in MinIO
+SHAPEFILE_STREAMING = env.bool("SHAPEFILE_STREAMING", default=True)
+
+# Natural breaks are exact over up to this many unique values per field and
+# computed from a stratified sample of this size beyond that. Time grows with
+# the square of the size and so does memory (about 64 MB at 2000).
+NATURAL_BREAKS_SAMPLE_SIZE = env.int("NATURAL_BREAKS_SAMPLE_SIZE", default=2000)
+
+# Processes computing tier lists in parallel, one field and method at a time
+CLASSIFICATION_WORKERS = env.int("CLASSIFICATION_WORKERS", default=os.cpu_count() or 1)
+
+# How long the classify endpoint waits for a worker to classify a field before
+# asking the client to retry
+CLASSIFICATION_TIMEOUT_SECONDS = env.int("CLASSIFICATION_TIMEOUT_SECONDS", default=30)
+
+# How long custom classifications and histograms are memoized
+CLASSIFICATION_CACHE_SECONDS = env.int("CLASSIFICATION_CACHE_SECONDS", default=86400)
+
+# Targets of auto mode tileset builds, and the tiling throughput assumed
+# before any build has been timed
+AUTO_TARGET_TILE_BYTES = env.int("AUTO_TARGET_TILE_BYTES", default=500 * 1024)
+AUTO_BUILD_SECONDS_BUDGET = env.int("AUTO_BUILD_SECONDS_BUDGET", default=1800)
+TILING_BYTES_PER_SECOND = env.int("TILING_BYTES_PER_SECOND", default=2 * 1024 * 1024)
+
+# Tile size clients render comfortably. Larger tiles are flagged in the tile
+# analysis of every build, and sweeps recommend builds without them.
+TILE_BYTES_BUDGET = env.int("TILE_BYTES_BUDGET", default=500 * 1024)
+
+# Most option sets a sweep may build
+SWEEP_MAX_BUILDS = env.int("SWEEP_MAX_BUILDS", default=32)
+
+# Pool size and prefetch for workers consuming a single queue
+# (`celery -A server worker -Q <queue>`), applied in server/celery.py.
+# tippecanoe is multi-threaded itself, so its pool is sized from the core
+# count and each process reserves no more than the build it is running.
+WORKER_QUEUE_SETTINGS = {
+    "tippecanoe": {
+        "concurrency": env.int(
+            "TIPPECANOE_WORKER_CONCURRENCY",
+            default=max(
+                1,
+                (os.cpu_count() or 1) // env.int("TIPPECANOE_CORES_PER_BUILD", 4),
+            ),
+        ),
+        "prefetch_multiplier": 1,
+    },
+    "io": {
+        "concurrency": env.int(
+            "IO_WORKER_CONCURRENCY", default=(os.cpu_count() or 1) * 4
+        ),
+        "prefetch_multiplier": 4,
+    },
+}
+
+# Port on which each Celery worker serves its Prometheus metrics
+WORKER_METRICS_PORT = env.int("WORKER_METRICS_PORT", default=9808)
@@ -19,10 +19,12 @@ from django.contrib import admin
 from django.urls import path, include
 
 from lab.urls import urlpatterns as lab_urls
+from lab.views import metrics
 
 api_v1_patterns = [path("", include(lab_urls))]
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/v1/", include(api_v1_patterns)),
+    path("metrics", metrics, name="metrics"),
 ]